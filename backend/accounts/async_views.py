@@ -0,0 +1,28 @@
+"""
+Async-native account views for ASGI deployments (see todolist_project.async_urls).
+Only the profile read is served natively; everything else is delegated to the
+regular DRF views.
+"""
+from django.views.decorators.csrf import csrf_exempt
+
+from core.async_views import aget_user, api_response, delegate
+from core.querybudget import query_budget
+from .models import UserProfile
+from .serializers import UserUpdateSerializer
+from .views import ProfileView
+
+sync_profile = ProfileView.as_view()
+
+
+@query_budget({'get': 2, 'default': 5})
+@csrf_exempt
+async def profile(request):
+    """User profile view"""
+    user = await aget_user(request)
+    if user is None or not user.is_authenticated or request.method != 'GET':
+        return await delegate(sync_profile, request)
+    user_profile = await UserProfile.objects.filter(user_id=user.pk).afirst()
+    if user_profile is None:
+        return await delegate(sync_profile, request)
+    user.profile = user_profile
+    return api_response(request, UserUpdateSerializer(user, context={'request': request}).data)
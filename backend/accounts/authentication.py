@@ -0,0 +1,212 @@
+"""
+JWT authentication with an in-process cache of verified tokens.
+
+A cache hit skips both the signature check and the ``auth_user`` lookup:
+the entry holds the validated token and a snapshot of the user row, and is
+matched on the SHA-256 digest of the raw token so only the exact token that
+was verified can hit. Entries live at most ``JWT_AUTH_CACHE['TIMEOUT']``
+seconds (and never past the token's ``exp``).
+
+Changes to the user row, logouts and blacklisted refresh tokens drop all of
+the user's entries in this process and replace the user's generation in the
+default cache. Every entry records the generation it was cached under and a
+hit is only served while it still matches, so the other worker processes
+stop serving the stale user (deactivated, logged out, old password) at
+their next request. This costs one cache read per hit, and the default
+cache has to be shared between the worker processes for the invalidation
+to reach them.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Maximum number of cached tokens; the least recently used is evicted first
+    'MAX_SIZE': 10000,
+    # Seconds an entry is trusted before the token is verified and the user loaded again
+    'TIMEOUT': 30,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'JWT_AUTH_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def generation_key(user_id):
+    return f'jwt-auth-cache:generation:{user_id}'
+
+
+def get_generation(user_id):
+    """The user's current generation, starting a new one if the cache has none"""
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, secrets.token_hex(8), None)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation(user_id):
+    key = generation_key(user_id)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, secrets.token_hex(8), None)
+        generation = await cache.aget(key)
+    return generation
+
+
+class TokenCache:
+    """Thread-safe bounded LRU of ``digest -> (expires, user_id, token, user_values, generation)``"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.by_user = {}
+        self.lock = threading.Lock()
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove(digest)
+                return None
+            self.entries.move_to_end(digest)
+            return entry
+
+    def set(self, digest, entry):
+        with self.lock:
+            if digest in self.entries:
+                self._remove(digest)
+            self.entries[digest] = entry
+            self.by_user.setdefault(entry[1], set()).add(digest)
+            while len(self.entries) > get_setting('MAX_SIZE'):
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for digest in list(self.by_user.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remove(self, digest):
+        entry = self.entries.pop(digest)
+        digests = self.by_user.get(entry[1])
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self.by_user[entry[1]]
+
+
+token_cache = TokenCache()
+
+
+def invalidate_user_tokens(user_id):
+    """
+    Drop every cached token of ``user_id`` (deactivation, password change,
+    logout, blacklisting), in this process and, through a new generation,
+    in the others
+    """
+    token_cache.invalidate_user(user_id)
+    # A fresh random value rather than incr(), so an evicted and re-added key never matches old entries
+    cache.set(generation_key(user_id), secrets.token_hex(8), None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves repeat tokens from ``token_cache``"""
+
+    def authenticate(self, request):
+        if not get_setting('ENABLED'):
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        digest = hashlib.sha256(raw_token).digest()
+        entry = token_cache.get(digest)
+        if entry is not None and cache.get(generation_key(entry[1])) == entry[4]:
+            _, _, validated_token, user_values, _ = entry
+            return self.build_user(user_values), validated_token
+
+        validated_token = self.get_validated_token(raw_token)
+        # Read before the user, so an invalidation racing the lookup leaves the entry stale
+        generation = get_generation(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = self.get_user(validated_token)
+        self.cache_token(digest, validated_token, user, generation)
+        return user, validated_token
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of authenticate() for async views: a cache hit needs
+        no I/O, a miss loads the user through the async ORM
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        digest = hashlib.sha256(raw_token).digest()
+        entry = token_cache.get(digest) if get_setting('ENABLED') else None
+        if entry is not None and await cache.aget(generation_key(entry[1])) == entry[4]:
+            _, _, validated_token, user_values, _ = entry
+            return self.build_user(user_values), validated_token
+
+        validated_token = self.get_validated_token(raw_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        generation = await aget_generation(user_id) if get_setting('ENABLED') else None
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        if get_setting('ENABLED'):
+            self.cache_token(digest, validated_token, user, generation)
+        return user, validated_token
+
+    def cache_token(self, digest, validated_token, user, generation):
+        if generation is None:
+            # No cache to invalidate through (e.g. DummyCache), so nothing is safe to cache
+            return
+        expires = time.time() + get_setting('TIMEOUT')
+        if 'exp' in validated_token:
+            expires = min(expires, validated_token['exp'])
+        user_values = tuple(getattr(user, field.attname) for field in self.user_model._meta.concrete_fields)
+        token_cache.set(digest, (expires, user.pk, validated_token, user_values, generation))
+
+    def build_user(self, user_values):
+        """Rebuild a user instance from a cached row, as if it was just loaded"""
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields]
+        return self.user_model.from_db(router.db_for_read(self.user_model), field_names, user_values)
@@ -0,0 +1,166 @@
+"""
+In-process Bloom filter of blacklisted refresh token JTIs.
+
+simplejwt checks every refresh token against BlacklistedToken with a JOIN
+lookup. FilteredRefreshToken asks the filter first and only queries the
+database when the JTI may be blacklisted, so refreshing a token that was
+never blacklisted costs no JOIN over the whole blacklist.
+
+The filter is built from the unexpired blacklist on first use in each
+process. Tokens blacklisted in this process are added immediately (see the
+BlacklistedToken receiver in accounts.models); rows written by other
+processes are picked up by an incremental sync every ``SYNC_INTERVAL``
+seconds (0 syncs before every check). Between syncs the filter alone
+answers, so a token blacklisted by another process can still be refreshed
+here for up to SYNC_INTERVAL seconds; lower it (or set 0) to shorten that
+window at the cost of one query per sync.
+
+compact_token_blacklist asks every process to rebuild its filter by bumping
+a generation number in the default cache, which therefore has to be shared
+between the worker processes for the rebuild to reach them.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Target false positive rate; a false positive only costs the usual DB lookup
+    'ERROR_RATE': 0.001,
+    # Seconds between incremental syncs with rows blacklisted by other processes
+    'SYNC_INTERVAL': 5,
+    # Rows blacklisted this many seconds before a sync are read again by the
+    # next one, so a transaction that commits a lower id late is not missed
+    'SYNC_OVERLAP': 60,
+    # Smallest number of entries a rebuilt filter is sized for
+    'MIN_CAPACITY': 1024,
+}
+
+
+GENERATION_KEY = 'token-blacklist-filter:generation'
+
+
+def get_setting(name):
+    return getattr(settings, 'TOKEN_BLACKLIST_FILTER', {}).get(name, DEFAULTS[name])
+
+
+def request_rebuild():
+    """Make every process rebuild its filter at its next sync (after compaction)"""
+    if not cache.add(GENERATION_KEY, 1, None):
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Evicted in between
+            cache.add(GENERATION_KEY, 1, None)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class BlacklistFilter:
+    """Process-wide Bloom filter of blacklisted JTIs kept in step with BlacklistedToken"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.count = 0
+        self.max_id = 0
+        self.synced_at = 0.0
+        self.generation = None
+        # (time, max_id) after each sync, oldest first
+        self.watermarks = deque()
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+                self.count += 1
+
+    def might_contain(self, jti):
+        """False means ``jti`` is certainly not blacklisted"""
+        with self.lock:
+            now = time.monotonic()
+            if self.bloom is None:
+                self._rebuild()
+                return jti in self.bloom
+            if now - self.synced_at >= get_setting('SYNC_INTERVAL'):
+                self._sync(now)
+            return jti in self.bloom
+
+    def reset(self):
+        with self.lock:
+            self.bloom = None
+
+    def _rebuild(self):
+        now = time.monotonic()
+        self.generation = cache.get(GENERATION_KEY)
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list('id', 'token__jti')
+        )
+        self.count = len(rows)
+        self.bloom = BloomFilter(max(self.count * 2, get_setting('MIN_CAPACITY')), get_setting('ERROR_RATE'))
+        for _, jti in rows:
+            self.bloom.add(jti)
+        self.max_id = max([row_id for row_id, _ in rows], default=0)
+        self.synced_at = now
+        self.watermarks = deque([(now, self.max_id)])
+
+    def _sync(self, now):
+        if cache.get(GENERATION_KEY) != self.generation:
+            self._rebuild()
+            return
+        overlap = get_setting('SYNC_OVERLAP')
+        while len(self.watermarks) > 1 and self.watermarks[1][0] <= now - overlap:
+            self.watermarks.popleft()
+        since_id = self.watermarks[0][1]
+        for row_id, jti in BlacklistedToken.objects.filter(id__gt=since_id).values_list('id', 'token__jti'):
+            self.bloom.add(jti)
+            if row_id > self.max_id:
+                self.max_id = row_id
+                self.count += 1
+        self.synced_at = now
+        self.watermarks.append((now, self.max_id))
+        if self.count > self.bloom.capacity:
+            self._rebuild()
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken that skips the blacklist lookup for JTIs the filter rules out"""
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if not get_setting('ENABLED') or blacklist_filter.might_contain(jti):
+            super().check_blacklist()
@@ -0,0 +1,44 @@
+"""
+Debounced last_login bookkeeping.
+
+``last_login`` only feeds the dashboard's recent logins figure. Instead of
+django.contrib.auth's user_logged_in receiver, which saves the user on
+every login() call, it is written with one conditional UPDATE, and at most
+once per user per LAST_LOGIN_UPDATE_INTERVAL seconds, so bursts of logins
+do not turn into bursts of writes on auth_user. AccountsConfig.ready()
+swaps the receivers; login() still creates the session as before.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
+
+
+def get_interval():
+    return timedelta(seconds=getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 300))
+
+
+def record_login(user):
+    """
+    Set ``user.last_login`` to now unless it was set within the interval.
+    Sends no signals; returns whether a row was written.
+    """
+    now = timezone.now()
+    cutoff = now - get_interval()
+    # authenticate() loaded the row, so a recent login needs no statement at all
+    if user.last_login is not None and user.last_login >= cutoff:
+        return False
+    # The condition repeats in SQL so concurrent logins still write only once
+    updated = User.objects.filter(
+        Q(last_login__isnull=True) | Q(last_login__lt=cutoff), pk=user.pk
+    ).update(last_login=now)
+    if updated:
+        user.last_login = now
+    return bool(updated)
+
+
+def update_last_login(sender, user, **kwargs):
+    """user_logged_in receiver taking the place of django.contrib.auth's"""
+    record_login(user)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from accounts.blacklist import request_rebuild
+
+
+class Command(BaseCommand):
+    """
+    Django management command to delete expired outstanding and blacklisted JWT refresh tokens in batches
+    Usage: python manage.py compact_token_blacklist [--batch-size 1000]
+    """
+    help = 'Delete expired OutstandingToken and BlacklistedToken rows in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of outstanding tokens deleted per statement (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now()
+        outstanding_count = blacklisted_count = 0
+        last_id = 0
+        # Walk the primary key so each batch is a short, bounded transaction;
+        # tokens share one lifetime, so expired rows cluster at the low ids
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(id__gt=last_id, expires_at__lt=cutoff)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            blacklisted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            outstanding, _ = OutstandingToken.objects.filter(id__in=ids).delete()
+            blacklisted_count += blacklisted
+            outstanding_count += outstanding
+            last_id = ids[-1]
+
+        # Expired entries only cost false positives, but have the servers drop them anyway
+        request_rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully deleted {outstanding_count} outstanding and '
+                f'{blacklisted_count} blacklisted tokens expired before {cutoff}.'
+            )
+        )
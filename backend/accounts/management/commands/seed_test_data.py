@@ -0,0 +1,240 @@
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from faker import Faker
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+from accounts.models import UserProfile
+from accounts.stats import invalidate_dashboard_stats
+from todo.models import Todo, TodoListState, get_list_scope
+
+VERBS = ['Buy', 'Call', 'Write', 'Review', 'Fix', 'Plan', 'Book', 'Clean', 'Read', 'Prepare', 'Send', 'Update']
+NOUNS = [
+    'groceries', 'the report', 'mom', 'the dentist', 'flights', 'the garage', 'release notes', 'slides',
+    'the invoice', 'a birthday gift', 'the budget', 'the bug in checkout', 'the team meeting', 'a book',
+]
+
+# Todos are inserted in slices of this many rows to bound memory per chunk
+TODO_FLUSH_SIZE = 20000
+
+# SQLite allows one writer at a time; a worker that loses the race retries its chunk
+LOCKED_RETRIES = 50
+
+
+def seed_chunk(chunk, options):
+    """Run create_chunk(), retrying while another worker holds the SQLite write lock"""
+    for attempt in range(LOCKED_RETRIES):
+        try:
+            return create_chunk(chunk, options)
+        except OperationalError as e:
+            if 'locked' not in str(e) or attempt == LOCKED_RETRIES - 1:
+                raise
+            time.sleep(random.uniform(0.05, 0.5))
+
+
+def create_chunk(chunk, options):
+    """
+    Create the users ``chunk * batch_size ...`` with their profiles, todos and
+    list counters in one transaction. The chunk's random generator is seeded
+    from the seed and the chunk number only, so the data does not depend on
+    how the chunks are spread over worker processes.
+    Returns ``(users, todos)`` created.
+    """
+    rng = random.Random(f'{options["seed"]}:{chunk}')
+    first = options['offset'] + chunk * options['batch_size']
+    last = min(options['offset'] + options['users'], first + options['batch_size'])
+    now = options['now']
+    names = options['names']
+    # Log-normal todos per user: most users have a few, a long tail has hundreds
+    sigma = 1.0
+    mu = math.log(max(options['todos_per_user'], 1e-9)) - sigma ** 2 / 2
+
+    users = []
+    for i in range(first, last):
+        first_name, last_name = rng.choice(names)
+        is_staff = rng.random() < 0.05
+        users.append(User(
+            username=f'{options["prefix"]}{i:07d}',
+            email=f'{options["prefix"]}{i:07d}@example.com',
+            password=options['password_hash'],
+            first_name=first_name,
+            last_name=last_name,
+            is_active=rng.random() < 0.9,
+            is_staff=is_staff,
+            is_superuser=is_staff and rng.random() < 0.1,
+            date_joined=now - timedelta(seconds=rng.randrange(365 * 86400)),
+        ))
+
+    todo_count = 0
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, phone=f'+1555{rng.randrange(10 ** 7):07d}') for user in users
+        ])
+
+        todos, states = [], []
+        for user in users:
+            count = min(int(rng.lognormvariate(mu, sigma)), options['max_todos_per_user'])
+            # Per-user completion rate, averaging about 40%
+            completion_rate = rng.betavariate(2, 3)
+            joined_seconds = max(int((now - user.date_joined).total_seconds()), 1)
+            done = 0
+            for _ in range(count):
+                completed = rng.random() < completion_rate
+                done += completed
+                todos.append(Todo(
+                    user=user,
+                    title=f'{rng.choice(VERBS)} {rng.choice(NOUNS)}',
+                    description='' if rng.random() < 0.7 else f'Remember to {rng.choice(VERBS).lower()} {rng.choice(NOUNS)}',
+                    completed=completed,
+                    created_at=now - timedelta(seconds=rng.randrange(joined_seconds)),
+                ))
+            if count:
+                states.append(TodoListState(
+                    scope=get_list_scope(user.pk), user=user, version=1, updated_at=now,
+                    completed_count=done, pending_count=count - done,
+                ))
+            todo_count += count
+            if len(todos) >= TODO_FLUSH_SIZE:
+                Todo.objects.bulk_create(todos, batch_size=options['todo_batch_size'])
+                todos = []
+        Todo.objects.bulk_create(todos, batch_size=options['todo_batch_size'])
+        TodoListState.objects.bulk_create(states)
+    return len(users), todo_count
+
+
+class Command(BaseCommand):
+    """
+    Django management command to seed large volumes of synthetic users and todos
+    for capacity testing. The shared password is hashed once and every table is
+    filled with bulk inserts; chunks of users can be spread over several processes.
+    Usage: python manage.py seed_test_data --users 1000000 --todos-per-user 50 --workers 8 --seed 42
+    """
+    help = 'Bulk-create synthetic users, profiles and todos with realistic distributions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Number of users to create (default: 1000)',
+        )
+        parser.add_argument(
+            '--todos-per-user',
+            type=float,
+            default=50,
+            help='Average number of todos per user, log-normally distributed (default: 50)',
+        )
+        parser.add_argument(
+            '--max-todos-per-user',
+            type=int,
+            default=5000,
+            help='Cap on the number of todos of a single user (default: 5000)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users (with their todos) created per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--todo-batch-size',
+            type=int,
+            default=5000,
+            help='Number of todos per INSERT statement (default: 5000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes inserting in parallel; SQLite serializes writers (default: 1)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; the same seed and --offset produce the same data (default: 0)',
+        )
+        parser.add_argument(
+            '--offset',
+            type=int,
+            default=0,
+            help='Number of the first user, to add more users to an earlier run (default: 0)',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed_',
+            help='Username prefix of the created users (default: seed_)',
+        )
+        parser.add_argument(
+            '--password',
+            default='testpass123',
+            help='Password of every created user (default: testpass123)',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--users and --batch-size must be positive')
+        if User.objects.filter(username=f'{options["prefix"]}{options["offset"]:07d}').exists():
+            raise CommandError(
+                f'Users starting at {options["prefix"]}{options["offset"]:07d} already exist, pick another --offset'
+            )
+
+        fake = Faker(['en_US', 'zh_CN'])
+        fake.seed_instance(options['seed'])
+        chunk_options = {
+            key: options[key] for key in [
+                'users', 'todos_per_user', 'max_todos_per_user', 'batch_size', 'todo_batch_size',
+                'seed', 'offset', 'prefix',
+            ]
+        }
+        chunk_options.update(
+            # PBKDF2 once for everyone instead of once per user
+            password_hash=make_password(options['password']),
+            names=[(fake.first_name(), fake.last_name()) for _ in range(1000)],
+            now=timezone.now(),
+        )
+        chunks = range(math.ceil(options['users'] / options['batch_size']))
+
+        started = time.monotonic()
+        created_users = created_todos = 0
+
+        def report(users, todos):
+            nonlocal created_users, created_todos
+            created_users += users
+            created_todos += todos
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Created {created_users}/{options["users"]} users, {created_todos} todos '
+                f'({created_todos / elapsed:.0f} todos/s)...'
+            )
+
+        if options['workers'] > 1:
+            # Forked workers inherit the loaded apps; close the parent's database
+            # connections first so each child opens its own
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            ) as executor:
+                for users, todos in executor.map(seed_chunk, chunks, [chunk_options] * len(chunks)):
+                    report(users, todos)
+        else:
+            for chunk in chunks:
+                report(*seed_chunk(chunk, chunk_options))
+
+        invalidate_dashboard_stats()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully created {created_users} users and {created_todos} todos in {elapsed:.1f}s. '
+                f'Password for all users: {options["password"]}'
+            )
+        )
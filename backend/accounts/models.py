@@ -1,10 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from core.tracking import FieldTrackingMixin
+from .authentication import invalidate_user_tokens
+from .blacklist import blacklist_filter
+from .stats import invalidate_dashboard_stats
 
 
-class UserProfile(models.Model):
+class UserProfile(FieldTrackingMixin, models.Model):
     """Extended user profile model"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(max_length=15, blank=True, help_text="Phone number")
@@ -29,6 +34,41 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    """Save UserProfile when User is saved"""
-    if hasattr(instance, 'profile'):
+    """Save the UserProfile edited through ``user.profile`` when the User is saved"""
+    # A profile that was never loaded has no changes, and loading it just to
+    # write it back unchanged would cost two statements per User save. A loaded
+    # one only writes its changed fields (see FieldTrackingMixin).
+    if User.profile.is_cached(instance) and getattr(instance, 'profile', None) is not None:
         instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_stats(sender, instance, created=False, update_fields=None, **kwargs):
+    """Drop the cached dashboard stats when a user is added, removed or changes status"""
+    # Logins only touch last_login; recent_logins is allowed to lag by the cache timeout
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_dashboard_stats()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_tokens(sender, instance, update_fields=None, **kwargs):
+    """Force the next request of a changed user (deactivated, new password, ...) to reload it"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def track_blacklisted_token(sender, instance, created, **kwargs):
+    """
+    Add a newly blacklisted token to the JTI filter and end its owner's cached
+    sessions. The cache holds access tokens, which a refresh token's jti does
+    not identify, so all of the owner's entries go.
+    """
+    if created:
+        blacklist_filter.add(instance.token.jti)
+        if instance.token.user_id is not None:
+            invalidate_user_tokens(instance.token.user_id)
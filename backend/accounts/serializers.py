@@ -1,7 +1,10 @@
 from rest_framework import serializers
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User, Group, Permission
+from django.db.models import Prefetch, prefetch_related_objects
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext as _
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .blacklist import FilteredRefreshToken
 from .models import UserProfile
 
 
@@ -87,6 +90,14 @@ class ChangePasswordSerializer(serializers.Serializer):
         return value
 
 
+def set_changed_fields(instance, validated_data):
+    """Assign the values of ``validated_data`` that differ; returns the changed field names"""
+    changed = [attr for attr, value in validated_data.items() if getattr(instance, attr) != value]
+    for attr in changed:
+        setattr(instance, attr, validated_data[attr])
+    return changed
+
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     """User update serializer"""
     profile = UserProfileSerializer()
@@ -100,12 +111,12 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', {})
         
-        # Update user fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        # Update the changed user fields only
+        update_fields = set_changed_fields(instance, validated_data)
+        if update_fields:
+            instance.save(update_fields=update_fields)
         
-        # Update profile fields
+        # Update profile fields; the profile writes only what changed
         if profile_data:
             profile = instance.profile
             for attr, value in profile_data.items():
@@ -150,18 +161,25 @@ class AdminUserSerializer(serializers.ModelSerializer):
         """Update user, handle password separately"""
         password = validated_data.pop('password', None)
         
-        # Update user fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        # Update the changed user fields only
+        update_fields = set_changed_fields(instance, validated_data)
         
         # Update password if provided
         if password:
             instance.set_password(password)
+            update_fields.append('password')
         
-        instance.save()
+        if update_fields:
+            instance.save(update_fields=update_fields)
         return instance
 
 
+# Permission.__str__ renders its content type, so load both in one go
+GROUP_PERMISSIONS_PREFETCH = Prefetch(
+    'permissions', queryset=Permission.objects.select_related('content_type')
+)
+
+
 class GroupSerializer(serializers.ModelSerializer):
     """Group serializer"""
     permissions = serializers.StringRelatedField(many=True, read_only=True)
@@ -169,3 +187,14 @@ class GroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = ['id', 'name', 'permissions']
+
+    def to_representation(self, instance):
+        # No-op when the view already prefetched; covers instances whose
+        # prefetch cache was cleared after an update
+        prefetch_related_objects([instance], GROUP_PERMISSIONS_PREFETCH)
+        return super().to_representation(instance)
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh serializer that consults the blacklist JTI filter before the database"""
+    token_class = FilteredRefreshToken
@@ -0,0 +1,54 @@
+"""
+Admin dashboard statistics.
+
+All counters come from one conditional-aggregate query over auth_user. The
+result is cached for DASHBOARD_STATS_CACHE_TIMEOUT seconds and dropped
+whenever a user is created, deleted or changes active/staff/superuser
+status (see the signal receivers in accounts.models). Last-login updates
+do not invalidate, so recent_logins may lag by up to the timeout.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+CACHE_KEY = 'accounts:dashboard_stats'
+
+# Window for recent_registrations and recent_logins
+RECENT_WINDOW = timedelta(days=30)
+
+
+def compute_dashboard_stats():
+    """Run the single aggregate query behind the dashboard"""
+    now = timezone.now()
+    since = now - RECENT_WINDOW
+    stats = User.objects.aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(is_active=True)),
+        staff_users=Count('id', filter=Q(is_staff=True)),
+        superusers=Count('id', filter=Q(is_superuser=True)),
+        recent_registrations=Count('id', filter=Q(date_joined__gte=since)),
+        recent_logins=Count('id', filter=Q(last_login__gte=since)),
+    )
+    stats['generated_at'] = now
+    return stats
+
+
+def get_dashboard_stats():
+    """Return the cached dashboard statistics, computing them on a miss"""
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(CACHE_KEY, stats, getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 60))
+    return stats
+
+
+def invalidate_dashboard_stats():
+    """Drop the cached statistics now and again once the current transaction commits"""
+    cache.delete(CACHE_KEY)
+    # A request that read the old rows before the commit may have re-cached them
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
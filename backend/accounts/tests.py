@@ -1,3 +1,470 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.querybudget import get_view_budget
+from core.testing import QueryBudgetTestMixin
+from todo.models import Todo, TodoListState
+from .authentication import invalidate_user_tokens, token_cache
+from .blacklist import BloomFilter, blacklist_filter
+from .models import UserProfile
+
+
+def iter_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """Account endpoints stay within their declared query budgets"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        self.users = [User.objects.create_user(f'user{i}', password='testpass123') for i in range(5)]
+        self.group = Group.objects.create(name='editors')
+        self.group.permissions.set(Permission.objects.all()[:5])
+
+    def test_every_view_declares_a_budget(self):
+        for pattern in iter_patterns(get_resolver().url_patterns):
+            view = pattern.callback
+            module = getattr(getattr(view, 'cls', view), '__module__', '')
+            if module not in ('todo.views', 'accounts.views'):
+                continue
+            view_class = getattr(view, 'cls', None)
+            budget = getattr(view_class, 'query_budget', None) or getattr(view, 'query_budget', None)
+            with self.subTest(pattern=str(pattern.pattern)):
+                self.assertIsNotNone(budget)
+
+    def test_budget_lookup_by_method(self):
+        class Request:
+            method = 'DELETE'
+
+        from .views import AdminUserDetailView, dashboard_stats
+        self.assertEqual(get_view_budget(AdminUserDetailView.as_view(), Request), 10)
+        self.assertEqual(get_view_budget(dashboard_stats, Request), 2)
+
+    def test_admin_endpoints(self):
+        self.client.force_authenticate(self.admin)
+        user = self.users[0]
+        self.assertEqual(self.client.get('/api/admin/users/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/admin/users/{user.id}/').status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/admin/users/{user.id}/', {'first_name': 'Q'}).status_code, 200)
+        self.assertEqual(self.client.post(f'/api/admin/users/{user.id}/set-active/', {'is_active': False}).status_code, 200)
+        self.assertEqual(self.client.post(f'/api/admin/users/{user.id}/set-staff/', {'is_staff': True}).status_code, 200)
+        self.assertEqual(self.client.get('/api/admin/dashboard/stats/').status_code, 200)
+
+    def test_group_endpoints(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/admin/groups/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/admin/groups/{self.group.id}/').status_code, 200)
+        # The update clears the prefetch cache; permissions must not be reloaded per row
+        self.assertEqual(self.client.patch(f'/api/admin/groups/{self.group.id}/', {'name': 'writers'}).status_code, 200)
+
+    def test_auth_endpoints(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newcomer', 'password': 'longpass123', 'password_confirm': 'longpass123',
+        })
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/auth/login/', {'username': 'user1', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.users[1])
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        self.assertEqual(self.client.patch('/api/auth/profile/', {'first_name': 'B'}, format='json').status_code, 200)
+
+
+class DashboardStatsTests(APITestCase):
+    """Single-query, cached /api/admin/dashboard/stats/"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        self.users = [User.objects.create_user(f'user{i}', password='testpass123') for i in range(3)]
+        self.client.force_authenticate(self.admin)
+
+    def stats(self):
+        response = self.client.get('/api/admin/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_in_one_query_then_serves_from_cache(self):
+        with CaptureQueriesContext(connection) as context:
+            stats = self.stats()
+        self.assertEqual(len([q for q in context.captured_queries if 'auth_user' in q['sql']]), 1)
+        self.assertEqual(stats['total_users'], 4)
+        self.assertEqual(stats['active_users'], 4)
+        self.assertEqual(stats['staff_users'], 1)
+        self.assertEqual(stats['superusers'], 1)
+        self.assertEqual(stats['recent_registrations'], 4)
+        self.assertIn('generated_at', stats)
+
+        with CaptureQueriesContext(connection) as context:
+            cached = self.stats()
+        self.assertEqual(context.captured_queries, [])
+        self.assertEqual(cached['generated_at'], stats['generated_at'])
+
+    def test_user_changes_invalidate(self):
+        user = self.users[0]
+        self.assertEqual(self.stats()['total_users'], 4)
+        self.client.post(f'/api/admin/users/{user.id}/set-active/', {'is_active': False})
+        self.assertEqual(self.stats()['active_users'], 3)
+        self.client.post(f'/api/admin/users/{user.id}/set-staff/', {'is_staff': True})
+        self.assertEqual(self.stats()['staff_users'], 2)
+        User.objects.create_user('late', password='testpass123')
+        self.assertEqual(self.stats()['total_users'], 5)
+        user.delete()
+        self.assertEqual(self.stats()['total_users'], 4)
+
+    def test_logins_do_not_invalidate(self):
+        generated_at = self.stats()['generated_at']
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/auth/login/', {'username': 'user1', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.stats()['generated_at'], generated_at)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get('/api/admin/dashboard/stats/').status_code, 403)
+
+
+@override_settings(JWT_AUTH_CACHE={'MAX_SIZE': 3, 'TIMEOUT': 30})
+class CachedJWTAuthenticationTests(APITestCase):
+    """Repeat bearer tokens authenticate from the in-process token cache"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user('alice', password='testpass123')
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def bearer(self, user):
+        return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    def profile(self, header):
+        return self.client.get('/api/auth/profile/', HTTP_AUTHORIZATION=header)
+
+    def user_queries(self, header):
+        with CaptureQueriesContext(connection) as context:
+            response = self.profile(header)
+        self.assertEqual(response.status_code, 200)
+        return [q for q in context.captured_queries if 'FROM "auth_user"' in q['sql']]
+
+    def test_repeat_requests_skip_the_user_lookup(self):
+        header = self.bearer(self.user)
+        self.assertEqual(len(self.user_queries(header)), 1)
+        self.assertEqual(self.user_queries(header), [])
+        self.assertEqual(self.profile(header).data['username'], 'alice')
+
+    def test_tampered_token_is_not_served_from_cache(self):
+        header = self.bearer(self.user)
+        self.profile(header)
+        self.assertEqual(self.profile(header[:-2] + ('AA' if not header.endswith('AA') else 'BB')).status_code, 401)
+
+    def test_deactivation_and_password_change_invalidate(self):
+        header = self.bearer(self.user)
+        self.profile(header)
+        admin_header = self.bearer(self.admin)
+        response = self.client.post(
+            f'/api/admin/users/{self.user.id}/set-active/', {'is_active': False}, HTTP_AUTHORIZATION=admin_header
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile(header).status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.profile(header)
+        self.user.set_password('newpass12345')
+        self.user.save()
+        self.assertEqual(len(self.user_queries(header)), 1)
+
+    def test_logout_invalidates(self):
+        header = self.bearer(self.user)
+        self.profile(header)
+        refresh = str(RefreshToken.for_user(self.user))
+        self.client.post('/api/auth/logout/', {'refresh': refresh}, HTTP_AUTHORIZATION=header)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_invalidation_in_another_process_is_seen_at_the_next_hit(self):
+        header = self.bearer(self.user)
+        self.profile(header)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Another worker deactivated the user: only the shared generation moves here
+        with mock.patch.object(token_cache, 'invalidate_user'):
+            invalidate_user_tokens(self.user.pk)
+        self.assertEqual(len(token_cache), 1)
+        self.assertEqual(self.profile(header).status_code, 401)
+
+    def test_blacklisting_drops_the_owners_entries(self):
+        header, admin_header = self.bearer(self.user), self.bearer(self.admin)
+        self.profile(header)
+        self.profile(admin_header)
+        RefreshToken.for_user(self.user).blacklist()
+        self.assertEqual(len(self.user_queries(header)), 1)
+        self.assertEqual(self.user_queries(admin_header), [])
+
+    def test_cache_is_bounded(self):
+        for _ in range(5):
+            self.profile(self.bearer(self.user))
+        self.assertEqual(len(token_cache), 3)
+
+    @override_settings(JWT_AUTH_CACHE={'TIMEOUT': 0})
+    def test_expired_entries_are_reverified(self):
+        header = self.bearer(self.user)
+        self.profile(header)
+        self.assertEqual(len(self.user_queries(header)), 1)
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True}, TOKEN_BLACKLIST_FILTER={'SYNC_INTERVAL': 0})
+class TokenBlacklistTests(APITestCase):
+    """Blacklist JTI filter on refresh and expired token compaction"""
+
+    def setUp(self):
+        blacklist_filter.reset()
+        token_cache.clear()
+        self.user = User.objects.create_user('alice', password='testpass123')
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': str(token)})
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=100, error_rate=0.01)
+        for i in range(100):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(100)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_unblacklisted_refresh_skips_the_lookup(self):
+        token = RefreshToken.for_user(self.user)
+        self.refresh(RefreshToken.for_user(self.user))  # builds the filter
+        with CaptureQueriesContext(connection) as context:
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        lookups = [q for q in context.captured_queries if 'INNER JOIN "token_blacklist_outstandingtoken"' in q['sql']]
+        # Only the filter's incremental sync, never the per-token blacklist check
+        self.assertTrue(all('"token_blacklist_blacklistedtoken"."id" >' in q['sql'] for q in lookups))
+
+    def test_rotated_and_logged_out_tokens_are_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+        token = RefreshToken.for_user(self.user)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': str(token)}).status_code, 200)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_blacklisting_by_another_process_is_synced(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(blacklist_filter.might_contain(token['jti']))
+        # bulk_create sends no signal, like a write from another worker
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))
+        ])
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_FILTER={'SYNC_INTERVAL': 3600})
+    def test_blacklisting_elsewhere_is_picked_up_at_the_next_sync(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(blacklist_filter.might_contain(token['jti']))
+        # Blacklisted by another process: the filter answers alone until it syncs
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))
+        ])
+        with self.assertNumQueries(0):
+            self.assertFalse(blacklist_filter.might_contain(token['jti']))
+        blacklist_filter.synced_at -= 3600
+        self.assertTrue(blacklist_filter.might_contain(token['jti']))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_compaction_deletes_expired_tokens(self):
+        live = RefreshToken.for_user(self.user)
+        expired = [RefreshToken.for_user(self.user) for _ in range(3)]
+        for token in expired:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        out = StringIO()
+        call_command('compact_token_blacklist', batch_size=2, stdout=out)
+        self.assertIn('3 outstanding and 3 blacklisted', out.getvalue())
+        self.assertTrue(OutstandingToken.objects.filter(jti=live['jti']).exists())
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+        # Running servers rebuild their filters at the next sync
+        self.assertGreater(blacklist_filter.count, 0)
+        blacklist_filter.might_contain(live['jti'])
+        self.assertEqual(blacklist_filter.count, 0)
+
+
+class SeedTestDataTests(APITestCase):
+    def seed(self, **options):
+        call_command('seed_test_data', users=25, todos_per_user=8, batch_size=10, stdout=StringIO(), **options)
+        return list(
+            Todo.objects.filter(user__username__startswith='seed_')
+            .order_by('user__username', 'created_at', 'title')
+            .values_list('user__username', 'title', 'description', 'completed')
+        )
+
+    def test_seeds_users_profiles_todos_and_counters(self):
+        self.seed(seed=7)
+        users = User.objects.filter(username__startswith='seed_')
+        self.assertEqual(users.count(), 25)
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 25)
+        self.assertTrue(users.get(username='seed_0000003').check_password('testpass123'))
+        for state in TodoListState.objects.filter(user__in=users):
+            todos = Todo.objects.filter(user=state.user)
+            self.assertEqual(state.completed_count, todos.filter(completed=True).count())
+            self.assertEqual(state.pending_count, todos.filter(completed=False).count())
+        self.assertEqual(
+            TodoListState.objects.filter(user__in=users).count(),
+            users.filter(todo__isnull=False).distinct().count(),
+        )
+
+    def test_same_seed_reproduces_the_data(self):
+        first = self.seed(seed=7)
+        self.assertTrue(first)
+        User.objects.filter(username__startswith='seed_').delete()
+        self.assertEqual(self.seed(seed=7), first)
+        User.objects.filter(username__startswith='seed_').delete()
+        self.assertNotEqual(self.seed(seed=8), first)
+
+    def test_refuses_to_reseed_existing_users(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(offset=25)
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 50)
+
+
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica'], 'PIN_SECONDS': 60})
+class ReplicaPinningTests(APITestCase):
+    """New tokens from register and login read their user's writes from the primary"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def get_profile(self, access):
+        """GET the profile; returns the response and whether its reads were sent to the replicas"""
+        from core import routers
+        decisions = []
+        use_replicas = routers.use_replicas
+
+        def record(request):
+            decisions.append(use_replicas(request))
+            return decisions[-1]
+
+        with mock.patch.object(routers, 'use_replicas', record):
+            response = self.client.get('/api/auth/profile/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return response, decisions == [True]
+
+    def test_register_then_read_the_profile(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newcomer', 'password': 'longpass123', 'password_confirm': 'longpass123',
+        })
+        self.assertEqual(response.status_code, 201)
+        # The lagging replica may not have the new user yet
+        response, replica_reads = self.get_profile(response.data['data']['access'])
+        self.assertFalse(replica_reads)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'newcomer')
+
+    def test_login_pins_the_user(self):
+        User.objects.create_user('user1', password='testpass123')
+        response = self.client.post('/api/auth/login/', {'username': 'user1', 'password': 'testpass123'})
+        access = response.data['data']['access']
+        self.assertFalse(self.get_profile(access)[1])
+        # Once the pin expires, reads go back to the replicas
+        cache.clear()
+        self.assertTrue(self.get_profile(access)[1])
+
+
+class LoginWriteTests(APITestCase):
+    """Logins and User saves write only what changed"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('user1', password='testpass123')
+
+    def login(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/login/', {'username': 'user1', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+
+    def test_last_login_is_written_once_per_interval(self):
+        writes = self.login()
+        self.assertEqual(len([sql for sql in writes if sql.startswith('UPDATE "auth_user"')]), 1)
+        self.assertFalse([sql for sql in writes if 'accounts_userprofile' in sql])
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        # login() still starts a session for the user
+        self.assertEqual(self.client.session[SESSION_KEY], str(self.user.pk))
+
+        self.assertFalse([sql for sql in self.login() if sql.startswith('UPDATE "auth_user"')])
+
+        User.objects.filter(pk=self.user.pk).update(last_login=timezone.now() - timedelta(minutes=6))
+        self.assertEqual(len([sql for sql in self.login() if sql.startswith('UPDATE "auth_user"')]), 1)
+
+    @override_settings(LAST_LOGIN_UPDATE_INTERVAL=0)
+    def test_interval_is_configurable(self):
+        self.login()
+        self.assertEqual(len([sql for sql in self.login() if sql.startswith('UPDATE "auth_user"')]), 1)
+
+    def test_user_save_skips_unchanged_profile(self):
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse([query for query in queries if 'accounts_userprofile' in query['sql']])
+
+        user.profile
+        user.first_name = 'Ann'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse([query for query in queries if 'accounts_userprofile' in query['sql']])
+
+        user.profile.phone = '555-0100'
+        user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).phone, '555-0100')
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse([query for query in queries if 'accounts_userprofile' in query['sql']])
+
+    def test_admin_flag_toggles_write_one_column(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        self.client.force_authenticate(admin)
+        url = f'/api/admin/users/{self.user.id}/set-active/'
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post(url, {'is_active': True}).status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "auth_user"')])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'is_active': 'false'})
+        self.assertFalse(response.data['user']['is_active'])
+        [update] = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "auth_user"')]
+        self.assertIn('"is_active"', update)
+        self.assertNotIn('"password"', update)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
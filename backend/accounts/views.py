@@ -1,16 +1,21 @@
-from rest_framework import generics, status, permissions
+from rest_framework import generics, serializers, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User, Group
 from django.contrib.auth import login
+from .authentication import invalidate_user_tokens
+from .blacklist import FilteredRefreshToken
 from .models import UserProfile
+from .stats import get_dashboard_stats
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, LoginSerializer,
     ChangePasswordSerializer, UserUpdateSerializer, AdminUserSerializer,
-    GroupSerializer
+    GroupSerializer, GROUP_PERMISSIONS_PREFETCH
 )
+from core.querybudget import query_budget
+from core.routers import pin_user
 from .utils import error_response, success_response, format_serializer_errors
 
 
@@ -19,6 +24,7 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 5
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -28,6 +34,8 @@ class RegisterView(generics.CreateAPIView):
         
         try:
             user = serializer.save()
+            # Its first requests with the new tokens must not read a lagging replica
+            pin_user(request, user)
             
             # Generate tokens
             refresh = RefreshToken.for_user(user)
@@ -45,6 +53,8 @@ class RegisterView(generics.CreateAPIView):
 class LoginView(APIView):
     """User login view"""
     permission_classes = [permissions.AllowAny]
+    # Most of these are the session: key check, insert and rotation
+    query_budget = 11
     
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -54,11 +64,12 @@ class LoginView(APIView):
         
         try:
             user = serializer.validated_data['user']
+            pin_user(request, user)
             
             # Generate tokens
             refresh = RefreshToken.for_user(user)
             
-            # Update last login
+            # Update last login (debounced, see accounts.lastlogin) and start the session
             login(request, user)
             
             return success_response({
@@ -74,11 +85,13 @@ class LoginView(APIView):
 class LogoutView(APIView):
     """User logout view"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 7
     
     def post(self, request):
+        invalidate_user_tokens(request.user.pk)
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -89,6 +102,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     """User profile view"""
     serializer_class = UserUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'get': 2, 'default': 5}
     
     def get_object(self):
         return self.request.user
@@ -97,6 +111,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 class ChangePasswordView(APIView):
     """Change password view"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
     
     def post(self, request):
         serializer = ChangePasswordSerializer(data=request.data, context={'request': request})
@@ -115,6 +130,7 @@ class AdminUserListView(generics.ListCreateAPIView):
     queryset = User.objects.all().select_related('profile').prefetch_related('groups')
     serializer_class = AdminUserSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    query_budget = {'get': 4, 'post': 7}
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -149,17 +165,30 @@ class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all().select_related('profile').prefetch_related('groups')
     serializer_class = AdminUserSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    query_budget = {'get': 3, 'delete': 10, 'default': 6}
 
 
+def get_flag(request, name, default):
+    """Boolean ``name`` of the request data; form posts send it as a string"""
+    return serializers.BooleanField().run_validation(request.data.get(name, default))
+
+
+def set_user_flag(user, name, value):
+    """Write the ``name`` column alone, and nothing when it already has ``value``"""
+    if getattr(user, name) != value:
+        setattr(user, name, value)
+        user.save(update_fields=[name])
+
+
+@query_budget(6)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def set_user_active(request, user_id):
     """Set user active/inactive status"""
     try:
         user = User.objects.get(id=user_id)
-        is_active = request.data.get('is_active', True)
-        user.is_active = is_active
-        user.save()
+        is_active = get_flag(request, 'is_active', True)
+        set_user_flag(user, 'is_active', is_active)
         return Response({
             'message': f'User {"activated" if is_active else "deactivated"} successfully',
             'user': AdminUserSerializer(user).data
@@ -168,15 +197,15 @@ def set_user_active(request, user_id):
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@query_budget(6)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def set_user_staff(request, user_id):
     """Set user staff status"""
     try:
         user = User.objects.get(id=user_id)
-        is_staff = request.data.get('is_staff', False)
-        user.is_staff = is_staff
-        user.save()
+        is_staff = get_flag(request, 'is_staff', False)
+        set_user_flag(user, 'is_staff', is_staff)
         return Response({
             'message': f'User staff status {"enabled" if is_staff else "disabled"} successfully',
             'user': AdminUserSerializer(user).data
@@ -185,6 +214,7 @@ def set_user_staff(request, user_id):
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@query_budget(6)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def set_user_superuser(request, user_id):
@@ -195,9 +225,8 @@ def set_user_superuser(request, user_id):
         if not request.user.is_superuser:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        is_superuser = request.data.get('is_superuser', False)
-        user.is_superuser = is_superuser
-        user.save()
+        is_superuser = get_flag(request, 'is_superuser', False)
+        set_user_flag(user, 'is_superuser', is_superuser)
         return Response({
             'message': f'User superuser status {"enabled" if is_superuser else "disabled"} successfully',
             'user': AdminUserSerializer(user).data
@@ -208,48 +237,26 @@ def set_user_superuser(request, user_id):
 
 class GroupListView(generics.ListCreateAPIView):
     """Group list view"""
-    queryset = Group.objects.all().prefetch_related('permissions')
+    queryset = Group.objects.all().prefetch_related(GROUP_PERMISSIONS_PREFETCH)
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    query_budget = 4
 
 
 class GroupDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Group detail view"""
-    queryset = Group.objects.all().prefetch_related('permissions')
+    queryset = Group.objects.all().prefetch_related(GROUP_PERMISSIONS_PREFETCH)
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    query_budget = {'get': 3, 'default': 7}
 
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def dashboard_stats(request):
-    """Dashboard statistics"""
+    """Dashboard statistics, cached (see accounts.stats)"""
     if not request.user.is_staff:
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    # Get stats
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    staff_users = User.objects.filter(is_staff=True).count()
-    superusers = User.objects.filter(is_superuser=True).count()
-    
-    # Recent registrations (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_registrations = User.objects.filter(date_joined__gte=thirty_days_ago).count()
-    
-    # Recent logins (last 30 days)
-    recent_logins = User.objects.filter(
-        last_login__gte=thirty_days_ago
-    ).count()
-    
-    return Response({
-        'total_users': total_users,
-        'active_users': active_users,
-        'staff_users': staff_users,
-        'superusers': superusers,
-        'recent_registrations': recent_registrations,
-        'recent_logins': recent_logins,
-    })
+    return Response(get_dashboard_stats())
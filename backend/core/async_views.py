@@ -0,0 +1,87 @@
+"""
+Helpers for the async-native API views served under ASGI.
+
+Async views answer the hot paths themselves and hand everything else
+(non-JSON bodies and responses, authentication errors, rarely used
+options) to the regular DRF view through ``delegate`` so both stacks
+respond identically. Responses go through DRF's content negotiation and
+renderers, so an async view answers in JSON or MessagePack as the client
+asks.
+"""
+import orjson
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from accounts.authentication import CachedJWTAuthentication
+from .renderers import MessagePackRenderer
+
+authenticator = CachedJWTAuthentication()
+
+# Renderers that only need the data; anything else (the browsable API) needs the DRF view
+DATA_RENDERERS = (JSONRenderer, MessagePackRenderer)
+
+
+def negotiate_renderer(request):
+    """
+    Select ``(renderer, media_type)`` with the negotiation class and
+    renderers of the DRF views. Returns None when no renderer is acceptable
+    or the selected one needs the DRF view.
+    """
+    negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    try:
+        renderer, media_type = negotiator.select_renderer(Request(request), renderers)
+    except NotAcceptable:
+        return None
+    if not isinstance(renderer, DATA_RENDERERS):
+        return None
+    return renderer, media_type
+
+
+def api_response(request, data, status=200):
+    """Response rendered as the DRF views render it, with the renderer aget_user() negotiated"""
+    renderer, media_type = request.negotiated_renderer
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    return HttpResponse(renderer.render(data, media_type, {}), status=status, content_type=content_type)
+
+
+async def aget_user(request):
+    """
+    Negotiate the response renderer, authenticate the bearer token and set
+    ``request.user``. Returns None when either fails, so the caller can
+    delegate and let DRF answer (406, 401...).
+    """
+    request.negotiated_renderer = negotiate_renderer(request)
+    if request.negotiated_renderer is None:
+        return None
+    try:
+        result = await authenticator.aauthenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    request.user = result[0] if result else AnonymousUser()
+    return request.user
+
+
+def parse_json_body(request):
+    """Return the JSON object body, or None if DRF has to parse (or reject) it"""
+    if request.content_type != 'application/json':
+        return None
+    try:
+        data = orjson.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def delegate(view, request, *args, **kwargs):
+    """Serve the request with the sync DRF view"""
+    return await sync_to_async(view)(request, *args, **kwargs)
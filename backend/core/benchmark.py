@@ -0,0 +1,211 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Requests are sent either straight into the ASGI application, so the numbers
+reflect the request handling alone, or over HTTP to a running server.
+Both transports are awaitables returning ``(status, body)``.
+
+The commands seed and write their own data, so they run against a
+throwaway copy of the default database (see benchmark_database) unless
+the operator opts into the configured one with --allow-seed.
+"""
+import asyncio
+import http.client
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.test import override_settings
+
+SQLITE_PRAGMAS = ['journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'busy_timeout']
+
+
+async def asgi_request(application, method, path, headers=None, body=b''):
+    """Send one request to ``application`` in-process; returns ``(status, body)``"""
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'content-length', str(len(body)).encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    body_sent = False
+    disconnected = asyncio.Event()
+    status = None
+    chunks = []
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # Django listens for a disconnect while the view runs
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    disconnected.set()
+    return status, b''.join(chunks)
+
+
+class ASGITransport:
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, method, path, headers=None, body=b''):
+        return await asgi_request(self.application, method, path, headers, body)
+
+
+class HTTPTransport:
+    """
+    Blocking keep-alive connections to ``base_url``, one per thread of the
+    event loop's default executor
+    """
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        if url.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported URL: {base_url}')
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.local = threading.local()
+
+    async def __call__(self, method, path, headers=None, body=b''):
+        return await asyncio.to_thread(self.request, method, path, headers, body)
+
+    def request(self, method, path, headers, body):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self.connection_class(self.netloc, timeout=60)
+        try:
+            connection.request(method, self.prefix + path, body or None, headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            raise
+
+
+def add_database_argument(parser):
+    parser.add_argument(
+        '--allow-seed',
+        action='store_true',
+        help='Seed and write benchmark data in the configured default database instead of a '
+             'throwaway test database; never use it against production (default: off)',
+    )
+
+
+@contextmanager
+def benchmark_database(allow_seed=False):
+    """
+    Run the block against a new, empty test database created and destroyed
+    like the test runner's, with the same engine and options as the default
+    database; SQLite gets a temporary file so concurrent clients share it.
+    Reads stay off the replicas, which follow the configured database.
+    With ``allow_seed`` the configured database is used as it is.
+    """
+    if allow_seed:
+        yield
+        return
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    saved_test_name = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        else:
+            test_settings['NAME'] = f'benchmark_{old_name}'
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(REPLICA_ROUTING={'REPLICAS': []}):
+                    yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            test_settings['NAME'] = saved_test_name
+
+
+def describe_database():
+    """
+    The database profile a report was taken with: backend, connection reuse
+    and pool settings, and the SQLite pragmas as the connection reports them
+    """
+    settings_dict = connection.settings_dict
+    profile = {
+        'vendor': connection.vendor,
+        'conn_max_age': settings_dict['CONN_MAX_AGE'],
+        'conn_health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+        'pool': settings_dict['OPTIONS'].get('pool') or None,
+    }
+    if connection.vendor == 'sqlite':
+        profile['transaction_mode'] = settings_dict['OPTIONS'].get('transaction_mode')
+        with connection.cursor() as cursor:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(f'PRAGMA {pragma}')
+                # In-memory databases report no mmap_size
+                row = cursor.fetchone()
+                profile[pragma] = row[0] if row else None
+    return profile
+
+
+def percentile(values, fraction):
+    """``fraction`` percentile of the sorted ``values``"""
+    return values[round(fraction * (len(values) - 1))] if values else 0.0
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and latency figures, in milliseconds, of one endpoint"""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Compare the endpoints of two reports. An endpoint regresses when its p95
+    latency grew, or its throughput fell, by more than ``tolerance`` (a fraction).
+    Returns ``{endpoint: {..., 'regressed': bool}}`` for endpoints in both reports.
+    """
+    comparison = {}
+    for name, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or not current['requests'] or not previous['requests']:
+            continue
+        p95_change = current['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0.0
+        throughput_change = current['throughput'] / previous['throughput'] - 1 if previous['throughput'] else 0.0
+        comparison[name] = {
+            'p95_change': round(p95_change, 4),
+            'throughput_change': round(throughput_change, 4),
+            'regressed': p95_change > tolerance or throughput_change < -tolerance,
+        }
+    return comparison
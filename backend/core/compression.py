@@ -0,0 +1,214 @@
+"""
+Response compression codecs and Accept-Encoding negotiation.
+
+gzip is always available; brotli (``br``) and zstd are used when the
+``brotli`` and ``zstandard`` packages are installed. The encoding is
+picked in the server's order of preference (RESPONSE_COMPRESSION
+['ENCODINGS']) among the ones the client accepts, since the client's
+q-values rarely say anything beyond "accepted or not".
+
+Every compressor records the bytes in, bytes out and the CPU time spent in
+a CompressionStats, which CompressionMiddleware attaches to the response
+for the profiling hooks (see core.middleware).
+"""
+import time
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Bodies shorter than this are sent as they are; the headers cost more than the gain
+    'MIN_SIZE': 1024,
+    # Server preference; encodings whose package is missing are skipped
+    'ENCODINGS': ['br', 'zstd', 'gzip'],
+    # Levels tuned for per-request CPU rather than the smallest output
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'ZSTD_LEVEL': 3,
+    # Compress StreamingHttpResponse bodies chunk by chunk
+    'STREAMING': True,
+    # Media types that are compressed already (prefix match)
+    'EXCLUDED_TYPES': ['image/', 'video/', 'audio/', 'application/zip', 'application/gzip', 'application/x-gzip'],
+    # Add the compression CPU time and ratio to the Server-Timing header
+    'SERVER_TIMING_HEADER': False,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+class CompressionStats:
+    """Sizes and CPU time of one response's compression"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.original_size = 0
+        self.compressed_size = 0
+        self.cpu_time = 0.0
+
+    @property
+    def ratio(self):
+        """Original size over compressed size, 0 before any output"""
+        return self.original_size / self.compressed_size if self.compressed_size else 0.0
+
+    def as_dict(self):
+        return {
+            'encoding': self.encoding,
+            'original_size': self.original_size,
+            'compressed_size': self.compressed_size,
+            'ratio': round(self.ratio, 2),
+            'cpu_ms': round(self.cpu_time * 1000, 3),
+        }
+
+
+class Compressor:
+    """
+    Incremental compressor for one body. ``compress(chunk)`` returns the
+    bytes that can be sent so far (all of them for ``chunk`` unless
+    ``sync=False``), ``finish()`` the rest of the stream.
+    """
+
+    def __init__(self, encoding):
+        self.stats = CompressionStats(encoding)
+        self.engine = self.create_engine()
+
+    def create_engine(self):
+        raise NotImplementedError
+
+    def process(self, chunk, sync):
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+    def compress(self, chunk, sync=True):
+        start = time.thread_time()
+        data = self.process(chunk, sync)
+        self.stats.cpu_time += time.thread_time() - start
+        self.stats.original_size += len(chunk)
+        self.stats.compressed_size += len(data)
+        return data
+
+    def finish(self):
+        start = time.thread_time()
+        data = self.flush()
+        self.stats.cpu_time += time.thread_time() - start
+        self.stats.compressed_size += len(data)
+        return data
+
+
+class GzipCompressor(Compressor):
+    def create_engine(self):
+        # wbits 31: gzip container, with a zero mtime so equal bodies compress equally
+        return zlib.compressobj(get_setting('GZIP_LEVEL'), zlib.DEFLATED, 31)
+
+    def process(self, chunk, sync):
+        data = self.engine.compress(chunk)
+        # Sync flush so every chunk of a stream reaches the client without waiting for more
+        return data + self.engine.flush(zlib.Z_SYNC_FLUSH) if sync else data
+
+    def flush(self):
+        return self.engine.flush()
+
+
+class BrotliCompressor(Compressor):
+    def create_engine(self):
+        return brotli.Compressor(quality=get_setting('BROTLI_QUALITY'))
+
+    def process(self, chunk, sync):
+        data = self.engine.process(chunk)
+        return data + self.engine.flush() if sync else data
+
+    def flush(self):
+        return self.engine.finish()
+
+
+class ZstdCompressor(Compressor):
+    def create_engine(self):
+        return zstandard.ZstdCompressor(level=get_setting('ZSTD_LEVEL')).compressobj()
+
+    def process(self, chunk, sync):
+        data = self.engine.compress(chunk)
+        return data + self.engine.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if sync else data
+
+    def flush(self):
+        return self.engine.flush()
+
+
+COMPRESSORS = {
+    'gzip': GzipCompressor,
+    'br': BrotliCompressor if brotli is not None else None,
+    'zstd': ZstdCompressor if zstandard is not None else None,
+}
+
+
+def available_encodings():
+    """Configured encodings whose codec is installed, in order of preference"""
+    return [encoding for encoding in get_setting('ENCODINGS') if COMPRESSORS.get(encoding)]
+
+
+def parse_accept_encoding(header):
+    """Return ``{coding: q}`` for an Accept-Encoding header value"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header):
+    """The preferred available encoding the client accepts, or None"""
+    accepted = parse_accept_encoding(header)
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def get_compressor(encoding):
+    return COMPRESSORS[encoding](encoding)
+
+
+def compress_body(encoding, content):
+    """Compress a whole body; returns ``(data, stats)``"""
+    compressor = get_compressor(encoding)
+    data = compressor.compress(content, sync=False) + compressor.finish()
+    return data, compressor.stats
+
+
+def compress_stream(compressor, chunks):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(compressor, chunks):
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
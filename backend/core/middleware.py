@@ -1,6 +1,11 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.utils import translation
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 
+from . import compression, routers
+from .querybudget import QueryBudgetExceeded, check_budget, get_setting, get_view_budget, logger, track_queries
+
 class LanguageMiddleware(MiddlewareMixin):
     """
     Middleware to set language based on Accept-Language header from frontend
@@ -30,3 +35,175 @@ class LanguageMiddleware(MiddlewareMixin):
             # Default to English
             translation.activate('en')
             request.LANGUAGE_CODE = 'en'
+
+
+class QueryBudgetMiddleware:
+    """
+    Count the queries and DB time of each request, enforce the query budget
+    declared by the view and flag repeated identical SQL shapes (N+1 queries)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not get_setting('ENABLED'):
+            return self.get_response(request)
+
+        request.query_budget = None
+        with track_queries() as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        if not get_setting('ENABLED'):
+            return await self.get_response(request)
+
+        request.query_budget = None
+        # The async ORM runs queries on the request's thread-sensitive sync
+        # thread, so the execute wrappers are installed on that thread's connections
+        tracker = track_queries()
+        stats = await sync_to_async(tracker.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(tracker.__exit__)(None, None, None)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        response.query_stats = stats
+        if get_setting('SERVER_TIMING_HEADER'):
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+            )
+
+        if getattr(request, 'query_budget_exempt', False):
+            return response
+        problems = check_budget(stats, request.query_budget, f'{request.method} {request.path}')
+        if problems:
+            if get_setting('RAISE'):
+                raise QueryBudgetExceeded('\n'.join(problems))
+            for problem in problems:
+                logger.warning(problem)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func, request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let the reads of safe requests go to the read replicas, unless the client
+    wrote within REPLICA_ROUTING['PIN_SECONDS']; unsafe requests read from the
+    primary and pin their client to it (see core.routers)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.replica_reads.set(routers.use_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.replica_reads.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = routers.replica_reads.set(routers.use_replicas(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.replica_reads.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in routers.SAFE_METHODS and routers.get_setting('REPLICAS'):
+            routers.pin_to_primary(request)
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress response bodies with the best encoding the client accepts (see
+    core.compression). Short bodies, already encoded or compressed media and
+    partial content are left alone; streaming bodies are compressed chunk by
+    chunk. ``response.compression_stats`` carries the sizes and CPU time.
+
+    A client that accepts compression gets weak ETags, on every 200 and 304
+    it receives, compressed or not, so its validator never changes between
+    a full response and a revalidation.
+    """
+
+    def process_response(self, request, response):
+        if not compression.get_setting('ENABLED'):
+            return response
+        if response.status_code == 304:
+            if compression.negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')) is not None:
+                patch_vary_headers(response, ('Accept-Encoding',))
+                self.weaken_etag(response)
+            return response
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        # Compressed bytes differ from the identity ones, so a strong ETag has to become weak
+        self.weaken_etag(response)
+
+        if response.streaming:
+            compressor = compression.get_compressor(encoding)
+            if response.is_async:
+                response.streaming_content = compression.acompress_stream(compressor, response.streaming_content)
+            else:
+                response.streaming_content = compression.compress_stream(compressor, response.streaming_content)
+            # The compressed size is only known once the stream has been sent
+            del response.headers['Content-Length']
+            stats = compressor.stats
+        else:
+            if len(response.content) < compression.get_setting('MIN_SIZE'):
+                return response
+            content, stats = compression.compress_body(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+            if compression.get_setting('SERVER_TIMING_HEADER'):
+                timing = (
+                    f'compress;dur={stats.cpu_time * 1000:.2f};'
+                    f'desc="{encoding} {stats.original_size}->{stats.compressed_size}"'
+                )
+                existing = response.get('Server-Timing')
+                response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        response.compression_stats = stats
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return False
+        content_type = response.get('Content-Type', '').lower()
+        if content_type.startswith(tuple(compression.get_setting('EXCLUDED_TYPES'))):
+            return False
+        return compression.get_setting('STREAMING') if response.streaming else True
+
+    @staticmethod
+    def weaken_etag(response):
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
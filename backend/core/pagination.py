@@ -0,0 +1,294 @@
+import json
+from base64 import b64decode, b64encode
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination keyed on the queryset ordering plus the primary key.
+
+    Each page is fetched with a ``WHERE (key, id) < (last_key, last_id)`` style
+    predicate instead of an OFFSET, and no COUNT(*) is issued, so the cost of a
+    page does not depend on how deep into the result set it is.
+    ``apaginate_queryset`` fetches the same page through the async ORM.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+    default_ordering = '-created_at'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """The unevaluated query for the requested page, None when pagination is off"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.field, self.descending = self.get_sort_key(queryset)
+        self.cursor = self.decode_cursor(request, queryset)
+
+        queryset = queryset.order_by(*self.get_ordering(reverse=False))
+        self.reverse = False
+        if self.cursor is not None:
+            value, pk, self.reverse = self.cursor
+            queryset = queryset.filter(self.get_seek_filter(value, pk, self.reverse))
+            if self.reverse:
+                queryset = queryset.order_by(*self.get_ordering(reverse=True))
+
+        # Fetch one extra row to know whether another page follows
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_sort_key(self, queryset):
+        """
+        Return ``(field_name, descending)`` for the leading ordering term.
+
+        Annotations (such as a search rank) are supported as sort keys.
+        Falls back to the model's Meta ordering and finally to the primary key.
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or [self.default_ordering]
+        term = ordering[0]
+        if not isinstance(term, str):
+            term = self.default_ordering
+        descending = term.startswith('-')
+        field = term.lstrip('-')
+        if field == 'pk':
+            field = queryset.model._meta.pk.name
+        self.pk_name = queryset.model._meta.pk.name
+        self.is_annotation = field in queryset.query.annotations
+        if self.is_annotation:
+            self.model_field = queryset.query.annotations[field].output_field
+            return field, descending
+        try:
+            self.model_field = queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            self.model_field = queryset.model._meta.pk
+            field, descending = self.model_field.name, False
+        return field, descending
+
+    def get_ordering(self, reverse):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        if self.field == self.pk_name:
+            return [prefix + self.pk_name]
+        return [prefix + self.field, prefix + self.pk_name]
+
+    def get_seek_filter(self, value, pk, reverse):
+        """Build the row-value comparison that skips everything up to the cursor"""
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        if self.field == self.pk_name:
+            return Q(**{f'{self.pk_name}__{lookup}': pk})
+        return (
+            Q(**{f'{self.field}__{lookup}': value}) |
+            Q(**{self.field: value, f'{self.pk_name}__{lookup}': pk})
+        )
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = self.model_field.to_python(payload['v'])
+            pk = queryset.model._meta.pk.to_python(payload['id'])
+            reverse = bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            # Pages of a values() queryset hold dicts instead of model instances
+            obj = SimpleNamespace(**obj)
+        if self.is_annotation:
+            value = str(getattr(obj, self.field))
+        else:
+            value = self.model_field.value_to_string(obj)
+        payload = {
+            'v': value,
+            'id': getattr(obj, self.pk_name),
+        }
+        if reverse:
+            payload['r'] = True
+        encoded = b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': str(_('The pagination cursor value.')),
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': str(_('Number of results to return per page.')),
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """PageNumberPagination that can also fetch its page through the async ORM"""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views: the same pages, links and errors"""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Counted here so the paginator does not query on its own
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        bottom = (number - 1) * paginator.per_page
+        top = bottom + paginator.per_page
+        if top + paginator.orphans >= paginator.count:
+            top = paginator.count
+        results = [row async for row in queryset[bottom:top]]
+        self.page = paginator._get_page(results, number, paginator)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return results
+
+
+class StandardPagination(BasePagination):
+    """
+    Default API pagination.
+
+    Uses page-number pagination unless the client opts into keyset pagination
+    with ``?pagination=cursor`` (or by following a ``cursor`` link).
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    page_number_class = AsyncPageNumberPagination
+    keyset_class = KeysetPagination
+
+    @classmethod
+    def is_cursor_request(cls, request):
+        params = request.query_params
+        return (
+            params.get(cls.mode_query_param) == cls.cursor_mode
+            or cls.keyset_class.cursor_query_param in params
+        )
+
+    def get_paginator(self, request):
+        if self.is_cursor_request(request):
+            return self.keyset_class()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() through the async ORM, for async views"""
+        self.paginator = self.get_paginator(request)
+        return await self.paginator.apaginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = self.page_number_class().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': str(_('Set to "cursor" for keyset pagination.')),
+            'schema': {'type': 'string', 'enum': [self.cursor_mode]},
+        })
+        return parameters + self.keyset_class().get_schema_operation_parameters(view)
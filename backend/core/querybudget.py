@@ -0,0 +1,112 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.querybudget')
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Raise QueryBudgetExceeded instead of logging a warning (used by the test suite)
+    'RAISE': False,
+    # The same SQL shape executed more than this many times in one request is an N+1
+    'DUPLICATE_THRESHOLD': 2,
+    # Add a Server-Timing header with the query count and DB time
+    'SERVER_TIMING_HEADER': False,
+}
+
+# Collapse "IN (%s, %s, %s)" style placeholder lists so batch sizes share a shape
+PLACEHOLDER_LIST_RE = re.compile(r'%s(?:,\s*%s)+')
+
+
+def get_setting(name):
+    return getattr(settings, 'QUERY_BUDGET', {}).get(name, DEFAULTS[name])
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request exceeds its query budget or repeats a query shape"""
+
+
+class QueryStats:
+    """Query count, DB time and SQL shapes collected while tracking"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper, see ``connection.execute_wrapper``"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[PLACEHOLDER_LIST_RE.sub('%s, ...', sql)] += 1
+
+    def duplicates(self, threshold=None):
+        """Return ``{sql: times}`` for shapes executed more than ``threshold`` times"""
+        if threshold is None:
+            threshold = get_setting('DUPLICATE_THRESHOLD')
+        return {sql: times for sql, times in self.shapes.items() if times > threshold}
+
+
+@contextmanager
+def track_queries():
+    """Count every query issued on any configured database inside the block"""
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+def query_budget(limit):
+    """
+    Declare the query budget of a function-based view.
+    Class-based views set a ``query_budget`` attribute instead, either an int
+    or a dict keyed by viewset action (or lowercase HTTP method for other
+    views) with an optional 'default' entry.
+    """
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def exempt_request(request):
+    """
+    Skip the budget and duplicate checks for ``request`` (an HttpRequest or a
+    DRF Request), for views whose query count grows with their input by
+    design, such as batched imports. Its queries are still counted.
+    """
+    request = getattr(request, '_request', request)
+    request.query_budget_exempt = True
+
+
+def get_view_budget(view_func, request):
+    """Resolve the budget declared for the view handling ``request``, or None"""
+    view_class = getattr(view_func, 'cls', None)
+    budget = getattr(view_class, 'query_budget', None)
+    if budget is None:
+        budget = getattr(view_func, 'query_budget', None)
+    if isinstance(budget, dict):
+        method = request.method.lower()
+        actions = getattr(view_func, 'actions', None) or {}
+        budget = budget.get(actions.get(method, method), budget.get('default'))
+    return budget
+
+
+def check_budget(stats, budget, label):
+    """Return a list of human-readable budget violations"""
+    problems = []
+    if budget is not None and stats.count > budget:
+        problems.append(f'{label} ran {stats.count} queries, budget is {budget}')
+    for sql, times in stats.duplicates().items():
+        problems.append(f'{label} repeated the same query {times} times: {sql}')
+    return problems
@@ -0,0 +1,94 @@
+"""
+Fast renderers and parsers for the API.
+
+ORJSONRenderer produces exactly the bytes of DRF's JSONRenderer (compact,
+UTF-8, U+2028/U+2029 escaped, datetimes and decimals as DRF's encoder
+formats them) using orjson; UUIDs and the rest of the JSON types are
+encoded natively. MessagePackRenderer/MessagePackParser speak
+``application/msgpack`` for clients that opt in through Accept and
+Content-Type; values are the same as in the JSON output. msgpack is an
+optional dependency, see settings.REST_FRAMEWORK.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Datetimes go through DRF's encoder, which trims microseconds to milliseconds
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+drf_encoder = encoders.JSONEncoder()
+
+
+def encode_default(obj):
+    """Types neither orjson nor msgpack handle the way DRF does: datetimes, decimals, lazy strings..."""
+    return drf_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer output, encoded by orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        # Pretty-printed, ASCII-only or custom-encoder output stays with the stock renderer
+        if (
+            self.get_indent(accepted_media_type, renderer_context)
+            or self.encoder_class is not encoders.JSONEncoder
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits and the like; json has no such limits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer: the separators are invalid in JavaScript strings
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser, decoding with orjson"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            # orjson rejects NaN and Infinity, as JSONParser does with STRICT_JSON
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack encoding of the same values the JSON renderer outputs"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    """Parse MessagePack request bodies"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
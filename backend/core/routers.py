@@ -0,0 +1,116 @@
+"""
+Read-replica database routing.
+
+ReplicaRouter sends reads to one of REPLICA_ROUTING['REPLICAS'] only while
+ReplicaRoutingMiddleware has opted the current request in; everything else
+(writes, management commands, reads inside a transaction) uses the primary.
+
+A request is opted in when its method is safe and its client has not
+written within PIN_SECONDS. An unsafe request stays on the primary for all
+of its reads and pins its client to the primary for the next PIN_SECONDS,
+so clients read their own writes despite replication lag. Clients are told
+apart by the JWT's user id claim (read without verifying the token, it only
+picks the database), the anonymous token or the session cookie. Register
+and login respond with tokens for a user the request was not authenticated
+as, so they name that user with ``pin_user`` and the pin covers the new
+tokens too. The pins live in the default cache, which has to be shared
+between the worker processes of a deployment.
+"""
+import binascii
+import hashlib
+import json
+import random
+from base64 import urlsafe_b64decode
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.settings import api_settings
+
+from todo.anonymous import COOKIE_NAME as ANONYMOUS_COOKIE_NAME
+
+DEFAULTS = {
+    # Database aliases reads may be served from; none means every read uses the primary
+    'REPLICAS': [],
+    # Seconds a client reads from the primary after writing
+    'PIN_SECONDS': 5,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_KEY_PREFIX = 'replica-pin:'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_setting(name):
+    return getattr(settings, 'REPLICA_ROUTING', {}).get(name, DEFAULTS[name])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_setting('REPLICAS')
+        if not replicas or not replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_setting('REPLICAS')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary
+        return False if db in get_setting('REPLICAS') else None
+
+
+def get_client_keys(request):
+    """Cache keys identifying the client making ``request``, without authenticating it"""
+    keys = []
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        keys.append(f'user:{user.pk}')
+    if getattr(request, 'issued_user_id', None) is not None:
+        keys.append(f'user:{request.issued_user_id}')
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme in api_settings.AUTH_HEADER_TYPES and token.count('.') == 2:
+        try:
+            payload = json.loads(urlsafe_b64decode(token.split('.')[1] + '=='))
+        except (binascii.Error, ValueError):
+            payload = None
+        if isinstance(payload, dict) and payload.get(api_settings.USER_ID_CLAIM) is not None:
+            keys.append(f'user:{payload[api_settings.USER_ID_CLAIM]}')
+    for credential in (
+        request.META.get('HTTP_X_ANONYMOUS_TOKEN'),
+        request.COOKIES.get(ANONYMOUS_COOKIE_NAME),
+        getattr(request, 'issued_anonymous_token', None),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+    ):
+        if credential:
+            keys.append('credential:' + hashlib.sha256(credential.encode()).hexdigest())
+    return [PIN_KEY_PREFIX + key for key in dict.fromkeys(keys)]
+
+
+def use_replicas(request):
+    """Whether ``request``'s reads may be served from the replicas"""
+    if not get_setting('REPLICAS') or request.method not in SAFE_METHODS:
+        return False
+    keys = get_client_keys(request)
+    return not (keys and cache.get_many(keys))
+
+
+def pin_to_primary(request):
+    """Serve the reads of ``request``'s client from the primary for PIN_SECONDS"""
+    keys = get_client_keys(request)
+    if keys:
+        cache.set_many(dict.fromkeys(keys, True), get_setting('PIN_SECONDS'))
+
+
+def pin_user(request, user):
+    """Include ``user`` in the pin of ``request``'s client, for views that hand out its tokens"""
+    getattr(request, '_request', request).issued_user_id = user.pk
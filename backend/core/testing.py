@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+
+from .querybudget import check_budget, track_queries
+
+
+class QueryBudgetTestMixin:
+    """
+    Test case helpers for query budgets.
+    Use together with ``override_settings(QUERY_BUDGET={'RAISE': True})`` so
+    that every request made through the test client enforces its view budget.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget=None):
+        """Fail if the block runs more than ``budget`` queries or repeats a query shape"""
+        with track_queries() as stats:
+            yield stats
+        problems = check_budget(stats, budget, 'Block')
+        if problems:
+            self.fail('\n'.join(problems))
@@ -0,0 +1,62 @@
+"""
+Change tracking for model instances.
+
+A tracked instance remembers the column values it was loaded or last saved
+with. A plain ``save()`` of a loaded instance then writes only the columns
+that changed since (plus ``auto_now`` columns), and issues no statement at
+all - and sends no save signals - when nothing changed. Passing
+``update_fields`` explicitly bypasses the tracking.
+"""
+from django.db.models import DEFERRED
+
+
+class FieldTrackingMixin:
+    """Mix into a Model, before models.Model"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = {
+            name: value for name, value in zip(field_names, values) if value is not DEFERRED
+        }
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.mark_saved(kwargs.get('fields'))
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            changed = self.get_changed_fields()
+            if changed is not None:
+                if not changed:
+                    return
+                update_fields = {
+                    *changed, *(field.attname for field in self._meta.concrete_fields if getattr(field, 'auto_now', False))
+                }
+        super().save(*args, update_fields=update_fields, **kwargs)
+        self.mark_saved(update_fields)
+
+    def mark_saved(self, fields=None):
+        """Record the current values of ``fields`` (default: every loaded field) as saved"""
+        saved = self.__dict__.setdefault('_saved_values', {})
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                saved[field.attname] = field.value_from_object(self)
+
+    def get_changed_fields(self):
+        """
+        Attribute names of the fields changed since the instance was loaded or
+        saved, or None for an instance that was neither
+        """
+        saved = getattr(self, '_saved_values', None)
+        if saved is None:
+            return None
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if field.attname in saved and not field.primary_key
+            and field.value_from_object(self) != saved[field.attname]
+        ]
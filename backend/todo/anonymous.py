@@ -0,0 +1,55 @@
+"""
+Anonymous client tokens.
+
+Each anonymous client gets its own todo list, keyed by an opaque token it
+sends in the X-Anonymous-Token header (or the anonymous_token cookie).
+A client without a valid token is issued a new one the first time a todo
+endpoint needs it; the response carries it back in the same header and
+cookie. Anonymous list cost therefore scales with the client's own todos
+instead of every anonymous todo on the site.
+"""
+import re
+import secrets
+
+from django.conf import settings
+
+HEADER = 'X-Anonymous-Token'
+COOKIE_NAME = 'anonymous_token'
+
+# secrets.token_urlsafe(24) produces 32 characters; accept any URL-safe
+# token that fits Todo.anonymous_token
+TOKEN_RE = re.compile(r'[A-Za-z0-9_-]{16,48}')
+
+
+def get_anonymous_token(request):
+    """
+    Token of the anonymous client making ``request`` (an HttpRequest or a
+    DRF Request). A new token is issued when the client sent none.
+    """
+    request = getattr(request, '_request', request)
+    token = request.META.get('HTTP_X_ANONYMOUS_TOKEN') or request.COOKIES.get(COOKIE_NAME, '')
+    if TOKEN_RE.fullmatch(token):
+        return token
+    if not getattr(request, 'issued_anonymous_token', None):
+        request.issued_anonymous_token = secrets.token_urlsafe(24)
+    return request.issued_anonymous_token
+
+
+def get_request_list_key(request):
+    """List key (see todo.models.get_list_key) of the todos ``request`` may see"""
+    if request.user.is_authenticated:
+        return request.user.pk
+    return get_anonymous_token(request)
+
+
+def set_anonymous_token(request, response):
+    """Send the token issued while handling ``request``, if any, back to the client"""
+    token = getattr(getattr(request, '_request', request), 'issued_anonymous_token', None)
+    if token:
+        response[HEADER] = token
+        response.set_cookie(
+            COOKIE_NAME, token,
+            max_age=getattr(settings, 'ANONYMOUS_TOKEN_COOKIE_AGE', 60 * 60 * 24 * 365),
+            httponly=True, samesite='Lax',
+        )
+    return response
@@ -0,0 +1,173 @@
+"""
+Async-native todo views for ASGI deployments (see todolist_project.async_urls).
+
+They serve the hot paths of TodoViewSet - list, completed, pending,
+retrieve, create, update, toggle and delete - through the async ORM and
+reuse its serializer, paginator (through apaginate_queryset), conditional
+GET helpers and write functions; responses are rendered in the media type
+the client negotiated. Delta sync, rejected pages and cursors, missing
+todos, non-JSON bodies and authentication errors are delegated to the
+viewset itself. Only writes leave the event loop: each runs its
+transaction in a single sync_to_async call since Django has no async
+transactions.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from core.async_views import aget_user, api_response, delegate, parse_json_body
+from core.pagination import StandardPagination
+from core.querybudget import query_budget
+from .anonymous import get_anonymous_token, set_anonymous_token
+from .conditional import aconditional_list
+from .models import Todo
+from .serializers import TodoSerializer, list_values, represent_todos
+from .views import TodoViewSet
+from .writes import create_todo, delete_todo, toggle_todo, update_todo
+
+sync_list = TodoViewSet.as_view({'get': 'list', 'post': 'create'}, basename='todo', detail=False)
+sync_detail = TodoViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='todo', detail=True,
+)
+sync_toggle = TodoViewSet.as_view({'patch': 'toggle_completed'}, basename='todo', detail=True)
+sync_completed = TodoViewSet.as_view({'get': 'completed'}, basename='todo', detail=False)
+sync_pending = TodoViewSet.as_view({'get': 'pending'}, basename='todo', detail=False)
+
+
+def get_queryset(request):
+    anonymous_token = '' if request.user.is_authenticated else get_anonymous_token(request)
+    return Todo.objects.select_related('user').owned_by(request.user, anonymous_token)
+
+
+async def list_response(request, queryset, sync_view, paginate=False):
+    """
+    TodoViewSet.list_response() through the async ORM, paginated by the
+    viewset's paginator; pages and cursors it rejects are delegated
+    """
+    rows = list_values(queryset)
+    drf_request = Request(request)
+    if paginate or StandardPagination.is_cursor_request(drf_request):
+        paginator = TodoViewSet.pagination_class()
+        try:
+            page = await paginator.apaginate_queryset(rows, drf_request)
+        except NotFound:
+            return await delegate(sync_view, request)
+        if page is not None:
+            return api_response(request, paginator.get_paginated_response(represent_todos(page)).data)
+    return api_response(request, represent_todos([row async for row in rows]))
+
+
+def sends_anonymous_token(view):
+    """Return the anonymous token issued while handling the request to the client"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return set_anonymous_token(request, await view(request, *args, **kwargs))
+    return wrapper
+
+
+@aconditional_list
+async def paginated_list(request):
+    return await list_response(request, get_queryset(request), sync_list, paginate=True)
+
+
+@query_budget({'get': 4, 'post': 5})
+@csrf_exempt
+@sends_anonymous_token
+async def todo_list(request):
+    """List (paginated) or create todos"""
+    user = await aget_user(request)
+    if user is None:
+        return await delegate(sync_list, request)
+
+    if request.method == 'GET' and 'since' not in request.GET:
+        return await paginated_list(request)
+
+    data = parse_json_body(request) if request.method == 'POST' else None
+    if data is None:
+        return await delegate(sync_list, request)
+    serializer = TodoSerializer(data=data)
+    if not serializer.is_valid():
+        return api_response(request, serializer.errors, status=400)
+    if user.is_authenticated:
+        await sync_to_async(create_todo)(serializer, user)
+    else:
+        await sync_to_async(create_todo)(serializer, None, get_anonymous_token(request))
+    return api_response(request, serializer.data, status=201)
+
+
+@aconditional_list
+async def filtered_list_response(request, completed, sync_view):
+    return await list_response(request, get_queryset(request).filter(completed=completed), sync_view)
+
+
+async def filtered_list(request, completed, sync_view):
+    user = await aget_user(request)
+    if user is None or request.method != 'GET':
+        return await delegate(sync_view, request)
+    return await filtered_list_response(request, completed, sync_view)
+
+
+@query_budget(3)
+@csrf_exempt
+@sends_anonymous_token
+async def todo_completed(request):
+    """All completed todo items for current user/anonymous"""
+    return await filtered_list(request, True, sync_completed)
+
+
+@query_budget(3)
+@csrf_exempt
+@sends_anonymous_token
+async def todo_pending(request):
+    """All pending todo items for current user/anonymous"""
+    return await filtered_list(request, False, sync_pending)
+
+
+@query_budget({'get': 2, 'put': 6, 'patch': 6, 'delete': 7, 'default': 5})
+@csrf_exempt
+@sends_anonymous_token
+async def todo_detail(request, pk):
+    """Retrieve, update or delete a todo"""
+    user = await aget_user(request)
+    if user is None or request.method not in ('GET', 'PUT', 'PATCH', 'DELETE'):
+        return await delegate(sync_detail, request, pk=pk)
+    data = None
+    if request.method in ('PUT', 'PATCH'):
+        data = parse_json_body(request)
+        if data is None:
+            return await delegate(sync_detail, request, pk=pk)
+
+    todo = await get_queryset(request).filter(pk=pk).afirst()
+    if todo is None:
+        return await delegate(sync_detail, request, pk=pk)
+
+    if request.method == 'GET':
+        return api_response(request, TodoSerializer(todo).data)
+    if request.method == 'DELETE':
+        await sync_to_async(delete_todo)(todo)
+        return HttpResponse(status=204)
+    serializer = TodoSerializer(todo, data=data, partial=request.method == 'PATCH')
+    if not serializer.is_valid():
+        return api_response(request, serializer.errors, status=400)
+    await sync_to_async(update_todo)(serializer)
+    return api_response(request, serializer.data)
+
+
+@query_budget(6)
+@csrf_exempt
+@sends_anonymous_token
+async def todo_toggle(request, pk):
+    """Toggle the completion status of a todo item"""
+    user = await aget_user(request)
+    if user is None or request.method != 'PATCH':
+        return await delegate(sync_toggle, request, pk=pk)
+    todo = await get_queryset(request).filter(pk=pk).afirst()
+    if todo is None:
+        return await delegate(sync_toggle, request, pk=pk)
+    todo = await sync_to_async(toggle_todo)(todo)
+    return api_response(request, TodoSerializer(todo).data)
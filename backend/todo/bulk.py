@@ -0,0 +1,174 @@
+"""
+Bulk todo operations.
+
+A batch is validated as a whole and then applied in one transaction with a
+fixed number of statements: one bulk INSERT for creates, one UPDATE per
+distinct change set (or a single CASE-based bulk UPDATE when the changes
+differ), one UPDATE for toggles and one DELETE plus its tombstone INSERT.
+The affected rows are read once, locked, up front: the list counters are
+adjusted from their completion state with one upsert, and rows deleted
+since validation come back as ``not_found`` items.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Todo, TodoListState, TodoTombstone, add_deltas, get_list_key, status_delta
+from .serializers import TodoSerializer
+
+OPERATIONS = ('create', 'update', 'delete', 'toggle')
+
+# Upper bound on the number of operations accepted in one request
+MAX_OPERATIONS = 500
+
+
+class BulkOperationError(Exception):
+    """Raised when the batch envelope itself is invalid"""
+
+
+def is_todo_id(value):
+    """Whether ``value`` is an integer id; JSON true/false decode to bools, which are ints too"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_operations(operations, queryset):
+    """
+    Validate every operation against ``queryset`` (the caller's scope).
+    Returns ``(plan, results, has_errors)`` where results holds one entry per
+    operation, pre-filled with errors for the invalid ones.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BulkOperationError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise BulkOperationError(f'At most {MAX_OPERATIONS} operations are allowed per request')
+
+    results = []
+    plan = {'create': [], 'update': [], 'delete': [], 'toggle': []}
+    seen_ids = set()
+    has_errors = False
+
+    target_ids = {
+        item.get('id') for item in operations
+        if isinstance(item, dict) and item.get('op') != 'create' and is_todo_id(item.get('id'))
+    }
+    existing = set(queryset.filter(id__in=target_ids).values_list('id', flat=True)) if target_ids else set()
+
+    for index, item in enumerate(operations):
+        result = {'index': index}
+        results.append(result)
+        errors = None
+        if not isinstance(item, dict) or item.get('op') not in OPERATIONS:
+            errors = {'op': [f'Must be one of: {", ".join(OPERATIONS)}']}
+        else:
+            op = result['op'] = item['op']
+            fields = {key: value for key, value in item.items() if key not in ('op', 'id')}
+            if op == 'create':
+                serializer = TodoSerializer(data=fields)
+                if serializer.is_valid():
+                    plan['create'].append((index, serializer.validated_data))
+                else:
+                    errors = serializer.errors
+            else:
+                todo_id = result['id'] = item.get('id')
+                if not is_todo_id(todo_id):
+                    errors = {'id': ['A valid integer is required.']}
+                elif todo_id in seen_ids:
+                    errors = {'id': ['Each todo may appear only once per batch.']}
+                elif todo_id not in existing:
+                    errors = {'id': ['Not found.']}
+                elif op == 'update':
+                    serializer = TodoSerializer(data=fields, partial=True)
+                    if not fields:
+                        errors = {'non_field_errors': ['No fields to update.']}
+                    elif serializer.is_valid():
+                        plan['update'].append((index, todo_id, serializer.validated_data))
+                    else:
+                        errors = serializer.errors
+                else:
+                    plan[op].append((index, todo_id))
+                if is_todo_id(todo_id):
+                    seen_ids.add(todo_id)
+        if errors:
+            result.update(status='error', errors=errors)
+            has_errors = True
+    return plan, results, has_errors
+
+
+def apply_operations(plan, results, queryset, owner, anonymous_token=''):
+    """
+    Apply a validated plan atomically and fill in the per-item results.
+    Created todos belong to ``owner``, or with owner None, to the anonymous
+    client ``anonymous_token``.
+    """
+    now = timezone.now()
+    anonymous_token = '' if owner else anonymous_token
+    key = get_list_key(owner.pk if owner else None, anonymous_token)
+    with transaction.atomic(using=queryset.db):
+        # Lock the targeted rows; any deleted since validation are reported as not found
+        target_ids = [todo_id for _, todo_id, _ in plan['update']] + [
+            todo_id for op in ('toggle', 'delete') for _, todo_id in plan[op]
+        ]
+        locked = queryset.filter(id__in=target_ids).select_for_update().in_bulk() if target_ids else {}
+        for op in ('update', 'toggle', 'delete'):
+            for index, todo_id, *_ in plan[op]:
+                if todo_id not in locked:
+                    results[index]['status'] = 'not_found'
+        updates = [item for item in plan['update'] if item[1] in locked]
+        toggle_ids = [todo_id for _, todo_id in plan['toggle'] if todo_id in locked]
+        delete_ids = [todo_id for _, todo_id in plan['delete'] if todo_id in locked]
+        # Completion state before the changes, for the list counters
+        before = {todo_id: todo.completed for todo_id, todo in locked.items()}
+
+        created = Todo.objects.using(queryset.db).bulk_create([
+            Todo(user=owner, anonymous_token=anonymous_token, **data) for _, data in plan['create']
+        ])
+
+        change_sets = {tuple(sorted(data.items())) for _, _, data in updates}
+        if len(change_sets) == 1:
+            # Typical "mark all done": one UPDATE ... WHERE id IN (...)
+            queryset.filter(id__in=[todo_id for _, todo_id, _ in updates]).update(
+                updated_at=now, **updates[0][2]
+            )
+        elif change_sets:
+            # Apply each change set onto its loaded row, so the columns an item
+            # did not send keep their values in the union of updated fields
+            todos = []
+            fields = {'updated_at'}
+            for _, todo_id, data in updates:
+                todo = locked[todo_id]
+                for name, value in data.items():
+                    setattr(todo, name, value)
+                todo.updated_at = now
+                todos.append(todo)
+                fields.update(data)
+            Todo.objects.using(queryset.db).bulk_update(todos, sorted(fields), batch_size=MAX_OPERATIONS)
+
+        if toggle_ids:
+            queryset.filter(id__in=toggle_ids).update(completed=~F('completed'), updated_at=now)
+
+        if delete_ids:
+            TodoTombstone.record([(todo_id, key) for todo_id in delete_ids], using=queryset.db)
+            queryset.filter(id__in=delete_ids).delete()
+
+        deltas = [status_delta(todo.completed) for todo in created]
+        for _, todo_id, data in updates:
+            if 'completed' in data:
+                deltas += [status_delta(before[todo_id], -1), status_delta(data['completed'])]
+        for todo_id in toggle_ids:
+            deltas += [status_delta(before[todo_id], -1), status_delta(not before[todo_id])]
+        for todo_id in delete_ids:
+            deltas.append(status_delta(before[todo_id], -1))
+        TodoListState.objects.using(queryset.db).touch({key: add_deltas(*deltas)})
+
+        changed_ids = [todo_id for _, todo_id, _ in updates] + toggle_ids
+        changed = queryset.filter(id__in=changed_ids).in_bulk() if changed_ids else {}
+
+    for (index, _), todo in zip(plan['create'], created):
+        results[index].update(status='created', id=todo.id, todo=todo)
+    for index, todo_id, *_ in plan['update'] + plan['toggle']:
+        if todo_id in changed:
+            results[index].update(status='updated', todo=changed[todo_id])
+    for index, todo_id in plan['delete']:
+        if todo_id in delete_ids:
+            results[index]['status'] = 'deleted'
+    return results
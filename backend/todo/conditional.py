@@ -0,0 +1,83 @@
+"""
+Conditional GET support for the per-user todo list endpoints.
+
+Validators come from the list's TodoListState row (a single primary key
+lookup), so a matching If-None-Match / If-Modified-Since is answered with
+304 before the todo queryset is evaluated or serialized.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .anonymous import get_request_list_key
+from .models import TodoListState, get_list_scope
+
+
+def get_list_validators(request, scope):
+    """Return ``(etag, last_modified)`` for ``request`` against the list ``scope``"""
+    state = TodoListState.objects.filter(scope=scope).values_list('version', 'updated_at').first()
+    return build_validators(request, scope, state)
+
+
+async def aget_list_validators(request, scope):
+    """Async variant of get_list_validators() for async views"""
+    state = await TodoListState.objects.filter(scope=scope).values_list('version', 'updated_at').afirst()
+    return build_validators(request, scope, state)
+
+
+def build_validators(request, scope, state):
+    version, updated_at = state or (0, None)
+    # Every input that changes the response body is part of the ETag: the list
+    # version, the endpoint and its query parameters, the negotiated media type
+    # and the creator name rendered into each row
+    variant = '|'.join([
+        scope,
+        str(version),
+        request.path,
+        '&'.join(sorted(request.META.get('QUERY_STRING', '').split('&'))),
+        request.META.get('HTTP_ACCEPT', ''),
+        request.user.username if request.user.is_authenticated else '',
+    ])
+    etag = '"todos-%s"' % hashlib.sha256(variant.encode('utf-8')).hexdigest()[:32]
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    """Attach the validators and per-user cache policy to a list response"""
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # Per-user data: never store in shared caches, always revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_list(view_method):
+    """
+    Decorate a viewset list method so it honours If-None-Match and
+    If-Modified-Since for the current user's (or anonymous client's) todo list
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = get_list_validators(request, get_list_scope(get_request_list_key(request)))
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+    return wrapper
+
+
+def aconditional_list(view):
+    """Async variant of conditional_list() for async view functions"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        etag, last_modified = await aget_list_validators(request, get_list_scope(get_request_list_key(request)))
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+    return wrapper
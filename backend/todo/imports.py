@@ -0,0 +1,112 @@
+"""
+Streaming bulk import of todos from NDJSON or CSV.
+
+The upload is decoded and parsed row by row, validated with TodoSerializer
+in batches and inserted with one bulk_create per batch. Every batch is its
+own transaction together with its TodoListState update, so a failing row
+only skips that row and a large import never holds one long transaction.
+Columns the serializer does not accept (``id``, ``created_at``, ...) are
+ignored, which lets an export be imported again.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Todo, TodoListState, get_list_key
+from .serializers import TodoSerializer
+
+IMPORT_FORMATS = ['ndjson', 'csv']
+
+BATCH_SIZE = 500
+
+# Only the first errors are reported in detail; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+
+def guess_format(filename):
+    """``csv`` for .csv files, ``ndjson`` otherwise"""
+    return 'csv' if (filename or '').lower().endswith('.csv') else 'ndjson'
+
+
+def ndjson_rows(stream):
+    """Yield ``(row number, dict or error message)`` for each non-blank line"""
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, 'Invalid JSON.'
+            continue
+        yield number, row if isinstance(row, dict) else 'Expected a JSON object.'
+
+
+def csv_rows(stream):
+    """Yield ``(row number, dict)`` for each CSV record after the header"""
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    for number, row in enumerate(reader, start=1):
+        # Cells beyond the header end up under the None key
+        row.pop(None, None)
+        yield number, row
+
+
+def parse_rows(binary_stream, import_format):
+    """
+    Decode a binary upload and yield its rows lazily. Undecodable or
+    malformed input ends the stream with an error for the row it hit.
+    """
+    stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    number = 0
+    try:
+        for number, row in csv_rows(stream) if import_format == 'csv' else ndjson_rows(stream):
+            yield number, row
+    except UnicodeDecodeError:
+        yield number + 1, 'The file is not UTF-8 encoded; the rest of it was skipped.'
+    except csv.Error as e:
+        yield number + 1, f'Invalid CSV ({e}); the rest of the file was skipped.'
+    finally:
+        # Leave the underlying file open for its owner
+        stream.detach()
+
+
+def import_todos(rows, owner, batch_size=BATCH_SIZE, anonymous_token=''):
+    """
+    Validate and insert ``(row number, data)`` pairs as todos of ``owner``,
+    or with owner None, of the anonymous client ``anonymous_token``.
+    Returns a summary with the per-row errors.
+    """
+    anonymous_token = '' if owner else anonymous_token
+    key = get_list_key(owner.pk if owner else None, anonymous_token)
+    validator = TodoSerializer()
+    imported, failed, errors = 0, 0, []
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        todos = []
+        for number, data in batch:
+            if isinstance(data, str):
+                detail = {'non_field_errors': [data]}
+            else:
+                try:
+                    todos.append(Todo(user=owner, anonymous_token=anonymous_token, **validator.run_validation(data)))
+                    continue
+                except serializers.ValidationError as e:
+                    detail = e.detail
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'errors': detail})
+        if todos:
+            done = sum(todo.completed for todo in todos)
+            with transaction.atomic():
+                Todo.objects.bulk_create(todos)
+                TodoListState.objects.touch({key: (done, len(todos) - done)})
+            imported += len(todos)
+    return {'imported': imported, 'failed': failed, 'errors': errors}
@@ -0,0 +1,344 @@
+import asyncio
+import itertools
+import json
+import random
+import secrets
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.benchmark import (
+    ASGITransport, HTTPTransport, add_database_argument, benchmark_database, compare, describe_database, summarize,
+)
+
+USER_PREFIX = 'bench_'
+ADMIN_USERNAME = 'benchmark-admin'
+
+# Endpoints the frontend hits, with the client kinds allowed to call them
+ENDPOINTS = {
+    'todo-list': ('anonymous', 'user', 'admin'),
+    'todo-create': ('anonymous', 'user', 'admin'),
+    'todo-toggle': ('anonymous', 'user', 'admin'),
+    'login': ('user', 'admin'),
+    'refresh': ('user', 'admin'),
+    'admin-users': ('admin',),
+    'dashboard-stats': ('admin',),
+}
+
+DEFAULT_MIX = 'todo-list=50,todo-create=15,todo-toggle=20,refresh=4,login=1,admin-users=5,dashboard-stats=5'
+
+
+def parse_mix(value):
+    """Parse ``name=weight,...`` into a dict"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise CommandError(f'Unknown endpoint "{name}", choose from {", ".join(ENDPOINTS)}')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name}: {weight}')
+    return mix
+
+
+class Client:
+    """One simulated frontend: its credentials and the todos it has seen"""
+
+    def __init__(self, kind, username=None, password=None, refresh=None, anonymous_token=None):
+        self.kind = kind
+        self.username = username
+        self.password = password
+        self.refresh = str(refresh) if refresh else None
+        self.access = str(refresh.access_token) if refresh else None
+        self.anonymous_token = anonymous_token
+        self.todo_ids = []
+
+    def headers(self, body=False):
+        headers = {'Accept': 'application/json'}
+        if body:
+            headers['Content-Type'] = 'application/json'
+        if self.access:
+            headers['Authorization'] = f'Bearer {self.access}'
+        else:
+            headers['X-Anonymous-Token'] = self.anonymous_token
+        return headers
+
+    def remember(self, todos):
+        self.todo_ids.extend(todo['id'] for todo in todos)
+        del self.todo_ids[:-200]
+
+
+class Command(BaseCommand):
+    """
+    Django management command to load-test the API endpoints the frontend uses.
+    Seeds benchmark users in a throwaway test database, then drives a weighted
+    mix of requests from concurrent authenticated, admin and anonymous clients,
+    in-process through the ASGI application. With --url it loads a running
+    server instead, which needs --allow-seed to seed that server's (configured)
+    database. Benchmark users get a random password per run. Reports throughput and
+    p50/p95/p99 latency per endpoint, with the database profile they were taken
+    with, as JSON and can compare them to a baseline.
+    Usage: python manage.py benchmark_api [--requests 5000] [--url http://localhost:8000 --allow-seed] [--baseline base.json]
+    """
+    help = 'Load-test the todo and account API and report per-endpoint throughput and latency as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5000,
+            help='Number of timed requests (default: 5000)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Number of concurrent clients (default: 50)',
+        )
+        parser.add_argument(
+            '--anonymous-ratio',
+            type=float,
+            default=0.2,
+            help='Fraction of clients that are anonymous (default: 0.2)',
+        )
+        parser.add_argument(
+            '--admin-ratio',
+            type=float,
+            default=0.1,
+            help='Fraction of authenticated clients that are staff (default: 0.1)',
+        )
+        parser.add_argument(
+            '--mix',
+            default=DEFAULT_MIX,
+            help=f'Endpoint weights as name=weight,... (default: {DEFAULT_MIX})',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200,
+            help='Number of seeded benchmark users, created when missing (default: 200)',
+        )
+        parser.add_argument(
+            '--todos-per-user',
+            type=float,
+            default=50,
+            help='Average number of todos of newly seeded users (default: 50)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the seeded data and the request mix (default: 0)',
+        )
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server sharing this database, requires --allow-seed; '
+                 'default is in-process ASGI',
+        )
+        add_database_argument(parser)
+        parser.add_argument(
+            '--output',
+            help='Write the JSON report to this file instead of stdout',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON report of an earlier run to compare against; fails on regressions',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.1,
+            help='Allowed p95 increase or throughput decrease against the baseline (default: 0.1)',
+        )
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        if options['url']:
+            if not options['allow_seed']:
+                raise CommandError(
+                    '--url seeds benchmark users in the database the server uses; '
+                    'pass --allow-seed if that database is not a production one'
+                )
+            try:
+                transport = HTTPTransport(options['url'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            transport = ASGITransport(get_asgi_application())
+
+        with benchmark_database(options['allow_seed']):
+            report = self.benchmark(transport, mix, options)
+        if baseline is not None:
+            report['comparison'] = compare(report, baseline, options['tolerance'])
+            if baseline.get('database', report['database']) != report['database']:
+                self.stderr.write(self.style.WARNING(
+                    f'The baseline was taken with a different database profile: {baseline["database"]}'
+                ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            total = report['total']
+            self.stdout.write(
+                f'{total["requests"]} requests in {report["elapsed"]:.2f}s, {total["throughput"]:.1f} req/s, '
+                f'p50 {total["p50_ms"]} ms, p95 {total["p95_ms"]} ms, p99 {total["p99_ms"]} ms, '
+                f'{total["errors"]} errors; report written to {options["output"]}'
+            )
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        regressed = [name for name, result in report.get('comparison', {}).items() if result['regressed']]
+        if regressed:
+            raise CommandError(f'Regressed against the baseline: {", ".join(regressed)}')
+
+    def benchmark(self, transport, mix, options):
+        """Seed the clients, run the load and return the report"""
+        rng = random.Random(options['seed'])
+        clients = self.prepare_clients(options, rng)
+
+        # Untimed warm-up: fill each client's todo ids, the caches and the connections
+        async_to_sync(self.run_load)(transport, clients, {'todo-list': 1}, len(clients), options['concurrency'], rng)
+        elapsed, samples = async_to_sync(self.run_load)(
+            transport, clients, mix, options['requests'], options['concurrency'], rng
+        )
+
+        all_latencies = [latency for latencies, _ in samples.values() for latency in latencies]
+        return {
+            'target': options['url'] or 'in-process',
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'anonymous_ratio': options['anonymous_ratio'],
+            'mix': mix,
+            'database': describe_database(),
+            'elapsed': round(elapsed, 3),
+            'endpoints': {
+                name: summarize(latencies, errors, elapsed) for name, (latencies, errors) in sorted(samples.items())
+            },
+            'total': summarize(all_latencies, sum(errors for _, errors in samples.values()), elapsed),
+        }
+
+    def prepare_clients(self, options, rng):
+        """
+        Seed the benchmark users when missing and build the simulated clients.
+        The users, reused between runs with --allow-seed, get a new random
+        password each run; the admin is staff, not a superuser.
+        """
+        password = secrets.token_urlsafe(16)
+        existing = User.objects.filter(username__startswith=USER_PREFIX).count()
+        if existing < options['users']:
+            call_command(
+                'seed_test_data', users=options['users'] - existing, offset=existing, prefix=USER_PREFIX,
+                todos_per_user=options['todos_per_user'], seed=options['seed'], password=password,
+                stdout=self.stderr,
+            )
+        admin, _ = User.objects.get_or_create(
+            username=ADMIN_USERNAME, defaults={'email': f'{ADMIN_USERNAME}@example.com', 'is_staff': True},
+        )
+        User.objects.filter(Q(username__startswith=USER_PREFIX) | Q(pk=admin.pk)).update(
+            password=make_password(password)
+        )
+        users = list(
+            User.objects.filter(username__startswith=USER_PREFIX, is_active=True)
+            .order_by('username')[:options['users']]
+        )
+        if not users:
+            raise CommandError('No active benchmark users to log in with')
+
+        clients = []
+        for _ in range(options['concurrency']):
+            if rng.random() < options['anonymous_ratio']:
+                clients.append(Client('anonymous', anonymous_token=secrets.token_urlsafe(24)))
+            elif rng.random() < options['admin_ratio']:
+                clients.append(Client('admin', admin.username, password, RefreshToken.for_user(admin)))
+            else:
+                user = rng.choice(users)
+                clients.append(Client('user', user.username, password, RefreshToken.for_user(user)))
+        return clients
+
+    async def run_load(self, transport, clients, mix, total, concurrency, rng):
+        """Send ``total`` requests from ``clients``; returns elapsed time and per-endpoint samples"""
+        # Threads for the blocking HTTP transport, one per client
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        asyncio.get_running_loop().set_default_executor(executor)
+        samples = defaultdict(lambda: ([], 0))
+        counter = itertools.count()
+
+        async def run_client(client):
+            names = [name for name in mix if client.kind in ENDPOINTS[name]]
+            weights = [mix[name] for name in names]
+            if not names:
+                return
+            while next(counter) < total:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    name, status = await self.request(transport, client, name, rng)
+                except Exception:
+                    status = None
+                latency = time.perf_counter() - start
+                latencies, errors = samples[name]
+                latencies.append(latency)
+                samples[name] = (latencies, errors + (status is None or status >= 400))
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(run_client(client) for client in clients))
+        finally:
+            executor.shutdown(wait=False)
+        return time.perf_counter() - start, dict(samples)
+
+    async def request(self, transport, client, name, rng):
+        """Send one ``name`` request for ``client``; returns the endpoint actually hit and the status"""
+        if name == 'todo-toggle' and not client.todo_ids:
+            name = 'todo-create'
+
+        if name == 'todo-list':
+            status, body = await transport('GET', '/api/todos/', client.headers())
+            if status == 200:
+                client.remember(json.loads(body)['results'])
+        elif name == 'todo-create':
+            payload = json.dumps({'title': f'Benchmark todo {secrets.token_hex(4)}'}).encode()
+            status, body = await transport('POST', '/api/todos/', client.headers(body=True), payload)
+            if status == 201:
+                client.remember([json.loads(body)])
+        elif name == 'todo-toggle':
+            todo_id = rng.choice(client.todo_ids)
+            status, _ = await transport('PATCH', f'/api/todos/{todo_id}/toggle_completed/', client.headers())
+            if status == 404:
+                client.todo_ids.remove(todo_id)
+        elif name == 'login':
+            payload = json.dumps({'username': client.username, 'password': client.password}).encode()
+            status, body = await transport('POST', '/api/auth/login/', client.headers(body=True), payload)
+            if status == 200:
+                tokens = json.loads(body)['data']
+                client.access, client.refresh = tokens['access'], tokens['refresh']
+        elif name == 'refresh':
+            payload = json.dumps({'refresh': client.refresh}).encode()
+            status, body = await transport('POST', '/api/auth/refresh/', client.headers(body=True), payload)
+            if status == 200:
+                # Refresh tokens rotate, the old one is blacklisted
+                tokens = json.loads(body)
+                client.access, client.refresh = tokens['access'], tokens.get('refresh', client.refresh)
+        elif name == 'admin-users':
+            status, _ = await transport('GET', '/api/admin/users/', client.headers())
+        else:
+            status, _ = await transport('GET', '/api/admin/dashboard/stats/', client.headers())
+        return name, status
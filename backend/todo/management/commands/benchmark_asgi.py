@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import time
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.benchmark import add_database_argument, asgi_request, benchmark_database, percentile
+from todo.models import Todo, TodoListState
+
+STACKS = [
+    ('sync', 'todolist_project.urls'),
+    ('async', 'todolist_project.async_urls'),
+]
+
+
+class Command(BaseCommand):
+    """
+    Django management command to compare the sync and async view stacks under ASGI.
+    Drives the ASGI application in-process with concurrent clients, so the
+    numbers reflect the request handling itself and not the network or server.
+    Its user and todos live in a throwaway test database (see --allow-seed).
+    Usage: python manage.py benchmark_asgi [--requests 2000] [--concurrency 50]
+    """
+    help = 'Compare requests/sec and latency of the sync and async todo API views under ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Number of requests sent to each stack (default: 2000)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Number of concurrent clients (default: 50)',
+        )
+        parser.add_argument(
+            '--todos',
+            type=int,
+            default=50,
+            help='Number of todos owned by the benchmark user (default: 50)',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Endpoint to request, may be repeated (default: list, pending and profile)',
+        )
+        add_database_argument(parser)
+
+    def handle(self, *args, **options):
+        with benchmark_database(options['allow_seed']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        paths = options['paths'] or ['/api/todos/', '/api/todos/pending/', '/api/auth/profile/']
+        header = self.prepare_user(options['todos'])
+        application = get_asgi_application()
+
+        results = {}
+        for label, urlconf in STACKS:
+            with override_settings(ROOT_URLCONF=urlconf):
+                # Warm up connections, caches and the token cache
+                asyncio.run(self.run_load(application, paths, header, options['concurrency'], options['concurrency']))
+                results[label] = asyncio.run(
+                    self.run_load(application, paths, header, options['requests'], options['concurrency'])
+                )
+
+        for label, (elapsed, latencies, errors) in results.items():
+            latencies.sort()
+            self.stdout.write(
+                f'{label:>5}: {len(latencies)} requests in {elapsed:.2f}s, '
+                f'{len(latencies) / elapsed:.1f} req/s, '
+                f'p50 {percentile(latencies, 0.50) * 1000:.1f} ms, '
+                f'p99 {percentile(latencies, 0.99) * 1000:.1f} ms, '
+                f'{errors} errors'
+            )
+        sync_rate = len(results['sync'][1]) / results['sync'][0]
+        async_rate = len(results['async'][1]) / results['async'][0]
+        self.stdout.write(self.style.SUCCESS(f'async/sync throughput: {async_rate / sync_rate:.2f}x'))
+
+    def prepare_user(self, todo_count):
+        user, _ = User.objects.get_or_create(username='asgi-benchmark')
+        missing = todo_count - Todo.objects.filter(user=user).count()
+        if missing > 0:
+            Todo.objects.bulk_create([
+                Todo(title=f'Benchmark todo {i}', completed=i % 2 == 0, user=user) for i in range(missing)
+            ])
+            TodoListState.objects.reconcile([user.id])
+        return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    async def run_load(self, application, paths, header, total, concurrency):
+        latencies = []
+        errors = 0
+        counter = itertools.count()
+
+        async def client():
+            nonlocal errors
+            while (index := next(counter)) < total:
+                start = time.perf_counter()
+                status, _ = await asgi_request(application, 'GET', paths[index % len(paths)], {'Authorization': header})
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, errors
@@ -0,0 +1,79 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmark import add_database_argument, benchmark_database
+from todo.models import Todo, TodoListState
+from todo.serializers import (
+    TodoAdminSerializer, TodoSerializer, list_values, represent_admin_todos, represent_todos,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django management command to compare the ModelSerializer list path with the
+    values()-based fast path, including the query, for the user and admin lists.
+    Its user and todos live in a throwaway test database (see --allow-seed).
+    Usage: python manage.py benchmark_serializers [--todos 5000] [--repeat 5]
+    """
+    help = 'Time TodoSerializer/TodoAdminSerializer against the values() fast path for list responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todos',
+            type=int,
+            default=5000,
+            help='Number of todos serialized per run (default: 5000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of runs per variant; the fastest counts (default: 5)',
+        )
+        add_database_argument(parser)
+
+    def handle(self, *args, **options):
+        with benchmark_database(options['allow_seed']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        queryset = Todo.objects.select_related('user').filter(user=self.prepare_user(options['todos']))
+        queryset = queryset.order_by('-created_at', '-id')
+        variants = [
+            ('TodoSerializer', lambda: TodoSerializer(queryset, many=True).data,
+             lambda: represent_todos(list_values(queryset))),
+            ('TodoAdminSerializer', lambda: TodoAdminSerializer(queryset, many=True).data,
+             lambda: represent_admin_todos(list_values(queryset))),
+        ]
+        for label, serialize, fast in variants:
+            if [dict(item) for item in serialize()] != fast():
+                raise CommandError(f'The fast path output differs from {label}')
+            serializer_time = self.best_time(serialize, options['repeat'])
+            fast_time = self.best_time(fast, options['repeat'])
+            self.stdout.write(
+                f'{label}: {serializer_time * 1000:.1f} ms, values() fast path: {fast_time * 1000:.1f} ms '
+                f'for {options["todos"]} todos'
+            )
+            self.stdout.write(self.style.SUCCESS(f'{label} speedup: {serializer_time / fast_time:.2f}x'))
+
+    def prepare_user(self, todo_count):
+        user, _ = User.objects.get_or_create(username='serializer-benchmark')
+        existing = Todo.objects.filter(user=user).count()
+        if existing != todo_count:
+            Todo.objects.filter(user=user).delete()
+            Todo.objects.bulk_create([
+                Todo(title=f'Benchmark todo {i}', description='Some notes' * (i % 3), completed=i % 2 == 0, user=user)
+                for i in range(todo_count)
+            ])
+            TodoListState.objects.reconcile([user.id])
+        return user
+
+    @staticmethod
+    def best_time(function, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
@@ -1,13 +1,24 @@
+import os
+import signal
+import socket
+import time
+import uuid
+
 from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
 from django.utils import timezone
 from datetime import timedelta
-from todo.models import Todo
+from todo.models import MaintenanceLock, Todo, TodoListState
+
+LOCK_NAME = 'cleanup_anonymous_todos'
 
 
 class Command(BaseCommand):
     """
-    Django management command to clean up anonymous todos older than 10 minutes
-    Usage: python manage.py cleanup_anonymous_todos
+    Django management command to clean up anonymous todos older than 10 minutes.
+    Deletes in short batches so writers are never blocked for long, and with
+    --loop keeps running, using a database lease so only one worker cleans at a time.
+    Usage: python manage.py cleanup_anonymous_todos [--batch-size 500] [--loop --interval 60]
     """
     help = 'Delete anonymous todos (user=null) older than 10 minutes'
 
@@ -23,37 +34,126 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be deleted without actually deleting',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of todos deleted per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between batches so other writers get the lock (default: 0.1)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and clean up every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between cleanup runs with --loop (default: 60)',
+        )
+        parser.add_argument(
+            '--lock-timeout',
+            type=float,
+            default=300,
+            help='Seconds the cleanup lock is held without renewal before another worker may take over (default: 300)',
+        )
 
     def handle(self, *args, **options):
-        minutes = options['minutes']
-        dry_run = options['dry_run']
-        
-        # Calculate the cutoff time
-        cutoff_time = timezone.now() - timedelta(minutes=minutes)
-        
-        # Find anonymous todos older than the cutoff time
-        old_anonymous_todos = Todo.objects.filter(
-            user__isnull=True,
-            created_at__lt=cutoff_time
-        )
-        
+        if options['dry_run']:
+            self.dry_run(options['minutes'])
+        elif options['loop']:
+            self.run_forever(options)
+        else:
+            self.cleanup(options)
+
+    def dry_run(self, minutes):
+        old_anonymous_todos = self.expired_todos(minutes)
         count = old_anonymous_todos.count()
-        
         if count == 0:
             self.stdout.write(
                 self.style.SUCCESS(f'No anonymous todos older than {minutes} minutes found.')
             )
             return
-        
-        if dry_run:
+        self.stdout.write(
+            self.style.WARNING(f'DRY RUN: Would delete {count} anonymous todos older than {minutes} minutes:')
+        )
+        for title, created_at in old_anonymous_todos.values_list('title', 'created_at').iterator():
+            self.stdout.write(f'  - "{title}" (created: {created_at})')
+
+    def cleanup(self, options, renew=None):
+        """
+        Delete expired anonymous todos in batches; ``renew`` is called between
+        batches and stops the run when it returns False
+        """
+        minutes = options['minutes']
+        deleted_count = 0
+        while True:
+            # Batches come off the front of the (created_at, id) partial index,
+            # so no offset or range bookkeeping is needed between them
+            ids = list(
+                self.expired_todos(minutes).order_by('created_at', 'id').values_list('id', flat=True)[
+                    :options['batch_size']
+                ]
+            )
+            if not ids:
+                break
+            deleted_count += Todo.objects.filter(id__in=ids, user__isnull=True).delete_with_tombstones()
+            if len(ids) < options['batch_size']:
+                break
+            self.stdout.write(f'  deleted {deleted_count} anonymous todos so far...')
+            if renew is not None and not renew():
+                self.stdout.write(self.style.WARNING('Lost the cleanup lock, stopping this run.'))
+                break
+            time.sleep(options['sleep'])
+        # Drop the bookkeeping rows of anonymous clients whose lists are now empty
+        TodoListState.objects.prune_anonymous()
+
+        if deleted_count == 0:
             self.stdout.write(
-                self.style.WARNING(f'DRY RUN: Would delete {count} anonymous todos older than {minutes} minutes:')
+                self.style.SUCCESS(f'No anonymous todos older than {minutes} minutes found.')
             )
-            for todo in old_anonymous_todos:
-                self.stdout.write(f'  - "{todo.title}" (created: {todo.created_at})')
         else:
-            # Actually delete the todos
-            deleted_count, _ = old_anonymous_todos.delete()
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully deleted {deleted_count} anonymous todos older than {minutes} minutes.')
             )
+        return deleted_count
+
+    def run_forever(self, options):
+        owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+        def renew():
+            return MaintenanceLock.objects.acquire(LOCK_NAME, owner, options['lock_timeout'])
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        # Release the lock on a supervisor's SIGTERM as well as on Ctrl-C
+        previous_handler = signal.signal(signal.SIGTERM, stop)
+        try:
+            while True:
+                # A long-lived process must not keep a dead or expired connection
+                close_old_connections()
+                try:
+                    if renew():
+                        self.cleanup(options, renew)
+                    elif options['verbosity'] >= 2:
+                        self.stdout.write('Another worker holds the cleanup lock, skipping this run.')
+                except DatabaseError as e:
+                    self.stderr.write(f'Cleanup run failed, retrying in {options["interval"]}s: {e}')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping.')
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            MaintenanceLock.objects.release(LOCK_NAME, owner)
+
+    def expired_todos(self, minutes):
+        # Calculate the cutoff time
+        cutoff_time = timezone.now() - timedelta(minutes=minutes)
+        return Todo.objects.filter(user__isnull=True, created_at__lt=cutoff_time)
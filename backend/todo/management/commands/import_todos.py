@@ -0,0 +1,66 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from todo.anonymous import TOKEN_RE
+from todo.imports import BATCH_SIZE, IMPORT_FORMATS, guess_format, import_todos, parse_rows
+
+
+class Command(BaseCommand):
+    """
+    Django management command to import todos for a user, or for an anonymous
+    client by its X-Anonymous-Token, from an NDJSON or CSV file
+    Usage: python manage.py import_todos todos.csv (--user alice | --anonymous-token TOKEN) [--format csv] [--batch-size 500]
+    """
+    help = 'Import todos from an NDJSON or CSV file in batches, reporting invalid rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import')
+        owner = parser.add_mutually_exclusive_group(required=True)
+        owner.add_argument(
+            '--user',
+            help='Username owning the imported todos',
+        )
+        owner.add_argument(
+            '--anonymous-token',
+            help='Anonymous client token (X-Anonymous-Token) owning the imported todos',
+        )
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            help='File format (default: csv for .csv files, ndjson otherwise)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Number of rows validated and inserted per transaction (default: {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['user']:
+            try:
+                owner = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+        elif not TOKEN_RE.fullmatch(options['anonymous_token']):
+            raise CommandError('The anonymous token must be 16 to 48 URL-safe characters')
+
+        import_format = options['format'] or guess_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as upload:
+                rows = parse_rows(upload, import_format)
+                summary = import_todos(rows, owner, options['batch_size'], options['anonymous_token'] or '')
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}')
+
+        for error in summary['errors']:
+            self.stderr.write(f'Row {error["row"]}: {json.dumps(error["errors"], ensure_ascii=False)}')
+        if len(summary['errors']) < summary['failed']:
+            self.stderr.write(f'... and {summary["failed"] - len(summary["errors"])} more invalid rows')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported {summary["imported"]} todos, skipped {summary["failed"]} invalid rows.'
+            )
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from todo.models import TodoTombstone
+from todo.sync import get_tombstone_retention
+
+
+class Command(BaseCommand):
+    """
+    Django management command to delete sync tombstones past their retention
+    Usage: python manage.py prune_todo_tombstones
+    """
+    help = 'Delete todo deletion tombstones older than TODO_SYNC_TOMBSTONE_RETENTION'
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - get_tombstone_retention()
+        deleted_count, _ = TodoTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully deleted {deleted_count} tombstones older than {cutoff}.')
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from todo.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Django management command to rebuild the todo full-text search index
+    Usage: python manage.py rebuild_search_index [--batch-size 1000]
+    """
+    help = 'Rebuild the full-text search index for todos in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of todos indexed per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Database alias to rebuild the index on (default: default)',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        self.stdout.write(f'Rebuilding todo search index using the {backend.__class__.__name__}...')
+
+        def progress(indexed):
+            self.stdout.write(f'  Indexed {indexed} todos...')
+
+        indexed = backend.rebuild(batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt the search index for {indexed} todos.')
+        )
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from todo.models import Todo, TodoListState, get_list_scope
+
+ANONYMOUS_SCOPE_PREFIX = get_list_scope('')
+
+
+class Command(BaseCommand):
+    """
+    Django management command to recount the per-list todo counters and repair drift
+    Usage: python manage.py reconcile_todo_stats [--batch-size 500]
+    """
+    help = 'Recount completed/pending todos per list and repair drifted TodoListState counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of users or anonymous clients recounted per transaction (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = repaired = 0
+
+        last_id = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            repaired += TodoListState.objects.reconcile(user_ids)
+            checked += len(user_ids)
+            last_id = user_ids[-1]
+
+        # Anonymous lists only exist through their todos and state rows;
+        # '' is the shared list of the todos from before client tokens
+        last_token = None
+        while True:
+            tokens = self.anonymous_tokens(last_token, batch_size)
+            if not tokens:
+                break
+            repaired += TodoListState.objects.reconcile([], anonymous_tokens=tokens)
+            checked += len(tokens)
+            last_token = tokens[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully checked {checked} todo lists, repaired {repaired}.')
+        )
+
+    @staticmethod
+    def anonymous_tokens(after, limit):
+        """The first ``limit`` anonymous list tokens sorting after ``after`` (None: from the start)"""
+        todos = Todo.objects.filter(user__isnull=True).order_by('anonymous_token')
+        states = TodoListState.objects.anonymous().filter(scope__startswith=ANONYMOUS_SCOPE_PREFIX)
+        tokens = set()
+        if after is None:
+            if TodoListState.objects.anonymous().filter(scope=get_list_scope(None)).exists():
+                tokens.add('')
+        else:
+            todos = todos.filter(anonymous_token__gt=after)
+            states = states.filter(scope__gt=ANONYMOUS_SCOPE_PREFIX + after)
+        tokens.update(todos.values_list('anonymous_token', flat=True).distinct()[:limit])
+        tokens.update(
+            scope[len(ANONYMOUS_SCOPE_PREFIX):]
+            for scope in states.order_by('scope').values_list('scope', flat=True)[:limit]
+        )
+        return sorted(tokens)[:limit]
@@ -0,0 +1,90 @@
+import signal
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+
+
+class Command(BaseCommand):
+    """
+    Django management command to copy the SQLite database into the file of the
+    "replica" alias (set SQLITE_REPLICA_PATH), to try the read-replica routing
+    locally. Uses SQLite's online backup, so the primary stays writable; with
+    --loop the copy is refreshed every --interval seconds, which stands in for
+    replication lag.
+    Usage: python manage.py sync_sqlite_replica [--loop --interval 2]
+    """
+    help = 'Copy the SQLite primary database into the local replica file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            help='SQLite file to copy (default: the default database)',
+        )
+        parser.add_argument(
+            '--replica',
+            help=f'SQLite file to write (default: the "{REPLICA_ALIAS}" database)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and copy every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Seconds between copies with --loop (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        source = options['source'] or self.sqlite_file(DEFAULT_DB_ALIAS)
+        replica = options['replica'] or self.sqlite_file(REPLICA_ALIAS)
+        if str(source) == str(replica):
+            raise CommandError('The replica must be a different file than the source')
+
+        if not options['loop']:
+            self.copy(source, replica)
+            self.stdout.write(self.style.SUCCESS(f'Successfully copied {source} to {replica}'))
+            return
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        previous_handler = signal.signal(signal.SIGTERM, stop)
+        try:
+            while True:
+                try:
+                    self.copy(source, replica)
+                except sqlite3.Error as e:
+                    self.stderr.write(f'Copy failed, retrying in {options["interval"]}s: {e}')
+                else:
+                    if options['verbosity'] >= 2:
+                        self.stdout.write(f'Copied {source} to {replica}')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping.')
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    def sqlite_file(self, alias):
+        if alias not in connections.settings:
+            raise CommandError(f'No "{alias}" database is configured; set SQLITE_REPLICA_PATH')
+        settings_dict = connections.settings[alias]
+        if settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(f'The "{alias}" database is not SQLite')
+        return settings_dict['NAME']
+
+    @staticmethod
+    def copy(source, replica):
+        source_connection = sqlite3.connect(source)
+        replica_connection = sqlite3.connect(replica, timeout=30)
+        try:
+            # One step, so readers of the replica never see a half-copied file
+            source_connection.backup(replica_connection)
+        finally:
+            replica_connection.close()
+            source_connection.close()
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0002_todo_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="todo",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="用户",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("user__isnull", False)),
+                fields=["user", "created_at", "id"],
+                name="todo_user_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("completed", True), ("user__isnull", False)),
+                fields=["user", "created_at", "id"],
+                name="todo_user_done_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("completed", False), ("user__isnull", False)),
+                fields=["user", "created_at", "id"],
+                name="todo_user_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["created_at", "id"],
+                name="todo_anon_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(fields=["created_at", "id"], name="todo_created_idx"),
+        ),
+    ]
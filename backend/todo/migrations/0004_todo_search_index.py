@@ -0,0 +1,121 @@
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+# The index as it was introduced, kept here so replaying the migration does
+# not depend on the current todo.search module. Keep in step with
+# todo.search only through new migrations.
+FTS_TABLE = 'todo_todo_fts'
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+        title, description,
+        content='{table}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table}
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        INSERT INTO {fts}({fts}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {fts}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Index the existing rows from the content table
+    "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS {fts}_ai',
+    'DROP TRIGGER IF EXISTS {fts}_ad',
+    'DROP TRIGGER IF EXISTS {fts}_au',
+    'DROP TABLE IF EXISTS {fts}',
+]
+
+POSTGRESQL_INSTALL = [
+    """
+    ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS todo_search_vector_idx ON {table} USING GIN (search_vector)',
+    'CREATE INDEX IF NOT EXISTS todo_title_trgm_idx ON {table} USING GIN (title gin_trgm_ops)',
+]
+
+POSTGRESQL_UNINSTALL = [
+    'DROP INDEX IF EXISTS todo_title_trgm_idx',
+    'DROP INDEX IF EXISTS todo_search_vector_idx',
+    'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run(schema_editor, statements, table):
+    for sql in statements:
+        schema_editor.execute(sql.format(fts=FTS_TABLE, table=table))
+
+
+def create_trigram_extension(schema_editor):
+    """
+    Prerequisite: creating pg_trgm needs a superuser before PostgreSQL 13,
+    and CREATE on the database since (it is a trusted extension). Without
+    that, have an administrator run CREATE EXTENSION pg_trgm first.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if cursor.fetchone():
+            return
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError as e:
+            raise DatabaseError(
+                'Creating the pg_trgm extension failed; ask a database administrator to run '
+                f'"CREATE EXTENSION pg_trgm;" in this database, then migrate again ({e})'
+            ) from e
+
+
+def install_search_index(apps, schema_editor):
+    table = apps.get_model('todo', 'Todo')._meta.db_table
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run(schema_editor, SQLITE_INSTALL, table)
+    elif vendor == 'postgresql':
+        create_trigram_extension(schema_editor)
+        run(schema_editor, POSTGRESQL_INSTALL, table)
+
+
+def uninstall_search_index(apps, schema_editor):
+    table = apps.get_model('todo', 'Todo')._meta.db_table
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run(schema_editor, SQLITE_UNINSTALL, table)
+    elif vendor == 'postgresql':
+        run(schema_editor, POSTGRESQL_UNINSTALL, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0003_todo_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
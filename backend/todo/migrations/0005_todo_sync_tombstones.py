@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0004_todo_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TodoTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("todo_id", models.BigIntegerField(verbose_name="待办事项ID")),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="删除时间"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "待办事项删除记录",
+                "verbose_name_plural": "待办事项删除记录",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("user__isnull", False)),
+                fields=["user", "updated_at"],
+                name="todo_user_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["updated_at"],
+                name="todo_anon_updated_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="todotombstone",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="用户",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todotombstone",
+            index=models.Index(
+                fields=["user", "deleted_at"], name="todo_tombstone_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todotombstone",
+            index=models.Index(
+                fields=["deleted_at"], name="todo_tombstone_deleted_idx"
+            ),
+        ),
+    ]
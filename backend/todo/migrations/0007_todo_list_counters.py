@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:30
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Todo = apps.get_model("todo", "Todo")
+    TodoListState = apps.get_model("todo", "TodoListState")
+    db = schema_editor.connection.alias
+    rows = (
+        Todo.objects.using(db)
+        .order_by()
+        .values("user_id")
+        .annotate(
+            done=Count("id", filter=Q(completed=True)),
+            open=Count("id", filter=Q(completed=False)),
+            last_activity=Max("updated_at"),
+        )
+    )
+    for row in rows:
+        user_id = row["user_id"]
+        scope = f"user:{user_id}" if user_id is not None else "anonymous"
+        TodoListState.objects.using(db).update_or_create(
+            scope=scope,
+            defaults={
+                "completed_count": row["done"],
+                "pending_count": row["open"],
+            },
+            create_defaults={
+                "user_id": user_id,
+                "completed_count": row["done"],
+                "pending_count": row["open"],
+                "updated_at": row["last_activity"],
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0006_todo_list_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="todoliststate",
+            name="completed_count",
+            field=models.IntegerField(default=0, verbose_name="已完成数"),
+        ),
+        migrations.AddField(
+            model_name="todoliststate",
+            name="pending_count",
+            field=models.IntegerField(default=0, verbose_name="未完成数"),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
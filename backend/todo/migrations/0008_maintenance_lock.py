@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0007_todo_list_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaintenanceLock",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="名称",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=255, verbose_name="持有者")),
+                ("expires_at", models.DateTimeField(verbose_name="过期时间")),
+            ],
+            options={
+                "verbose_name": "维护任务锁",
+                "verbose_name_plural": "维护任务锁",
+            },
+        ),
+    ]
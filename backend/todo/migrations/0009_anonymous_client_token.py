@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The FTS triggers of 0004_todo_search_index
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_todo_fts_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO todo_todo_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_todo_fts_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO todo_todo_fts(todo_todo_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todo_todo_fts_au AFTER UPDATE OF title, description ON {table}
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        INSERT INTO todo_todo_fts(todo_todo_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todo_todo_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    # SQLite adds the column by rebuilding todo_todo, which drops the FTS
+    # triggers; row ids are kept, so the index itself stays valid
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    table = apps.get_model("todo", "Todo")._meta.db_table
+    for sql in SEARCH_TRIGGERS:
+        schema_editor.execute(sql.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0008_maintenance_lock"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="todo",
+            name="todo_anon_updated_idx",
+        ),
+        # Runs after the column is removed again when migrating backwards
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_triggers),
+        migrations.AddField(
+            model_name="todo",
+            name="anonymous_token",
+            field=models.CharField(
+                blank=True, default="", max_length=48, verbose_name="匿名客户端标识"
+            ),
+        ),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="todotombstone",
+            name="anonymous_token",
+            field=models.CharField(
+                blank=True, default="", max_length=48, verbose_name="匿名客户端标识"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["anonymous_token", "created_at", "id"],
+                name="todo_anon_client_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["anonymous_token", "updated_at"],
+                name="todo_anon_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="todotombstone",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["anonymous_token", "deleted_at"],
+                name="todo_tombstone_anon_idx",
+            ),
+        ),
+    ]
@@ -1,23 +1,416 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
+from core.tracking import FieldTrackingMixin
+
+
+class TodoQuerySet(models.QuerySet):
+    def owned_by(self, user, anonymous_token=''):
+        """
+        Todos of ``user``, or for an anonymous user the anonymous todos
+        (user=null) of the client identified by ``anonymous_token``
+        """
+        if user.is_authenticated:
+            return self.filter(user=user)
+        return self.filter(user__isnull=True, anonymous_token=anonymous_token)
+
+    def delete_with_tombstones(self):
+        """
+        Delete the todos in this queryset and record a tombstone for each one
+        so delta sync clients learn about the deletion
+        """
+        with transaction.atomic(using=self.db):
+            rows = [
+                (todo_id, get_list_key(user_id, anonymous_token), completed)
+                for todo_id, user_id, anonymous_token, completed
+                in self.order_by().values_list('id', 'user_id', 'anonymous_token', 'completed')
+            ]
+            if not rows:
+                return 0
+            TodoTombstone.record([(todo_id, key) for todo_id, key, _ in rows], using=self.db)
+            deleted, _ = self.model._base_manager.using(self.db).filter(
+                id__in=[todo_id for todo_id, _, _ in rows]
+            ).delete()
+            changes = {}
+            for _, key, completed in rows:
+                changes[key] = add_deltas(changes.get(key, (0, 0)), status_delta(completed, -1))
+            TodoListState.objects.using(self.db).touch(changes)
+        return deleted
 
+    def toggle_completed(self, pk):
+        """
+        Flip the completion status of todo ``pk`` in one statement, so
+        concurrent toggles cannot both write the same value.
+        Returns ``(completed, updated_at)`` after the flip, or None when the
+        todo no longer exists. Call inside the write's transaction.
+        """
+        now = timezone.now()
+        connection = connections[self.db]
+        # UPDATE ... RETURNING comes with INSERT ... RETURNING (SQLite 3.35+)
+        if connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_columns_from_insert:
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET completed = NOT completed, updated_at = %s WHERE id = %s RETURNING completed',
+                    [connection.ops.adapt_datetimefield_value(now), pk],
+                )
+                row = cursor.fetchone()
+            return (bool(row[0]), now) if row else None
+        # No RETURNING: lock the row so the flip and the read agree
+        completed = self.filter(pk=pk).select_for_update().values_list('completed', flat=True).first()
+        if completed is None:
+            return None
+        self.filter(pk=pk).update(completed=not completed, updated_at=now)
+        return not completed, now
 
-class Todo(models.Model):
+
+class Todo(FieldTrackingMixin, models.Model):
     """
     Todo model representing a task item with title, description and completion status
     """
     title = models.CharField(max_length=200, verbose_name="标题")
     description = models.TextField(blank=True, verbose_name="描述")
     completed = models.BooleanField(default=False, verbose_name="是否完成")
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name="用户")
+    # Indexed through the composite todo_user_* indexes below
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_index=False, verbose_name="用户")
+    # Client that created an anonymous todo (see todo.anonymous); empty for
+    # user todos and for anonymous todos created before clients had tokens
+    anonymous_token = models.CharField(max_length=48, blank=True, default='', verbose_name="匿名客户端标识")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
 
+    objects = TodoQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = "待办事项"
         verbose_name_plural = "待办事项"
+        # Indexes follow the hot access patterns: every list filters on the
+        # owner (the user, or the anonymous client token with user IS NULL),
+        # optionally on completed,
+        # and orders by (created_at, id). The trailing id lets keyset
+        # pagination seek without a sort. Completion is split into partial
+        # indexes because SQLite renders boolean filters as bare column terms,
+        # which can match a partial index condition but not an index column.
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='todo_user_created_idx',
+                condition=models.Q(user__isnull=False),
+            ),
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='todo_user_done_idx',
+                condition=models.Q(user__isnull=False, completed=True),
+            ),
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='todo_user_open_idx',
+                condition=models.Q(user__isnull=False, completed=False),
+            ),
+            # Anonymous lists of one client
+            models.Index(
+                fields=['anonymous_token', 'created_at', 'id'],
+                name='todo_anon_client_idx',
+                condition=models.Q(user__isnull=True),
+            ),
+            # cleanup_anonymous_todos (user IS NULL AND created_at < cutoff) across clients
+            models.Index(
+                fields=['created_at', 'id'],
+                name='todo_anon_created_idx',
+                condition=models.Q(user__isnull=True),
+            ),
+            # Staff-wide admin list
+            models.Index(fields=['created_at', 'id'], name='todo_created_idx'),
+            # Delta sync (updated_at > cursor) for a user or for anonymous todos
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='todo_user_updated_idx',
+                condition=models.Q(user__isnull=False),
+            ),
+            models.Index(
+                fields=['anonymous_token', 'updated_at'],
+                name='todo_anon_updated_idx',
+                condition=models.Q(user__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    @property
+    def list_key(self):
+        """Key of the list this todo belongs to, see get_list_key()"""
+        return get_list_key(self.user_id, self.anonymous_token)
+
+
+class TodoTombstone(models.Model):
+    """
+    Deletion log for delta sync: one row per deleted todo, kept for
+    TODO_SYNC_TOMBSTONE_RETENTION so clients holding an older cursor can
+    drop the todo locally
+    """
+    todo_id = models.BigIntegerField(verbose_name="待办事项ID")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_index=False, verbose_name="用户")
+    anonymous_token = models.CharField(max_length=48, blank=True, default='', verbose_name="匿名客户端标识")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="删除时间")
+
+    class Meta:
+        verbose_name = "待办事项删除记录"
+        verbose_name_plural = "待办事项删除记录"
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='todo_tombstone_user_idx'),
+            models.Index(
+                fields=['anonymous_token', 'deleted_at'],
+                name='todo_tombstone_anon_idx',
+                condition=models.Q(user__isnull=True),
+            ),
+            models.Index(fields=['deleted_at'], name='todo_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Todo {self.todo_id} deleted at {self.deleted_at}"
+
+    @classmethod
+    def record(cls, rows, using=None):
+        """Insert tombstones for ``(todo_id, list key)`` pairs in one statement"""
+        now = timezone.now()
+        tombstones = []
+        for todo_id, key in rows:
+            user_id, anonymous_token = split_list_key(key)
+            tombstones.append(cls(todo_id=todo_id, user_id=user_id, anonymous_token=anonymous_token, deleted_at=now))
+        cls.objects.using(using).bulk_create(tombstones)
+
+
+def get_list_key(user_id, anonymous_token=''):
+    """
+    Key of a todo list: the user id for a user's todos, the client token
+    (a str) for anonymous todos, or None for the shared list of anonymous
+    todos created before clients had tokens
+    """
+    if user_id is not None:
+        return user_id
+    return anonymous_token or None
+
+
+def split_list_key(key):
+    """``(user_id, anonymous_token)`` of a list key"""
+    if isinstance(key, str):
+        return None, key
+    return key, ''
+
+
+def get_list_scope(key):
+    """TodoListState scope of the list with the given key, see get_list_key()"""
+    if key is None:
+        return 'anonymous'
+    if isinstance(key, str):
+        return f'anon:{key}'
+    return f'user:{key}'
+
+
+def status_delta(completed, by=1):
+    """``(completed, pending)`` counter change for ``by`` todos in the given state"""
+    return (by, 0) if completed else (0, by)
+
+
+def add_deltas(*deltas):
+    """Sum ``(completed, pending)`` counter changes"""
+    return tuple(map(sum, zip((0, 0), *deltas)))
+
+
+class TodoListStateQuerySet(models.QuerySet):
+    def touch(self, changes):
+        """
+        Bump the version stamp of the todo lists in ``changes`` (list keys,
+        see get_list_key()) and apply their counter changes.
+        ``changes`` is either an iterable of list keys or a mapping of list key
+        to a ``(completed, pending)`` delta. Call inside the write's transaction.
+        """
+        if not isinstance(changes, dict):
+            changes = dict.fromkeys(changes, (0, 0))
+        now = timezone.now()
+        connection = connections[self.db]
+        if connection.vendor in ('sqlite', 'postgresql') and connection.features.supports_update_conflicts_with_target:
+            # One race-free statement per list instead of update-then-insert
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                for key, (completed, pending) in changes.items():
+                    cursor.execute(
+                        f'INSERT INTO {table} (scope, user_id, version, updated_at, completed_count, pending_count) '
+                        'VALUES (%s, %s, 1, %s, %s, %s) '
+                        f'ON CONFLICT (scope) DO UPDATE SET version = {table}.version + 1, '
+                        'updated_at = excluded.updated_at, '
+                        f'completed_count = {table}.completed_count + excluded.completed_count, '
+                        f'pending_count = {table}.pending_count + excluded.pending_count',
+                        [get_list_scope(key), split_list_key(key)[0], now, completed, pending],
+                    )
+            return
+        for key, (completed, pending) in changes.items():
+            scope = get_list_scope(key)
+            updates = {
+                'version': F('version') + 1,
+                'updated_at': now,
+                'completed_count': F('completed_count') + completed,
+                'pending_count': F('pending_count') + pending,
+            }
+            if self.filter(scope=scope).update(**updates):
+                continue
+            _, created = self.get_or_create(scope=scope, defaults={
+                'user_id': split_list_key(key)[0], 'version': 1, 'updated_at': now,
+                'completed_count': completed, 'pending_count': pending,
+            })
+            if not created:
+                # Another writer created the row first, still apply on top of it
+                self.filter(scope=scope).update(**updates)
+
+    def reconcile(self, user_ids, anonymous=False, anonymous_tokens=()):
+        """
+        Recount the todos of ``user_ids`` and of the anonymous lists of
+        ``anonymous_tokens`` ('' for the shared legacy list), or of every
+        anonymous list when ``anonymous`` is set, and repair counters that
+        drifted. Returns the number of repaired rows.
+        """
+        if not user_ids and not anonymous and not anonymous_tokens:
+            return 0
+        scopes = {get_list_scope(user_id): user_id for user_id in user_ids}
+        scopes.update((get_list_scope(get_list_key(None, token)), None) for token in anonymous_tokens)
+        with transaction.atomic(using=self.db):
+            # Lock the rows first: concurrent writers then either committed
+            # before the recount or apply their delta after it
+            states = self.select_for_update().in_bulk(list(scopes))
+            todos = Todo.objects.using(self.db).order_by()
+            if anonymous:
+                states.update((state.scope, state) for state in self.select_for_update().anonymous())
+                todos = todos.filter(models.Q(user_id__in=user_ids) | models.Q(user__isnull=True))
+            elif anonymous_tokens:
+                todos = todos.filter(
+                    models.Q(user_id__in=user_ids)
+                    | models.Q(user__isnull=True, anonymous_token__in=anonymous_tokens)
+                )
+            else:
+                todos = todos.filter(user_id__in=user_ids)
+            actual = {
+                get_list_scope(get_list_key(row['user_id'], row['anonymous_token'])): row
+                for row in todos.values('user_id', 'anonymous_token').annotate(
+                    done=models.Count('id', filter=models.Q(completed=True)),
+                    open=models.Count('id', filter=models.Q(completed=False)),
+                    last_activity=models.Max('updated_at'),
+                )
+            }
+            if anonymous:
+                # Anonymous lists are only known from their todos and state rows
+                for scope in [*actual, *states]:
+                    scopes.setdefault(scope, None)
+            missing, drifted = [], []
+            for scope, user_id in scopes.items():
+                row = actual.get(scope, {'done': 0, 'open': 0, 'last_activity': None})
+                state = states.get(scope)
+                if state is None:
+                    if row['done'] or row['open']:
+                        missing.append(self.model(
+                            scope=scope, user_id=user_id,
+                            completed_count=row['done'], pending_count=row['open'],
+                            updated_at=row['last_activity'] or timezone.now(),
+                        ))
+                elif (state.completed_count, state.pending_count) != (row['done'], row['open']):
+                    state.completed_count, state.pending_count = row['done'], row['open']
+                    drifted.append(state)
+            self.bulk_create(missing)
+            self.bulk_update(drifted, ['completed_count', 'pending_count'])
+        return len(missing) + len(drifted)
+
+    def anonymous(self):
+        """Rows of the anonymous lists, the only ones without a user"""
+        return self.filter(user__isnull=True)
+
+    def prune_anonymous(self):
+        """
+        Delete the rows of empty anonymous lists; every anonymous client
+        would leave one behind otherwise. A list without a row validates as
+        an empty list at version 0, so this never makes a stale ETag match.
+        Returns the number of deleted rows.
+        """
+        deleted, _ = self.anonymous().filter(completed_count=0, pending_count=0).delete()
+        return deleted
+
+
+class TodoListState(models.Model):
+    """
+    Per-list bookkeeping, one row per user plus one for the anonymous list.
+    The version stamp is bumped by every todo write and backs the ETag and
+    Last-Modified validators of the list endpoints; the counters are kept
+    in step by the same writes so stats never need a COUNT over todo_todo.
+    """
+    scope = models.CharField(max_length=64, primary_key=True, verbose_name="范围")
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='todo_list_state', verbose_name="用户"
+    )
+    version = models.PositiveBigIntegerField(default=0, verbose_name="版本")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="更新时间")
+    # Signed so a drifted counter is repairable instead of failing the write
+    completed_count = models.IntegerField(default=0, verbose_name="已完成数")
+    pending_count = models.IntegerField(default=0, verbose_name="未完成数")
+
+    objects = TodoListStateQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "待办事项列表状态"
+        verbose_name_plural = "待办事项列表状态"
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
+
+    @property
+    def total_count(self):
+        return self.completed_count + self.pending_count
+
+    @property
+    def last_activity(self):
+        return self.updated_at
+
+
+class MaintenanceLockQuerySet(models.QuerySet):
+    def acquire(self, name, owner, timeout):
+        """
+        Take or renew the lease on ``name`` for ``timeout`` seconds.
+        Returns False while another owner holds an unexpired lease.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=timeout)
+        if self.filter(models.Q(owner=owner) | models.Q(expires_at__lte=now), name=name).update(
+            owner=owner, expires_at=expires_at
+        ):
+            return True
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(name=name, owner=owner, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        return True
+
+    def release(self, name, owner):
+        """Give up the lease on ``name`` if ``owner`` still holds it"""
+        self.filter(name=name, owner=owner).delete()
+
+
+class MaintenanceLock(models.Model):
+    """
+    Expiring lease that lets one worker at a time run a maintenance job.
+    A crashed worker's lease simply runs out, so no manual unlock is needed.
+    """
+    name = models.CharField(max_length=64, primary_key=True, verbose_name="名称")
+    owner = models.CharField(max_length=255, verbose_name="持有者")
+    expires_at = models.DateTimeField(verbose_name="过期时间")
+
+    objects = MaintenanceLockQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "维护任务锁"
+        verbose_name_plural = "维护任务锁"
+
+    def __str__(self):
+        return f"{self.name} held by {self.owner}"
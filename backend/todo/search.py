@@ -0,0 +1,229 @@
+"""
+Full-text search for todos.
+
+SQLite keeps an external-content FTS5 table in sync with todo_todo through
+triggers. PostgreSQL uses a generated, weighted tsvector column with a GIN
+index plus a pg_trgm index on the title for substring matches. Other
+databases fall back to icontains filtering without ranking.
+
+Search results are annotated with ``search_rank`` (higher is better).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Todo
+
+# Word tokens of the user query; everything else (quotes, operators) is dropped
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_terms(query):
+    """Split a user query into search terms"""
+    return TERM_RE.findall(query or '')
+
+
+class SearchBackend:
+    """Fallback backend: unranked icontains over title and description"""
+    vendor = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        """Create the index structures (called from migrations)"""
+
+    def uninstall(self):
+        """Drop the index structures (called from migrations)"""
+
+    def rebuild(self, batch_size=1000, progress=None):
+        """Rebuild the whole index in batches, returns the number of indexed todos"""
+        return Todo.objects.using(self.connection.alias).count()
+
+    def search(self, queryset, query):
+        terms = parse_terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def execute(self, statements, params=None):
+        with self.connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql, params)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 external-content index with bm25 ranking and prefix matching"""
+    vendor = 'sqlite'
+    table = 'todo_todo_fts'
+    # bm25 column weights: title matches count ten times a description match
+    title_weight = 10.0
+    description_weight = 1.0
+
+    install_sql = [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+            title, description,
+            content='todo_todo', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON todo_todo BEGIN
+            INSERT INTO {table}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON todo_todo BEGIN
+            INSERT INTO {table}({table}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        # Model.save() writes every column, so only reindex when the text changed
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF title, description ON todo_todo
+        WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+            INSERT INTO {table}({table}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {table}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+    ]
+    uninstall_sql = [
+        f'DROP TRIGGER IF EXISTS {table}_ai',
+        f'DROP TRIGGER IF EXISTS {table}_ad',
+        f'DROP TRIGGER IF EXISTS {table}_au',
+        f'DROP TABLE IF EXISTS {table}',
+    ]
+
+    def install(self):
+        self.execute(self.install_sql)
+
+    def uninstall(self):
+        self.execute(self.uninstall_sql)
+
+    def rebuild(self, batch_size=1000, progress=None):
+        table = self.table
+        self.execute([f"INSERT INTO {table}({table}) VALUES ('delete-all')"])
+        last_id, indexed = 0, 0
+        while True:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT MAX(id), COUNT(*) FROM ('
+                    ' SELECT id FROM todo_todo WHERE id > %s ORDER BY id LIMIT %s'
+                    ')',
+                    [last_id, batch_size],
+                )
+                max_id, count = cursor.fetchone()
+                if not count:
+                    break
+                cursor.execute(
+                    f'INSERT INTO {table}(rowid, title, description) '
+                    'SELECT id, title, description FROM todo_todo WHERE id > %s AND id <= %s',
+                    [last_id, max_id],
+                )
+            last_id, indexed = max_id, indexed + count
+            if progress:
+                progress(indexed)
+        self.execute([f"INSERT INTO {table}({table}) VALUES ('optimize')"])
+        return indexed
+
+    def build_match(self, terms):
+        """Quote every term and prefix-match it; terms are ANDed"""
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        terms = parse_terms(query)
+        if not terms:
+            return queryset.none()
+        match = self.build_match(terms)
+        table = self.table
+        rank_sql = (
+            f'SELECT -bm25({table}, {self.title_weight}, {self.description_weight}) '
+            f'FROM {table} WHERE {table} MATCH %s AND rowid = "todo_todo"."id"'
+        )
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(rank_sql, [match], output_field=FloatField())
+        )
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """Weighted tsvector ranking with a pg_trgm fallback for substring matches"""
+    vendor = 'postgresql'
+    config = 'simple'
+
+    install_sql = [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f"""
+        ALTER TABLE todo_todo ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{config}', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('{config}', coalesce(description, '')), 'B')
+        ) STORED
+        """,
+        'CREATE INDEX IF NOT EXISTS todo_search_vector_idx ON todo_todo USING GIN (search_vector)',
+        'CREATE INDEX IF NOT EXISTS todo_title_trgm_idx ON todo_todo USING GIN (title gin_trgm_ops)',
+    ]
+    uninstall_sql = [
+        'DROP INDEX IF EXISTS todo_title_trgm_idx',
+        'DROP INDEX IF EXISTS todo_search_vector_idx',
+        'ALTER TABLE todo_todo DROP COLUMN IF EXISTS search_vector',
+    ]
+
+    def install(self):
+        self.execute(self.install_sql)
+
+    def uninstall(self):
+        self.execute(self.uninstall_sql)
+
+    def rebuild(self, batch_size=1000, progress=None):
+        # The generated column is always current; rebuilding only refreshes
+        # the GIN indexes and planner statistics
+        self.execute([
+            'REINDEX INDEX todo_search_vector_idx',
+            'REINDEX INDEX todo_title_trgm_idx',
+            'ANALYZE todo_todo',
+        ])
+        return super().rebuild(batch_size, progress)
+
+    def search(self, queryset, query):
+        terms = parse_terms(query)
+        if not terms:
+            return queryset.none()
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        escaped = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'%{escaped}%'
+        ts = f"to_tsquery('{self.config}', %s)"
+        return queryset.filter(
+            RawSQL(
+                f'"todo_todo"."search_vector" @@ {ts} OR "todo_todo"."title" ILIKE %s',
+                [tsquery, pattern], output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank("todo_todo"."search_vector", {ts}) + similarity("todo_todo"."title", %s)',
+                [tsquery, query.strip()], output_field=FloatField(),
+            )
+        )
+
+
+BACKENDS = {backend.vendor: backend for backend in [SQLiteSearchBackend, PostgreSQLSearchBackend]}
+
+
+def get_search_backend(using='default'):
+    """Return the search backend for the given database alias"""
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+def search_todos(queryset, query):
+    """Filter ``queryset`` to todos matching ``query``, annotated with ``search_rank``"""
+    return get_search_backend(queryset.db).search(queryset, query)
@@ -1,3 +1,1512 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import token_cache
+from core.renderers import ORJSONRenderer, msgpack
+from core.testing import QueryBudgetTestMixin
+from .models import MaintenanceLock, Todo, TodoListState, TodoTombstone, get_list_scope
+from .serializers import (
+    TodoAdminSerializer, TodoSerializer, list_values, represent_admin_todos, represent_todos,
+)
+from .sync import encode_cursor
+from .writes import toggle_todo, update_todo
+
+
+class CursorPaginationTests(APITestCase):
+    """Keyset pagination opt-in for the todo list endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        now = timezone.now()
+        # Pairs of todos share a created_at so the id tiebreaker is exercised
+        self.todos = [
+            Todo.objects.create(
+                title=f'Todo {i:02d}',
+                user=self.user,
+                completed=i % 2 == 0,
+                created_at=now - timedelta(minutes=i // 2),
+            )
+            for i in range(25)
+        ]
+
+    def collect(self, url, params=None):
+        """Follow next links and return every result plus the number of pages"""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        results, pages = list(response.data['results']), 1
+        while response.data['next']:
+            self.assertNotIn('count', response.data)
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, 200)
+            results.extend(response.data['results'])
+            pages += 1
+        return results, pages
+
+    def test_page_number_pagination_is_default(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/todos/')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_cursor_walks_whole_list_in_order(self):
+        self.client.force_authenticate(self.user)
+        results, pages = self.collect('/api/todos/', {'pagination': 'cursor'})
+        expected = list(Todo.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([todo['id'] for todo in results], expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_previous_page(self):
+        self.client.force_authenticate(self.user)
+        first = self.client.get('/api/todos/', {'pagination': 'cursor', 'page_size': 7})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [todo['id'] for todo in back.data['results']],
+            [todo['id'] for todo in first.data['results']],
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_completed_and_pending_paginate_in_cursor_mode(self):
+        self.client.force_authenticate(self.user)
+        completed, _ = self.collect('/api/todos/completed/', {'pagination': 'cursor', 'page_size': 4})
+        pending, _ = self.collect('/api/todos/pending/', {'pagination': 'cursor', 'page_size': 4})
+        self.assertEqual(len(completed), 13)
+        self.assertEqual(len(pending), 12)
+        self.assertTrue(all(todo['completed'] for todo in completed))
+
+        # Without the opt-in the actions keep returning the full list
+        response = self.client.get('/api/todos/completed/')
+        self.assertEqual(len(response.data), 13)
+
+    def test_admin_list_honours_filters_and_ordering(self):
+        self.client.force_authenticate(self.staff)
+        results, _ = self.collect('/api/admin/todos/', {
+            'pagination': 'cursor',
+            'status': 'pending',
+            'ordering': 'title',
+            'search': 'Todo',
+        })
+        titles = [todo['title'] for todo in results]
+        self.assertEqual(titles, sorted(todo.title for todo in self.todos if not todo.completed))
+
+    def test_invalid_cursor_returns_404(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/todos/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryPlanTests(APITestCase):
+    """
+    Run EXPLAIN on every statement the hot todo paths issue against todo_todo
+    and fail if one falls back to a full table scan or a sort step.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        now = timezone.now()
+        todos = []
+        for i in range(30):
+            owner = [self.user, self.staff, None][i % 3]
+            todos.append(Todo(title=f'Todo {i}', user=owner, completed=i % 4 == 0,
+                              created_at=now - timedelta(hours=i)))
+        Todo.objects.bulk_create(todos)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Make the planner prove an index exists instead of preferring
+                # a seq scan on a tiny test table
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+    def find_plan_problems(self, plan):
+        problems = []
+        for line in plan:
+            if connection.vendor == 'postgresql':
+                if re.search(r'Seq Scan on todo_todo|\bSort\b', line):
+                    problems.append(line)
+            elif re.search(r'SCAN todo_\w+\b(?! USING)|USE TEMP B-TREE', line):
+                problems.append(line)
+        return problems
+
+    def assert_index_only_plans(self, run):
+        """Execute ``run`` and check the plan of every todo_todo statement it issued"""
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f'No plan checks for {connection.vendor}')
+        with CaptureQueriesContext(connection) as context:
+            run()
+        statements = [query['sql'] for query in context.captured_queries if 'todo_todo' in query['sql']]
+        self.assertTrue(statements, 'No todo_todo statements were captured')
+        for sql in statements:
+            plan = self.explain(sql)
+            problems = self.find_plan_problems(plan)
+            self.assertFalse(problems, f'Non-indexed plan for:\n{sql}\n' + '\n'.join(plan))
+
+    def get_pages(self, url, params):
+        """Fetch the first page and the one after it, so the seek query is covered too"""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        if isinstance(response.data, dict) and response.data.get('next'):
+            self.assertEqual(self.client.get(response.data['next']).status_code, 200)
+
+    def test_user_lists(self):
+        self.client.force_authenticate(self.user)
+        for url in ['/api/todos/', '/api/todos/completed/', '/api/todos/pending/']:
+            for params in [{}, {'pagination': 'cursor', 'page_size': 3}]:
+                with self.subTest(url=url, params=params):
+                    self.assert_index_only_plans(lambda: self.get_pages(url, params))
+
+    def test_delta_sync(self):
+        self.client.force_authenticate(self.user)
+        cursor = encode_cursor(timezone.now() - timedelta(hours=5))
+        self.assert_index_only_plans(lambda: self.get_pages('/api/todos/', {'since': cursor}))
+        self.client.force_authenticate(None)
+        self.assert_index_only_plans(lambda: self.get_pages('/api/todos/', {'since': cursor}))
+
+    def test_anonymous_lists(self):
+        for url in ['/api/todos/', '/api/todos/completed/', '/api/todos/pending/']:
+            for params in [{}, {'pagination': 'cursor', 'page_size': 3}]:
+                with self.subTest(url=url, params=params):
+                    self.assert_index_only_plans(lambda: self.get_pages(url, params))
+
+    def test_admin_list(self):
+        self.client.force_authenticate(self.staff)
+        for params in [{}, {'status': 'completed'}, {'status': 'pending'}]:
+            params = {'pagination': 'cursor', 'page_size': 3, **params}
+            with self.subTest(params=params):
+                self.assert_index_only_plans(lambda: self.get_pages('/api/admin/todos/', params))
+
+        # Regular users only see their own todos through the admin list
+        self.client.force_authenticate(self.user)
+        self.assert_index_only_plans(lambda: self.get_pages('/api/admin/todos/', {}))
+
+    def test_cleanup_anonymous_todos(self):
+        self.assert_index_only_plans(
+            lambda: call_command('cleanup_anonymous_todos', minutes=60, stdout=StringIO())
+        )
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """Todo endpoints stay within their declared query budgets with many rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        owners = [self.user, self.staff, None]
+        Todo.objects.bulk_create([Todo(title=f'Todo {i}', user=owners[i % 3], completed=i % 2 == 0) for i in range(30)])
+        self.todo = Todo.objects.filter(user=self.user).first()
+
+    def test_user_endpoints(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/todos/').status_code, 200)
+        self.assertEqual(self.client.get('/api/todos/', {'pagination': 'cursor'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/todos/completed/').status_code, 200)
+        self.assertEqual(self.client.get('/api/todos/pending/').status_code, 200)
+        self.assertEqual(self.client.post('/api/todos/', {'title': 'New'}).status_code, 201)
+        self.assertEqual(self.client.get(f'/api/todos/{self.todo.id}/').status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/todos/{self.todo.id}/', {'title': 'Renamed'}).status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/todos/{self.todo.id}/toggle_completed/').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/todos/{self.todo.id}/').status_code, 204)
+
+    def test_anonymous_endpoints(self):
+        self.assertEqual(self.client.get('/api/todos/').status_code, 200)
+        self.assertEqual(self.client.get('/api/todos/completed/').status_code, 200)
+        self.assertEqual(self.client.post('/api/todos/', {'title': 'New'}).status_code, 201)
+
+    def test_admin_list(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get('/api/admin/todos/').status_code, 200)
+        self.assertEqual(self.client.get('/api/admin/todos/', {'pagination': 'cursor'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/admin/todos/export/').status_code, 200)
+
+    def test_serializers_do_not_query_per_row(self):
+        from .serializers import TodoAdminSerializer
+        todos = list(Todo.objects.select_related('user'))
+        with self.assertQueryBudget(0):
+            TodoAdminSerializer(todos, many=True).data
+
+
+class SearchTests(APITestCase):
+    """Full-text search over todo title and description"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.milk_title = Todo.objects.create(title='Buy milk', description='From the corner shop', user=self.user)
+        self.milk_body = Todo.objects.create(title='Groceries', description='Eggs, bread and milk', user=self.staff)
+        self.other = Todo.objects.create(title='Write report', description='Quarterly numbers', user=self.user)
+
+    def search(self, query, **params):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/admin/todos/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [todo['id'] for todo in response.data['results']]
+
+    def test_matches_description_and_ranks_title_first(self):
+        self.assertEqual(self.search('milk'), [self.milk_title.id, self.milk_body.id])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('quart'), [self.other.id])
+        self.assertEqual(self.search('gro eg'), [self.milk_body.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(self.search('milk', ordering='-created_at'), [self.milk_body.id, self.milk_title.id])
+
+    def test_index_follows_save_and_delete(self):
+        self.other.title = 'Write summary'
+        self.other.save()
+        self.assertEqual(self.search('report'), [])
+        self.assertEqual(self.search('summary'), [self.other.id])
+
+        self.milk_title.delete()
+        self.assertEqual(self.search('milk'), [self.milk_body.id])
+
+        Todo.objects.bulk_create([Todo(title='Milk the cow')])
+        self.assertEqual(len(self.search('milk')), 2)
+
+    def test_regular_users_only_search_their_own_todos(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/admin/todos/', {'search': 'milk'})
+        self.assertEqual([todo['id'] for todo in response.data['results']], [self.milk_title.id])
+
+    def test_cursor_pagination_by_relevance(self):
+        Todo.objects.bulk_create([Todo(title=f'Milk {i}', user=self.staff) for i in range(5)])
+        ids = self.search('milk', pagination='cursor', page_size=2)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/admin/todos/', {'search': 'milk', 'pagination': 'cursor', 'page_size': 2})
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids.extend(todo['id'] for todo in response.data['results'])
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Clears the SQLite FTS5 table directly')
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO todo_todo_fts(todo_todo_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search('milk'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=2, stdout=out)
+        self.assertIn('3 todos', out.getvalue())
+        self.assertEqual(self.search('milk'), [self.milk_title.id, self.milk_body.id])
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class BulkOperationTests(APITestCase):
+    """Batch create/update/delete/toggle through /api/todos/bulk/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.other = User.objects.create_user(username='bob', password='testpass123')
+        self.todos = [Todo.objects.create(title=f'Todo {i}', description=f'Notes {i}', user=self.user) for i in range(4)]
+        self.foreign = Todo.objects.create(title='Not yours', user=self.other)
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, operations):
+        return self.client.post('/api/todos/bulk/', {'operations': operations}, format='json')
+
+    def test_mixed_batch(self):
+        first, second, third, fourth = self.todos
+        TodoListState.objects.reconcile([self.user.id])
+        response = self.bulk([
+            {'op': 'create', 'title': 'Fresh', 'description': 'New one'},
+            {'op': 'update', 'id': first.id, 'title': 'Renamed'},
+            {'op': 'update', 'id': second.id, 'completed': True},
+            {'op': 'toggle', 'id': third.id},
+            {'op': 'delete', 'id': fourth.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'updated', 'updated', 'updated', 'deleted'])
+        self.assertEqual(results[0]['data']['created_by'], 'alice')
+        self.assertEqual(results[1]['data']['title'], 'Renamed')
+        self.assertTrue(results[3]['data']['completed'])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        third.refresh_from_db()
+        self.assertEqual(first.title, 'Renamed')
+        self.assertGreater(first.updated_at, first.created_at)
+        # Fields an update did not send keep their values
+        self.assertEqual((first.description, first.completed), ('Notes 0', False))
+        self.assertEqual((second.title, second.description, second.completed), ('Todo 1', 'Notes 1', True))
+        self.assertTrue(third.completed)
+        self.assertFalse(Todo.objects.filter(id=fourth.id).exists())
+        self.assertTrue(Todo.objects.filter(title='Fresh', user=self.user).exists())
+        state = TodoListState.objects.get(scope=get_list_scope(self.user.id))
+        self.assertEqual((state.completed_count, state.pending_count), (2, 2))
+
+    def test_rows_deleted_after_validation_are_not_found(self):
+        from .bulk import apply_operations, validate_operations
+        first, second, third, _ = self.todos
+        queryset = Todo.objects.filter(user=self.user)
+        plan, results, has_errors = validate_operations([
+            {'op': 'update', 'id': first.id, 'title': 'Renamed'},
+            {'op': 'toggle', 'id': second.id},
+            {'op': 'delete', 'id': third.id},
+        ], queryset)
+        self.assertFalse(has_errors)
+        Todo.objects.filter(id__in=[first.id, third.id]).delete()
+
+        results = apply_operations(plan, results, queryset, self.user)
+        self.assertEqual([result['status'] for result in results], ['not_found', 'updated', 'not_found'])
+        self.assertTrue(Todo.objects.get(id=second.id).completed)
+
+    def test_mark_all_done_uses_a_single_update(self):
+        operations = [{'op': 'update', 'id': todo.id, 'completed': True} for todo in self.todos]
+        with CaptureQueriesContext(connection) as context:
+            response = self.bulk(operations)
+        self.assertEqual(response.status_code, 200)
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Todo.objects.filter(user=self.user, completed=True).count(), 4)
+
+    def test_invalid_item_aborts_whole_batch(self):
+        response = self.bulk([
+            {'op': 'delete', 'id': self.todos[0].id},
+            {'op': 'create', 'title': ''},
+            {'op': 'toggle', 'id': self.foreign.id},
+            {'op': 'archive', 'id': self.todos[1].id},
+        ])
+        self.assertEqual(response.status_code, 400)
+        statuses = [result.get('status') for result in response.data['results']]
+        self.assertEqual(statuses, [None, 'error', 'error', 'error'])
+        self.assertIn('title', response.data['results'][1]['errors'])
+        self.assertTrue(Todo.objects.filter(id=self.todos[0].id).exists())
+        self.assertFalse(Todo.objects.get(id=self.foreign.id).completed)
+
+    def test_boolean_ids_are_rejected(self):
+        # JSON true decodes to True, which Python treats as the integer 1
+        response = self.bulk([{'op': 'toggle', 'id': True}, {'op': 'delete', 'id': False}])
+        self.assertEqual(response.status_code, 400)
+        for result in response.data['results']:
+            self.assertEqual(result['errors'], {'id': ['A valid integer is required.']})
+        self.assertFalse(Todo.objects.filter(completed=True).exists())
+        self.assertEqual(Todo.objects.count(), 5)
+
+    def test_duplicate_ids_are_rejected(self):
+        todo = self.todos[0]
+        response = self.bulk([{'op': 'toggle', 'id': todo.id}, {'op': 'delete', 'id': todo.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][1]['status'], 'error')
+
+    def test_anonymous_scope(self):
+        token = 'client-token-0123456789'
+        anonymous = Todo.objects.create(title='Anonymous', anonymous_token=token)
+        other_client = Todo.objects.create(title='Other client', anonymous_token='other-token-0123456789')
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_X_ANONYMOUS_TOKEN=token)
+        response = self.bulk([
+            {'op': 'create', 'title': 'Anonymous too'},
+            {'op': 'toggle', 'id': anonymous.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['data']['created_by'], 'Anonymous')
+        self.assertEqual(self.bulk([{'op': 'delete', 'id': self.todos[0].id}]).status_code, 400)
+        self.assertEqual(self.bulk([{'op': 'delete', 'id': other_client.id}]).status_code, 400)
+        self.assertEqual(Todo.objects.get(title='Anonymous too').anonymous_token, token)
+
+    def test_rejects_bad_envelope(self):
+        self.assertEqual(self.bulk([]).status_code, 400)
+        self.assertEqual(self.client.post('/api/todos/bulk/', {}, format='json').status_code, 400)
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class DeltaSyncTests(APITestCase):
+    """?since=<cursor> delta sync with deletion tombstones"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.other = User.objects.create_user(username='bob', password='testpass123')
+        self.todos = [Todo.objects.create(title=f'Todo {i}', user=self.user) for i in range(3)]
+        Todo.objects.create(title='Not yours', user=self.other)
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=''):
+        response = self.client.get('/api/todos/', {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def age(self, seconds):
+        """Pretend everything so far happened ``seconds`` ago"""
+        past = timezone.now() - timedelta(seconds=seconds)
+        Todo.objects.update(updated_at=past)
+        TodoTombstone.objects.update(deleted_at=past)
+        return encode_cursor(past + timedelta(seconds=1))
+
+    def test_initial_sync_returns_everything(self):
+        data = self.sync()
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(data['deleted'], [])
+        self.assertTrue(data['cursor'])
+
+    def test_delta_contains_only_changes(self):
+        cursor = self.age(60)
+        first, second, third = self.todos
+        self.client.patch(f'/api/todos/{first.id}/', {'title': 'Changed'})
+        self.client.delete(f'/api/todos/{second.id}/')
+        self.client.post('/api/todos/bulk/', {'operations': [
+            {'op': 'create', 'title': 'Bulk created'},
+            {'op': 'delete', 'id': third.id},
+        ]}, format='json')
+
+        data = self.sync(cursor)
+        self.assertFalse(data['full'])
+        self.assertEqual(sorted(todo['title'] for todo in data['results']), ['Bulk created', 'Changed'])
+        self.assertEqual(sorted(data['deleted']), sorted([second.id, third.id]))
+
+        # Nothing changed after the new cursor
+        later = self.age(60)
+        data = self.sync(later)
+        self.assertEqual((data['results'], data['deleted']), ([], []))
+
+    def test_tombstones_are_scoped(self):
+        cursor = self.age(60)
+        Todo.objects.filter(user=self.other).delete_with_tombstones()
+        self.assertEqual(self.sync(cursor)['deleted'], [])
+
+    def test_expired_cursor_forces_full_sync(self):
+        with self.settings(TODO_SYNC_TOMBSTONE_RETENTION=timedelta(seconds=30)):
+            data = self.sync(self.age(60))
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['results']), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/todos/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cleanup_and_prune_commands(self):
+        anonymous = Todo.objects.create(title='Old', created_at=timezone.now() - timedelta(hours=1))
+        call_command('cleanup_anonymous_todos', stdout=StringIO())
+        self.assertTrue(TodoTombstone.objects.filter(todo_id=anonymous.id, user__isnull=True).exists())
+
+        TodoTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=90))
+        call_command('prune_todo_tombstones', stdout=StringIO())
+        self.assertFalse(TodoTombstone.objects.exists())
+
+
+class CleanupAnonymousTodosTests(APITestCase):
+    """Batched cleanup of expired anonymous todos and its --loop mode"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        old = timezone.now() - timedelta(hours=1)
+        Todo.objects.bulk_create(
+            [Todo(title=f'Old {i}', created_at=old - timedelta(seconds=i), completed=i % 2 == 0) for i in range(25)]
+            + [Todo(title='Fresh'), Todo(title='Owned', user=self.user, created_at=old)]
+        )
+        TodoListState.objects.reconcile([self.user.id], anonymous=True)
+
+    def cleanup(self, **options):
+        stdout = StringIO()
+        call_command('cleanup_anonymous_todos', batch_size=10, sleep=0, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_deletes_in_batches(self):
+        with CaptureQueriesContext(connection) as context:
+            output = self.cleanup()
+        self.assertIn('Successfully deleted 25 anonymous todos', output)
+        self.assertEqual(output.count('so far'), 2)
+        deletes = [query['sql'] for query in context.captured_queries if query['sql'].startswith('DELETE FROM "todo_todo"')]
+        self.assertEqual(len(deletes), 3)
+
+        self.assertEqual(set(Todo.objects.values_list('title', flat=True)), {'Fresh', 'Owned'})
+        self.assertEqual(TodoTombstone.objects.count(), 25)
+        self.assertEqual(TodoListState.objects.reconcile([self.user.id], anonymous=True), 0)
+        self.assertIn('No anonymous todos', self.cleanup())
+
+    def test_dry_run_deletes_nothing(self):
+        output = self.cleanup(dry_run=True)
+        self.assertIn('Would delete 25', output)
+        self.assertEqual(Todo.objects.count(), 27)
+
+    def test_lock(self):
+        self.assertTrue(MaintenanceLock.objects.acquire('job', 'a', 60))
+        self.assertTrue(MaintenanceLock.objects.acquire('job', 'a', 60))
+        self.assertFalse(MaintenanceLock.objects.acquire('job', 'b', 60))
+        MaintenanceLock.objects.filter(name='job').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(MaintenanceLock.objects.acquire('job', 'b', 60))
+        MaintenanceLock.objects.release('job', 'a')
+        self.assertFalse(MaintenanceLock.objects.acquire('job', 'a', 60))
+        MaintenanceLock.objects.release('job', 'b')
+        self.assertFalse(MaintenanceLock.objects.exists())
+
+    @mock.patch('todo.management.commands.cleanup_anonymous_todos.time.sleep', side_effect=[None, KeyboardInterrupt])
+    def test_loop_skips_while_another_worker_holds_the_lock(self, sleep):
+        MaintenanceLock.objects.acquire('cleanup_anonymous_todos', 'other-worker', 60)
+        self.cleanup(loop=True, interval=1)
+        self.assertEqual(Todo.objects.count(), 27)
+
+        MaintenanceLock.objects.release('cleanup_anonymous_todos', 'other-worker')
+        sleep.side_effect = [None, None, KeyboardInterrupt]
+        output = self.cleanup(loop=True, interval=1)
+        self.assertIn('Successfully deleted 25', output)
+        self.assertIn('Stopping.', output)
+        self.assertFalse(MaintenanceLock.objects.exists())
+
+
+class ExportTests(APITestCase):
+    """Streaming NDJSON/CSV export of the admin todo list"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        owners = [self.user, self.staff, None]
+        Todo.objects.bulk_create([
+            Todo(title=f'Todo {i}', description='milk' if i % 5 == 0 else '', user=owners[i % 3], completed=i % 2 == 0)
+            for i in range(30)
+        ])
+
+    def export(self, **params):
+        response = self.client.get('/api/admin/todos/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_matches_admin_list(self):
+        self.client.force_authenticate(self.staff)
+        params = {'search': 'milk', 'status': 'completed', 'ordering': 'title'}
+        listed = self.client.get('/api/admin/todos/', {**params, 'page_size': 100}).json()['results']
+        exported = [json.loads(line) for line in self.export(**params).splitlines()]
+        self.assertTrue(exported)
+        self.assertEqual(exported, listed)
+
+    def test_csv(self):
+        self.client.force_authenticate(self.staff)
+        rows = list(csv.reader(StringIO(self.export(export_format='csv'))))
+        self.assertEqual(rows[0][:3], ['id', 'title', 'description'])
+        self.assertEqual(len(rows), 31)
+        self.assertIn('Anonymous', {row[4] for row in rows[1:]})
+
+        Todo.objects.all().delete()
+        self.assertEqual(len(list(csv.reader(StringIO(self.export(export_format='csv'))))), 1)
+
+    def test_regular_users_export_their_own_todos(self):
+        self.client.force_authenticate(self.user)
+        exported = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual(len(exported), 10)
+        self.assertEqual({todo['creator_id'] for todo in exported}, {self.user.id})
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/admin/todos/export/').status_code, 401)
+
+    def test_streams_in_chunks(self):
+        from .export import ndjson_lines
+        chunks = list(ndjson_lines(Todo.objects.order_by('id'), chunk_size=7))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [7, 7, 7, 7, 2])
+
+    def test_gzip(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/admin/todos/export/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 30)
+
+    def test_unknown_format(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/admin/todos/export/', {'export_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class ImportTests(QueryBudgetTestMixin, APITestCase):
+    """Streaming bulk import from NDJSON/CSV uploads and the import_todos command"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name='todos.ndjson', **params):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        url = '/api/todos/import/'
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.post(url, {'file': upload}, format='multipart')
+
+    def test_ndjson_reports_invalid_rows_and_keeps_the_rest(self):
+        lines = [json.dumps({'title': f'Todo {i}', 'completed': i % 3 == 0}) for i in range(1200)]
+        lines[10] = json.dumps({'title': ''})
+        lines[500] = '{not json'
+        lines[700] = '[1, 2]'
+        response = self.upload('\n'.join(lines) + '\n\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 1197)
+        self.assertEqual(response.data['failed'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [11, 501, 701])
+        self.assertIn('title', response.data['errors'][0]['errors'])
+
+        todos = Todo.objects.filter(user=self.user)
+        self.assertEqual(todos.count(), 1197)
+        state = TodoListState.objects.get(scope=get_list_scope(self.user.id))
+        self.assertEqual(state.completed_count, todos.filter(completed=True).count())
+        self.assertEqual(state.pending_count, todos.filter(completed=False).count())
+
+    def test_csv_round_trips_an_export(self):
+        Todo.objects.create(title='Milk, eggs', description='Line one\nline two', completed=True, user=self.user)
+        Todo.objects.create(title='Bread', user=self.user)
+        exported = b''.join(self.client.get('/api/admin/todos/export/', {'export_format': 'csv'}).streaming_content)
+        Todo.objects.all().delete()
+
+        response = self.upload(exported.decode('utf-8'), name='export.csv')
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(
+            set(Todo.objects.values_list('title', 'description', 'completed')),
+            {('Milk, eggs', 'Line one\nline two', True), ('Bread', '', False)},
+        )
+
+    def test_format_and_encoding_errors(self):
+        self.assertEqual(self.upload('title\nA\n', name='todos.txt', import_format='xml').status_code, 400)
+        self.assertEqual(self.client.post('/api/todos/import/', {}, format='multipart').status_code, 400)
+
+        upload = SimpleUploadedFile('todos.csv', 'title\nA\n'.encode('utf-8') + 'Ä\n'.encode('latin-1'))
+        response = self.client.post('/api/todos/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['failed'], 1)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.upload('{"title": "A"}').status_code, 401)
+
+    def test_batches_use_a_fixed_number_of_queries(self):
+        from .imports import import_todos
+        rows = [(i, {'title': f'Todo {i}'}) for i in range(50)]
+        # SAVEPOINT, INSERT, counter upsert, RELEASE
+        with self.assertQueryBudget(4):
+            import_todos(rows, self.user, batch_size=50)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('title,completed\nA,true\nB,false\n,false\n')
+        self.addCleanup(os.remove, f.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_todos', f.name, user='alice', batch_size=2, stdout=stdout, stderr=stderr)
+        self.assertIn('imported 2 todos, skipped 1', stdout.getvalue())
+        self.assertIn('Row 3', stderr.getvalue())
+        self.assertEqual(TodoListState.objects.get(scope=get_list_scope(self.user.id)).total_count, 2)
+
+    def test_command_for_an_anonymous_client(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            f.write('{"title": "Imported"}\n')
+        self.addCleanup(os.remove, f.name)
+        token = 'imported-anonymous-client'
+        call_command('import_todos', f.name, anonymous_token=token, stdout=StringIO())
+        self.assertEqual(TodoListState.objects.get(scope=get_list_scope(token)).total_count, 1)
+        client = self.client_class()
+        client.credentials(HTTP_X_ANONYMOUS_TOKEN=token)
+        self.assertEqual([todo['title'] for todo in client.get('/api/todos/').data['results']], ['Imported'])
+
+        with self.assertRaisesMessage(CommandError, 'anonymous token'):
+            call_command('import_todos', f.name, anonymous_token='short', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'one of the arguments'):
+            call_command('import_todos', f.name, stdout=StringIO())
+
+
+class ConditionalListTests(APITestCase):
+    """ETag / Last-Modified revalidation of the per-user todo lists"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.other = User.objects.create_user(username='bob', password='testpass123')
+        self.todo = Todo.objects.create(title='First', user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def get(self, url='/api/todos/', etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def test_unchanged_list_returns_304_without_touching_todos(self):
+        etag = self.get()['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in context.captured_queries if 'todo_todo"' in query['sql']])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_every_write_path_changes_the_etag(self):
+        writes = [
+            lambda: self.client.post('/api/todos/', {'title': 'Second'}),
+            lambda: self.client.patch(f'/api/todos/{self.todo.id}/', {'title': 'Renamed'}),
+            lambda: self.client.patch(f'/api/todos/{self.todo.id}/toggle_completed/'),
+            lambda: self.client.post('/api/todos/bulk/', {'operations': [{'op': 'toggle', 'id': self.todo.id}]}, format='json'),
+            lambda: self.client.delete(f'/api/todos/{self.todo.id}/'),
+        ]
+        for write in writes:
+            etag = self.get()['ETag']
+            self.assertLess(write().status_code, 300)
+            response = self.get(etag=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_variants_and_users_have_distinct_etags(self):
+        etags = {
+            self.get()['ETag'],
+            self.get('/api/todos/completed/')['ETag'],
+            self.get('/api/todos/pending/')['ETag'],
+            self.get(pagination='cursor')['ETag'],
+        }
+        self.assertEqual(len(etags), 4)
+        self.client.force_authenticate(self.other)
+        self.assertNotIn(self.get()['ETag'], etags)
+
+    def test_other_users_writes_do_not_invalidate(self):
+        etag = self.get()['ETag']
+        Todo.objects.create(title='Elsewhere', user=self.other)
+        TodoListState.objects.touch([self.other.id])
+        self.assertEqual(self.get(etag=etag).status_code, 304)
+
+    def test_anonymous_list(self):
+        self.client.force_authenticate(None)
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag=etag).status_code, 304)
+        self.client.post('/api/todos/', {'title': 'Anonymous'})
+        self.assertEqual(self.get(etag=etag).status_code, 200)
+
+        anonymous = Todo.objects.get(title='Anonymous')
+        anonymous.created_at = timezone.now() - timedelta(hours=1)
+        anonymous.save()
+        etag = self.get()['ETag']
+        call_command('cleanup_anonymous_todos', stdout=StringIO())
+        self.assertEqual(self.get(etag=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        self.client.post('/api/todos/', {'title': 'Second'})
+        last_modified = self.get()['Last-Modified']
+        response = self.client.get('/api/todos/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class ListCounterTests(APITestCase):
+    """Incrementally maintained per-list counters behind /api/todos/stats/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def stats(self):
+        response = self.client.get('/api/todos/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['completed'], response.data['pending']
+
+    def assertCountersMatch(self):
+        todos = Todo.objects.filter(user=self.user)
+        expected = (todos.filter(completed=True).count(), todos.filter(completed=False).count())
+        self.assertEqual(self.stats(), expected)
+
+    def test_empty_list(self):
+        self.assertEqual(self.client.get('/api/todos/stats/').data, {
+            'total': 0, 'completed': 0, 'pending': 0, 'last_activity': None,
+        })
+
+    def test_every_write_path_keeps_counters_exact(self):
+        first = self.client.post('/api/todos/', {'title': 'First'}).data['id']
+        second = self.client.post('/api/todos/', {'title': 'Second', 'completed': True}).data['id']
+        self.assertEqual(self.stats(), (1, 1))
+        self.client.patch(f'/api/todos/{first}/toggle_completed/')
+        self.assertEqual(self.stats(), (2, 0))
+        self.client.patch(f'/api/todos/{second}/', {'completed': False})
+        self.client.patch(f'/api/todos/{second}/', {'title': 'Renamed'})
+        self.assertEqual(self.stats(), (1, 1))
+        self.client.post('/api/todos/bulk/', {'operations': [
+            {'op': 'create', 'title': 'Third', 'completed': True},
+            {'op': 'create', 'title': 'Fourth'},
+            {'op': 'toggle', 'id': first},
+            {'op': 'update', 'id': second, 'completed': True},
+        ]}, format='json')
+        self.assertCountersMatch()
+        self.client.post('/api/todos/bulk/', {'operations': [{'op': 'delete', 'id': first}]}, format='json')
+        self.client.delete(f'/api/todos/{second}/')
+        self.assertCountersMatch()
+        response = self.client.get('/api/todos/stats/')
+        self.assertEqual(response.data['total'], 2)
+        self.assertIsNotNone(response.data['last_activity'])
+
+    def test_anonymous_counters_follow_cleanup(self):
+        self.client.force_authenticate(None)
+        todo_id = self.client.post('/api/todos/', {'title': 'Anonymous'}).data['id']
+        self.assertEqual(self.stats(), (0, 1))
+        Todo.objects.filter(id=todo_id).update(created_at=timezone.now() - timedelta(hours=1))
+        call_command('cleanup_anonymous_todos', stdout=StringIO())
+        self.assertEqual(self.stats(), (0, 0))
+
+    def test_reconcile_repairs_drift(self):
+        self.client.post('/api/todos/', {'title': 'Tracked'})
+        # Writes that bypass the API leave the counters behind
+        Todo.objects.create(title='Untracked', user=self.user, completed=True)
+        other = User.objects.create_user(username='bob', password='testpass123')
+        Todo.objects.create(title='Untracked too', user=other)
+        TodoListState.objects.filter(scope='anonymous').delete()
+        self.assertEqual(self.stats(), (0, 1))
+
+        out = StringIO()
+        call_command('reconcile_todo_stats', batch_size=1, stdout=out)
+        self.assertIn('repaired 2', out.getvalue())
+        self.assertCountersMatch()
+        self.assertEqual(other.todo_list_state.pending_count, 1)
+
+        out = StringIO()
+        call_command('reconcile_todo_stats', stdout=out)
+        self.assertIn('repaired 0', out.getvalue())
+
+    def test_reconcile_batches_anonymous_lists(self):
+        Todo.objects.create(title='Shared', completed=True)
+        Todo.objects.create(title='First client', anonymous_token='client-a')
+        Todo.objects.create(title='Second client', anonymous_token='client-b')
+        # A list whose todos are gone keeps its state row until reconciled
+        TodoListState.objects.create(scope=get_list_scope('client-c'), pending_count=3)
+
+        out = StringIO()
+        with mock.patch.object(
+            TodoListState.objects, 'reconcile', wraps=TodoListState.objects.reconcile
+        ) as reconcile:
+            call_command('reconcile_todo_stats', batch_size=2, stdout=out)
+        # alice; the shared list, client-a; client-b, client-c
+        self.assertIn('checked 5 todo lists, repaired 4', out.getvalue())
+        self.assertEqual(
+            [call.kwargs.get('anonymous_tokens') for call in reconcile.call_args_list],
+            [None, ['', 'client-a'], ['client-b', 'client-c']],
+        )
+        self.assertCountersMatch()
+        self.assertEqual(
+            TodoListState.objects.get(scope=get_list_scope('client-c')).pending_count, 0
+        )
+
+
+class TargetedWriteTests(APITestCase):
+    """Saves write only the changed columns and toggles flip in one UPDATE"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.todo_id = self.client.post('/api/todos/', {'title': 'Tracked', 'description': 'Notes'}).data['id']
+
+    def writes(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+
+    def test_save_writes_changed_columns_only(self):
+        todo = Todo.objects.get(id=self.todo_id)
+        with CaptureQueriesContext(connection) as queries:
+            todo.save()
+        self.assertEqual(len(queries), 0)
+
+        todo.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            todo.save()
+        [update] = self.writes(queries)
+        self.assertIn('"title"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"description"', update)
+        self.assertNotIn('"completed"', update)
+        with CaptureQueriesContext(connection) as queries:
+            todo.save()
+        self.assertEqual(len(queries), 0)
+
+        todo.refresh_from_db()
+        self.assertEqual(todo.title, 'Renamed')
+        self.assertEqual(todo.description, 'Notes')
+
+    def test_toggle_is_one_conditional_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/todos/{self.todo_id}/toggle_completed/')
+        self.assertTrue(response.data['completed'])
+        updates = [sql for sql in self.writes(queries) if 'todo_todo"' in sql and 'todoliststate' not in sql]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('NOT completed', updates[0])
+
+    def test_toggle_of_a_stale_instance_flips_the_stored_state(self):
+        stale = Todo.objects.get(id=self.todo_id)
+        other = Todo.objects.get(id=self.todo_id)
+        self.assertTrue(toggle_todo(other).completed)
+        # A read-modify-write would write completed=True again
+        self.assertFalse(toggle_todo(stale).completed)
+        self.assertFalse(Todo.objects.get(id=self.todo_id).completed)
+        state = TodoListState.objects.get(user=self.user)
+        self.assertEqual((state.completed_count, state.pending_count), (0, 1))
+
+    def test_updates_of_stale_instances_keep_counters_exact(self):
+        # All loaded before any update, as by concurrent PATCHes
+        first, second, third = (Todo.objects.get(id=self.todo_id) for _ in range(3))
+        for instance in (first, second):
+            serializer = TodoSerializer(instance, data={'completed': True}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            update_todo(serializer)
+        state = TodoListState.objects.get(user=self.user)
+        self.assertEqual((state.completed_count, state.pending_count), (1, 0))
+
+        # An update that does not set completed leaves it alone
+        serializer = TodoSerializer(third, data={'title': 'Renamed'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        update_todo(serializer)
+        self.assertTrue(Todo.objects.get(id=self.todo_id).completed)
+        state.refresh_from_db()
+        self.assertEqual((state.completed_count, state.pending_count), (1, 0))
+
+    @override_settings(QUERY_BUDGET={'RAISE': True})
+    def test_toggle_without_returning_support(self):
+        # SQLite before 3.35 has neither RETURNING nor the fast upsert path checks for
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False), \
+                mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(f'/api/todos/{self.todo_id}/toggle_completed/')
+        self.assertTrue(response.data['completed'])
+        self.assertFalse(any('RETURNING' in query['sql'] or 'ON CONFLICT' in query['sql'] for query in queries))
+        self.assertTrue(Todo.objects.get(id=self.todo_id).completed)
+        state = TodoListState.objects.get(user=self.user)
+        self.assertEqual((state.completed_count, state.pending_count), (1, 0))
+
+
+@override_settings(QUERY_BUDGET={'RAISE': True})
+class AnonymousClientTests(APITestCase):
+    """Anonymous todos are partitioned by the client's anonymous token"""
+
+    def setUp(self):
+        self.first = self.client_with_token()
+        self.second = self.client_with_token()
+
+    def client_with_token(self):
+        response = self.client_class().get('/api/todos/')
+        token = response['X-Anonymous-Token']
+        self.assertEqual(response.cookies['anonymous_token'].value, token)
+        client = self.client_class()
+        client.credentials(HTTP_X_ANONYMOUS_TOKEN=token)
+        return client
+
+    def titles(self, client, url='/api/todos/'):
+        data = client.get(url).data
+        return [todo['title'] for todo in (data['results'] if 'results' in data else data)]
+
+    def test_clients_only_see_their_own_todos(self):
+        self.first.post('/api/todos/', {'title': 'First'})
+        self.second.post('/api/todos/', {'title': 'Second'})
+        Todo.objects.create(title='Legacy shared')
+        self.assertEqual(self.titles(self.first), ['First'])
+        self.assertEqual(self.titles(self.second), ['Second'])
+        self.assertEqual(self.titles(self.first, '/api/todos/pending/'), ['First'])
+
+        todo_id = Todo.objects.get(title='First').id
+        self.assertEqual(self.second.get(f'/api/todos/{todo_id}/').status_code, 404)
+        self.assertEqual(self.second.delete(f'/api/todos/{todo_id}/').status_code, 404)
+        self.assertEqual(self.first.get('/api/todos/stats/').data['total'], 1)
+        self.assertNotIn('X-Anonymous-Token', self.first.get('/api/todos/'))
+
+    def test_token_is_issued_on_first_write_and_kept_by_cookie(self):
+        response = self.client.post('/api/todos/', {'title': 'Mine'})
+        token = response['X-Anonymous-Token']
+        self.assertEqual(Todo.objects.get(title='Mine').anonymous_token, token)
+        # The test client sends the cookie back like a browser would
+        self.assertEqual(self.titles(self.client), ['Mine'])
+        self.assertEqual(self.titles(self.first), [])
+
+    def test_invalid_tokens_are_replaced(self):
+        self.client.credentials(HTTP_X_ANONYMOUS_TOKEN='short')
+        self.assertIn('X-Anonymous-Token', self.client.get('/api/todos/'))
+
+    def test_etags_and_delta_sync_are_per_client(self):
+        self.first.post('/api/todos/', {'title': 'First'})
+        etag = self.second.get('/api/todos/')['ETag']
+        self.first.post('/api/todos/', {'title': 'First again'})
+        self.assertEqual(self.second.get('/api/todos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        cursor = self.second.get('/api/todos/', {'since': ''}).data['cursor']
+        self.first.delete(f'/api/todos/{Todo.objects.get(title="First").id}/')
+        self.assertEqual(self.second.get('/api/todos/', {'since': cursor}).data['deleted'], [])
+
+    def test_cleanup_drops_expired_client_lists(self):
+        self.first.post('/api/todos/', {'title': 'First'})
+        self.second.post('/api/todos/', {'title': 'Second'})
+        Todo.objects.filter(title='First').update(created_at=timezone.now() - timedelta(hours=1))
+        call_command('cleanup_anonymous_todos', stdout=StringIO())
+        self.assertEqual(self.titles(self.second), ['Second'])
+        self.assertEqual(list(TodoListState.objects.values_list('pending_count', flat=True)), [1])
+        self.assertEqual(TodoListState.objects.reconcile([], anonymous=True), 0)
+
+
+class AsyncViewTests(APITestCase):
+    """The async-native views answer exactly like TodoViewSet"""
+    async_urlconf = 'todolist_project.async_urls'
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        for i in range(13):
+            Todo.objects.create(title=f'Todo {i}', description='Ünïcode', completed=i % 3 == 0, user=self.user)
+        Todo.objects.create(title='Anonymous')
+        TodoListState.objects.reconcile([self.user.id], anonymous=True)
+        self.header = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def request(self, method, url, urlconf, data=None, authenticated=True, **extra):
+        if authenticated:
+            extra['HTTP_AUTHORIZATION'] = self.header
+        with override_settings(ROOT_URLCONF=urlconf):
+            return getattr(self.client, method)(url, data, format='json', **extra)
+
+    def assertSameResponse(self, method, url, **kwargs):
+        sync = self.request(method, url, 'todolist_project.urls', **kwargs)
+        asynchronous = self.request(method, url, self.async_urlconf, **kwargs)
+        self.assertEqual(asynchronous.status_code, sync.status_code, url)
+        self.assertEqual(asynchronous.content, sync.content, url)
+        self.assertEqual(asynchronous.get('ETag'), sync.get('ETag'), url)
+        return asynchronous
+
+    def test_routes_to_async_views(self):
+        from . import async_views
+        self.assertIs(resolve('/api/todos/', urlconf=self.async_urlconf).func, async_views.todo_list)
+        self.assertIs(resolve('/api/todos/1/toggle_completed/', urlconf=self.async_urlconf).func, async_views.todo_toggle)
+
+    def test_reads_match_the_sync_stack(self):
+        todo = Todo.objects.filter(user=self.user).first()
+        for url in [
+            '/api/todos/', '/api/todos/?page=2', '/api/todos/?page=9', '/api/todos/?page=last',
+            '/api/todos/?pagination=cursor&page_size=4', '/api/todos/?cursor=invalid',
+            '/api/todos/completed/', '/api/todos/pending/?pagination=cursor&page_size=2',
+            f'/api/todos/{todo.id}/', '/api/todos/999999/',
+            '/api/auth/profile/',
+        ]:
+            self.assertSameResponse('get', url)
+        self.assertSameResponse('get', '/api/todos/', authenticated=False)
+        self.assertSameResponse('get', '/api/todos/', HTTP_AUTHORIZATION='Bearer invalid')
+
+    def test_list_reads_stay_on_the_event_loop(self):
+        # Neither run in a thread nor delegated to the viewset
+        with mock.patch('todo.async_views.sync_to_async', side_effect=AssertionError('left the event loop')), \
+                mock.patch('todo.async_views.delegate', side_effect=AssertionError('delegated')):
+            for url in ['/api/todos/?page=2', '/api/todos/?pagination=cursor', '/api/todos/pending/']:
+                self.assertEqual(self.request('get', url, self.async_urlconf).status_code, 200)
+
+    def test_cursor_pages_match_the_sync_stack(self):
+        url = '/api/todos/?pagination=cursor&page_size=5'
+        while url:
+            response = self.assertSameResponse('get', url)
+            url = response.json()['next']
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_content_negotiation_matches_the_sync_stack(self):
+        todo = Todo.objects.filter(user=self.user).first()
+        for url in ['/api/todos/?page=2', '/api/todos/completed/', f'/api/todos/{todo.id}/', '/api/auth/profile/']:
+            response = self.assertSameResponse('get', url, HTTP_ACCEPT='application/msgpack')
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+        # Served by the async views themselves, not delegated to the viewset
+        with mock.patch('todo.async_views.delegate', side_effect=AssertionError('delegated')):
+            self.request('get', '/api/todos/?pagination=cursor', self.async_urlconf, HTTP_ACCEPT='application/msgpack')
+        response = self.assertSameResponse('get', '/api/todos/?format=msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['count'], 13)
+        self.assertSameResponse('get', '/api/todos/', HTTP_ACCEPT='application/xml')
+
+        response = self.request(
+            'patch', f'/api/todos/{todo.id}/toggle_completed/', self.async_urlconf, HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(msgpack.unpackb(response.content)['completed'], not todo.completed)
+
+    def test_conditional_get(self):
+        etag = self.request('get', '/api/todos/', self.async_urlconf)['ETag']
+        response = self.request('get', '/api/todos/', self.async_urlconf, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes(self):
+        response = self.request('post', '/api/todos/', self.async_urlconf, {'title': 'Async'})
+        self.assertEqual(response.status_code, 201)
+        todo_id = response.json()['id']
+        self.assertEqual(response.json()['created_by'], 'alice')
+
+        response = self.request('patch', f'/api/todos/{todo_id}/', self.async_urlconf, {'title': 'Renamed'})
+        self.assertEqual(response.json()['title'], 'Renamed')
+        response = self.request('put', f'/api/todos/{todo_id}/', self.async_urlconf, {'title': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json())
+        response = self.request('patch', f'/api/todos/{todo_id}/toggle_completed/', self.async_urlconf)
+        self.assertTrue(response.json()['completed'])
+        self.assertSameResponse('get', f'/api/todos/{todo_id}/')
+        self.assertEqual(self.client.get('/api/todos/stats/', HTTP_AUTHORIZATION=self.header).json()['completed'], 6)
+
+        response = self.request('delete', f'/api/todos/{todo_id}/', self.async_urlconf)
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(TodoTombstone.objects.filter(todo_id=todo_id).exists())
+
+        response = self.request('post', '/api/todos/', self.async_urlconf, {'title': 'Anon'}, authenticated=False)
+        self.assertEqual(response.json()['created_by'], 'Anonymous')
+        self.assertEqual(Todo.objects.get(title='Anon').anonymous_token, response['X-Anonymous-Token'])
+
+
+class FastListSerializationTests(APITestCase):
+    """List responses built from values() rows match the ModelSerializer output"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        now = timezone.now()
+        for i in range(15):
+            Todo.objects.create(
+                title=f'Groceries {i}', description='Milk' if i % 2 else '', completed=i % 3 == 0,
+                user=self.user if i % 5 else None, created_at=now - timedelta(minutes=i),
+            )
+
+    def test_representations_match_serializers(self):
+        queryset = Todo.objects.select_related('user').order_by('-created_at', 'id')
+        self.assertEqual(represent_todos(list_values(queryset)), TodoSerializer(queryset, many=True).data)
+        self.assertEqual(
+            represent_admin_todos(list_values(queryset)), TodoAdminSerializer(queryset, many=True).data
+        )
+
+    def test_list_endpoints_match_serializers(self):
+        self.client.force_authenticate(self.user)
+        todos = Todo.objects.select_related('user').filter(user=self.user)
+        response = self.client.get('/api/todos/')
+        self.assertEqual(response.json()['results'], TodoSerializer(todos.order_by('-created_at')[:10], many=True).data)
+        response = self.client.get('/api/todos/pending/')
+        self.assertEqual(response.json(), TodoSerializer(todos.filter(completed=False), many=True).data)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/admin/todos/', {'search': 'groceries', 'ordering': 'title'})
+        expected = Todo.objects.select_related('user').order_by('title')[:10]
+        self.assertEqual(response.json()['results'], TodoAdminSerializer(expected, many=True).data)
+
+    def test_keyset_pages_from_values_rows(self):
+        self.client.force_authenticate(self.staff)
+        seen = []
+        response = self.client.get('/api/admin/todos/', {'pagination': 'cursor', 'page_size': 4, 'search': 'groceries'})
+        while True:
+            seen += [todo['id'] for todo in response.json()['results']]
+            if not response.json()['next']:
+                break
+            response = self.client.get(response.json()['next'])
+        self.assertEqual(sorted(seen), sorted(Todo.objects.values_list('id', flat=True)))
+
+    def test_microbenchmark(self):
+        out = StringIO()
+        call_command('benchmark_serializers', todos=20, repeat=1, allow_seed=True, stdout=out)
+        self.assertIn('TodoSerializer speedup', out.getvalue())
+        self.assertIn('TodoAdminSerializer speedup', out.getvalue())
+
+
+class RendererTests(APITestCase):
+    """orjson and MessagePack renderers and parsers behind content negotiation"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.client.post('/api/todos/', {'title': 'Café ☕ \u2028 line', 'description': 'tab\tquote" \x01'})
+
+    def test_orjson_output_is_byte_identical(self):
+        now = timezone.now()
+        data = {
+            'text': 'Café ☕ \u2028\u2029 "quoted" \\ \n\t\x00\x1f\x7f',
+            'aware': now,
+            'naive': timezone.make_naive(now).replace(microsecond=123456),
+            'date': now.date(),
+            'time': now.time(),
+            'decimal': Decimal('12.50'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('Invalid cursor'),
+            'numbers': [0, -1, 2 ** 62, 1.5, True, False, None],
+            'nested': {'tuple': (1, 2), 'empty': {}},
+            1: 'int key',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_api_responses_are_unchanged(self):
+        response = self.client.get('/api/todos/')
+        self.assertEqual(response.content, JSONRenderer().render(response.json()))
+        self.assertEqual(self.client.post('/api/todos/', '{"title": ', content_type='application/json').status_code, 400)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack_by_accept_and_content_type(self):
+        expected = self.client.get('/api/todos/').json()
+        response = self.client.get('/api/todos/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        response = self.client.post(
+            '/api/todos/', msgpack.packb({'title': 'Packed', 'completed': True}),
+            content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content)['title'], 'Packed')
+        self.assertTrue(Todo.objects.get(title='Packed').completed)
+        response = self.client.post('/api/todos/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+
+class CompressionTests(APITestCase):
+    """Response compression negotiated by CompressionMiddleware"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client.force_authenticate(self.user)
+        Todo.objects.bulk_create([
+            Todo(title=f'Todo {i}', description='Buy milk and bread', user=self.user) for i in range(50)
+        ])
+        TodoListState.objects.reconcile([self.user.id])
+
+    def test_list_is_gzipped(self):
+        expected = self.client.get('/api/todos/').content
+        response = self.client.get('/api/todos/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), expected)
+
+        stats = response.compression_stats
+        self.assertEqual(stats.encoding, 'gzip')
+        self.assertEqual(stats.original_size, len(expected))
+        self.assertEqual(stats.compressed_size, len(response.content))
+        self.assertGreater(stats.ratio, 2)
+
+    def test_revalidation_keeps_the_weak_etag(self):
+        response = self.client.get('/api/todos/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get('/api/todos/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        # Without compression the validator stays strong on both
+        response = self.client.get('/api/todos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual('W/' + response['ETag'], etag)
+
+    def test_uncompressed_responses(self):
+        response = self.client.get('/api/todos/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(hasattr(response, 'compression_stats'))
+
+        # Under MIN_SIZE
+        todo = Todo.objects.first()
+        response = self.client.get(f'/api/todos/{todo.id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        with override_settings(RESPONSE_COMPRESSION={'ENABLED': False}):
+            response = self.client.get('/api/todos/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_negotiation(self):
+        from core.compression import negotiate_encoding
+        with override_settings(RESPONSE_COMPRESSION={'ENCODINGS': ['gzip']}):
+            self.assertEqual(negotiate_encoding('br, gzip;q=0.5'), 'gzip')
+            self.assertEqual(negotiate_encoding('*'), 'gzip')
+            self.assertIsNone(negotiate_encoding('*, gzip;q=0'))
+            self.assertIsNone(negotiate_encoding('br, deflate'))
+            self.assertIsNone(negotiate_encoding(''))
+
+    def test_server_timing(self):
+        with override_settings(RESPONSE_COMPRESSION={'SERVER_TIMING_HEADER': True},
+                               QUERY_BUDGET={'SERVER_TIMING_HEADER': True}):
+            response = self.client.get('/api/todos/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", compress;dur=[\d.]+;desc="gzip \d+->\d+"$')
+
+    def test_streaming_is_compressed_incrementally(self):
+        from django.http import StreamingHttpResponse
+        from core.middleware import CompressionMiddleware
+
+        chunks = [f'{{"id": {i}}}\n'.encode() for i in range(100)]
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(chunks)))(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        compressed = list(response.streaming_content)
+        # Every chunk is flushed as it arrives, plus the gzip trailer
+        self.assertEqual(len(compressed), len(chunks) + 1)
+        self.assertEqual(gzip.decompress(b''.join(compressed)), b''.join(chunks))
+        self.assertEqual(response.compression_stats.original_size, len(b''.join(chunks)))
+
+    def test_already_encoded_export_is_left_alone(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/admin/todos/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(hasattr(response, 'compression_stats'))
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 50)
+
+
+# Concurrent in-process requests share a connection, so per-request query counts interleave
+@override_settings(ALLOWED_HOSTS=['localhost'], QUERY_BUDGET={'ENABLED': False})
+class BenchmarkAPITests(APITestCase):
+    """The in-process load benchmark and its baseline comparison"""
+
+    def benchmark(self, report, **options):
+        call_command(
+            'benchmark_api', requests=60, concurrency=4, users=3, todos_per_user=3,
+            anonymous_ratio=0.25, admin_ratio=0.5, output=report, stdout=StringIO(), stderr=StringIO(),
+            allow_seed=True, **options,
+        )
+        with open(report) as f:
+            return json.load(f)
+
+    def test_reports_latency_per_endpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report = self.benchmark(os.path.join(directory, 'report.json'), mix='todo-list=3,todo-toggle=1,refresh=1,login=1')
+        self.assertEqual(report['total']['requests'], 60)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertLessEqual(set(report['endpoints']), {'todo-list', 'todo-toggle', 'todo-create', 'refresh', 'login'})
+        for result in report['endpoints'].values():
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+        # Benchmark users are seeded once and reused
+        self.assertEqual(User.objects.filter(username__startswith='bench_').count(), 3)
+        admin = User.objects.get(username='benchmark-admin')
+        self.assertTrue(admin.is_staff)
+        self.assertFalse(admin.is_superuser)
+        self.assertFalse(admin.check_password('testpass123'))
+        # The database profile from settings.DATABASES/SQLITE_PRAGMAS is part of the report
+        self.assertEqual(report['database']['vendor'], 'sqlite')
+        self.assertEqual(report['database']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(report['database']['synchronous'], 1)
+        self.assertEqual(report['database']['busy_timeout'], 5000)
+
+    def test_remote_server_needs_the_seed_opt_in(self):
+        with self.assertRaisesMessage(CommandError, '--allow-seed'):
+            call_command('benchmark_api', url='http://localhost:8000', stdout=StringIO())
+
+    def test_fails_on_regression_against_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            report = self.benchmark(baseline, mix='todo-list=1')
+            report['endpoints']['todo-list']['p95_ms'] /= 100
+            with open(baseline, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaisesMessage(CommandError, 'todo-list'):
+                self.benchmark(os.path.join(directory, 'report.json'), mix='todo-list=1', baseline=baseline)
+            comparison = self.benchmark(
+                os.path.join(directory, 'report.json'), mix='todo-list=1', baseline=baseline, tolerance=1000,
+            )['comparison']
+        self.assertFalse(comparison['todo-list']['regressed'])
+
+
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica'], 'PIN_SECONDS': 60})
+class ReplicaRoutingTests(SimpleTestCase):
+    """Read-replica routing with read-your-writes pinning"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.factory = RequestFactory()
+
+    @staticmethod
+    def bearer(user_id):
+        # Only the user id claim picks the database; the signature is not checked
+        payload = base64.urlsafe_b64encode(json.dumps({'user_id': user_id}).encode()).rstrip(b'=').decode()
+        return f'Bearer e30.{payload}.signature'
+
+    def read_database(self, method='get', **headers):
+        """Serve a request and return the database a read in its view is routed to"""
+        from django.db import router
+        from core.middleware import ReplicaRoutingMiddleware
+
+        middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse(router.db_for_read(Todo)))
+        return middleware(getattr(self.factory, method)('/api/todos/', **headers)).content.decode()
+
+    def test_safe_requests_read_from_replicas(self):
+        from django.db import router
+        self.assertEqual(self.read_database(), 'replica')
+        self.assertEqual(self.read_database('head'), 'replica')
+        self.assertEqual(self.read_database('post'), 'default')
+        self.assertEqual(router.db_for_write(Todo), 'default')
+        # Outside requests, e.g. in management commands, every read uses the primary
+        self.assertEqual(router.db_for_read(Todo), 'default')
+        with override_settings(REPLICA_ROUTING={'REPLICAS': []}):
+            self.assertEqual(self.read_database(), 'default')
+
+    def test_writers_are_pinned_to_the_primary(self):
+        self.read_database('post', HTTP_AUTHORIZATION=self.bearer(7))
+        # A refreshed token carries the same user id
+        self.assertEqual(self.read_database(HTTP_AUTHORIZATION=self.bearer(7)), 'default')
+        self.assertEqual(self.read_database(HTTP_AUTHORIZATION=self.bearer(8)), 'replica')
+        self.assertEqual(self.read_database(HTTP_AUTHORIZATION='Bearer not-a-token'), 'replica')
+
+        self.read_database('patch', HTTP_X_ANONYMOUS_TOKEN='anonymous-token-1234')
+        self.assertEqual(self.read_database(HTTP_X_ANONYMOUS_TOKEN='anonymous-token-1234'), 'default')
+        self.assertEqual(self.read_database(HTTP_X_ANONYMOUS_TOKEN='anonymous-token-5678'), 'replica')
+
+        with override_settings(REPLICA_ROUTING={'REPLICAS': ['replica'], 'PIN_SECONDS': 0}):
+            self.read_database('post', HTTP_AUTHORIZATION=self.bearer(9))
+            self.assertEqual(self.read_database(HTTP_AUTHORIZATION=self.bearer(9)), 'replica')
+
+    def test_transactions_read_from_the_primary(self):
+        from django.db import connections, router
+        from core.routers import replica_reads
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Todo), 'replica')
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.assertEqual(router.db_for_read(Todo), 'default')
+        finally:
+            replica_reads.reset(token)
+
+    def test_async_requests(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+        from django.db import router
+        from core.middleware import ReplicaRoutingMiddleware
+
+        async def view(request):
+            # The ORM runs on a worker thread, which sees the request's routing
+            return HttpResponse(await sync_to_async(router.db_for_read)(Todo))
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertEqual(async_to_sync(middleware)(self.factory.get('/api/todos/')).content, b'replica')
+        self.assertEqual(async_to_sync(middleware)(self.factory.delete('/api/todos/1/')).content, b'default')
+        self.assertEqual(router.db_for_read(Todo), 'default')
+
+    def test_migrations_only_run_on_the_primary(self):
+        from django.db import router
+        self.assertTrue(router.allow_migrate('default', 'todo'))
+        self.assertFalse(router.allow_migrate('replica', 'todo'))
+
+    def test_sync_sqlite_replica(self):
+        import sqlite3
+        with tempfile.TemporaryDirectory() as directory:
+            source, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE item (name TEXT)')
+                db.executemany('INSERT INTO item VALUES (?)', [('a',), ('b',)])
+            db.close()
+            out = StringIO()
+            call_command('sync_sqlite_replica', source=source, replica=replica, stdout=out)
+            self.assertIn('Successfully copied', out.getvalue())
+            db = sqlite3.connect(replica)
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM item').fetchone(), (2,))
+            db.close()
+
+            with self.assertRaisesMessage(CommandError, 'different file'):
+                call_command('sync_sqlite_replica', source=source, replica=source)
+            from django.db import connections
+            with mock.patch.dict(connections.settings), self.assertRaisesMessage(CommandError, 'SQLITE_REPLICA_PATH'):
+                connections.settings.pop('replica', None)
+                call_command('sync_sqlite_replica', source=source)
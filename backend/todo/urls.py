@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TodoViewSet, TodoAdminListView
+from .views import TodoViewSet, TodoAdminListView, TodoExportView
 
 # Create router and register TodoViewSet
 router = DefaultRouter()
@@ -9,4 +9,5 @@ router.register(r'todos', TodoViewSet, basename='todo')
 urlpatterns = [
     path('api/', include(router.urls)),
     path('api/admin/todos/', TodoAdminListView.as_view(), name='todo-admin-list'),
+    path('api/admin/todos/export/', TodoExportView.as_view(), name='todo-admin-export'),
 ]
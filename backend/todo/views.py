@@ -4,8 +4,18 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth.models import User
 from django.db.models import Q
-from .models import Todo
-from .serializers import TodoSerializer, TodoAdminSerializer
+from core.pagination import StandardPagination
+from core.querybudget import exempt_request
+from .anonymous import get_anonymous_token, get_request_list_key, set_anonymous_token
+from .bulk import BulkOperationError, apply_operations, validate_operations
+from .conditional import conditional_list
+from .export import EXPORT_FORMATS, export_response
+from .imports import IMPORT_FORMATS, guess_format, import_todos, parse_rows
+from .models import Todo, TodoListState, TodoTombstone, get_list_scope
+from .search import search_todos
+from .serializers import TodoSerializer, TodoAdminSerializer, list_values, represent_admin_todos, represent_todos
+from .sync import InvalidSyncCursor, get_changes
+from .writes import create_todo, delete_todo, toggle_todo, update_todo
 
 
 class TodoViewSet(viewsets.ModelViewSet):
@@ -15,51 +25,176 @@ class TodoViewSet(viewsets.ModelViewSet):
     """
     serializer_class = TodoSerializer
     permission_classes = [AllowAny]  # Allow anonymous access
+    query_budget = {
+        'list': 4, 'create': 5, 'retrieve': 2, 'completed': 3, 'pending': 3, 'stats': 2, 'bulk': 12, 'destroy': 7,
+        # Setting completed reads the stored status under a row lock first
+        'update': 6, 'partial_update': 6,
+        # One more than UPDATE ... RETURNING for backends that have to read the flipped value back
+        'toggle_completed': 6,
+        'default': 5,
+    }
 
     def get_queryset(self):
         """
         Filter todos based on authentication status:
-        - Anonymous users see only anonymous todos (user=null)
+        - Anonymous users see only the anonymous todos (user=null) of their client token
         - Authenticated users see only their own todos
         """
+        return Todo.objects.select_related('user').owned_by(self.request.user, self.get_anonymous_token())
+
+    def get_anonymous_token(self):
+        """Client token of an anonymous user ('' for authenticated users)"""
+        if self.request.user.is_authenticated:
+            return ''
+        return get_anonymous_token(self.request)
+
+    def get_tombstones(self):
+        """Deletion log entries in the same scope as get_queryset"""
         if self.request.user.is_authenticated:
-            return Todo.objects.filter(user=self.request.user)
+            return TodoTombstone.objects.filter(user=self.request.user)
         else:
-            return Todo.objects.filter(user__isnull=True)
+            return TodoTombstone.objects.filter(user__isnull=True, anonymous_token=self.get_anonymous_token())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Hand a newly issued anonymous token to the client"""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return set_anonymous_token(request, response)
+
+    @conditional_list
+    def list(self, request, *args, **kwargs):
+        """
+        List todos. With ?since=<cursor> return only the changes since the
+        cursor (an empty value starts a full sync):
+        {"results": [...], "deleted": [ids], "cursor": "...", "full": bool}
+        """
+        if 'since' not in request.query_params:
+            return self.list_response(self.filter_queryset(self.get_queryset()), paginate=True)
+        try:
+            todos, deleted, cursor, full = get_changes(
+                self.get_queryset(), self.get_tombstones(), request.query_params['since']
+            )
+        except InvalidSyncCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(todos, many=True)
+        return Response({
+            'results': serializer.data,
+            'deleted': deleted,
+            'cursor': cursor,
+            'full': full,
+        })
 
     def perform_create(self, serializer):
         """
         Set user field based on authentication status:
-        - Anonymous users: user=null
+        - Anonymous users: user=null, tagged with their client token
         - Authenticated users: user=current_user
         """
         if self.request.user.is_authenticated:
-            serializer.save(user=self.request.user)
+            create_todo(serializer, self.request.user)
         else:
-            serializer.save(user=None)
+            create_todo(serializer, None, self.get_anonymous_token())
+
+    def perform_update(self, serializer):
+        """Save the changes and bump the list version"""
+        update_todo(serializer)
+
+    def perform_destroy(self, instance):
+        """Delete the todo and leave a tombstone for delta sync clients"""
+        delete_todo(instance)
 
     @action(detail=True, methods=['patch'])
     def toggle_completed(self, request, pk=None):
         """Toggle the completion status of a todo item"""
-        todo = self.get_object()
-        todo.completed = not todo.completed
-        todo.save()
+        todo = toggle_todo(self.get_object())
         serializer = self.get_serializer(todo)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Apply a batch of create/update/delete/toggle operations in one transaction.
+        Body: {"operations": [{"op": "create", "title": ...}, {"op": "toggle", "id": 1}, ...]}
+        Nothing is written if any operation is invalid; results are reported per item.
+        Items whose todo was deleted meanwhile by another request come back as not_found.
+        """
+        queryset = self.get_queryset()
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        try:
+            plan, results, has_errors = validate_operations(operations, queryset)
+        except BulkOperationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if has_errors:
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        owner = request.user if request.user.is_authenticated else None
+        apply_operations(plan, results, queryset, owner, self.get_anonymous_token())
+        for result in results:
+            todo = result.pop('todo', None)
+            if todo is not None:
+                result['data'] = self.get_serializer(todo).data
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAuthenticated])
+    def bulk_import(self, request):
+        """
+        Import todos from an NDJSON or CSV upload in the multipart field "file".
+        ?import_format=ndjson|csv, guessed from the file name when omitted.
+        Invalid rows are skipped and reported:
+        {"imported": n, "failed": n, "errors": [{"row": n, "errors": {...}}]}
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the todos in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+        import_format = request.query_params.get('import_format') or guess_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            return Response(
+                {'error': f'import_format must be one of: {", ".join(IMPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # One bulk insert per batch, so the query count grows with the upload
+        exempt_request(request)
+        return Response(import_todos(parse_rows(upload.file, import_format), request.user))
+
     @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Todo counts of the current user/anonymous list, read from the maintained counters"""
+        state = TodoListState.objects.filter(scope=get_list_scope(get_request_list_key(request))).first()
+        if state is None:
+            return Response({'total': 0, 'completed': 0, 'pending': 0, 'last_activity': None})
+        return Response({
+            'total': state.total_count,
+            'completed': state.completed_count,
+            'pending': state.pending_count,
+            'last_activity': state.last_activity,
+        })
+
+    def list_response(self, queryset, paginate=False):
+        """
+        Serialize a filtered list, as TodoSerializer would, from values() rows.
+        The custom list actions return the full list by default, or a keyset
+        page when the client opts into cursor pagination (?pagination=cursor);
+        ``paginate`` always applies the configured pagination.
+        """
+        rows = list_values(queryset)
+        if paginate or StandardPagination.is_cursor_request(self.request):
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(represent_todos(page))
+        return Response(represent_todos(rows))
+
+    @action(detail=False, methods=['get'])
+    @conditional_list
     def completed(self, request):
         """Get all completed todo items for current user/anonymous"""
         completed_todos = self.get_queryset().filter(completed=True)
-        serializer = self.get_serializer(completed_todos, many=True)
-        return Response(serializer.data)
+        return self.list_response(completed_todos)
 
     @action(detail=False, methods=['get'])
+    @conditional_list
     def pending(self, request):
         """Get all pending (not completed) todo items for current user/anonymous"""
         pending_todos = self.get_queryset().filter(completed=False)
-        serializer = self.get_serializer(pending_todos, many=True)
-        return Response(serializer.data)
+        return self.list_response(pending_todos)
 
 
 class TodoAdminListView(generics.ListAPIView):
@@ -69,6 +204,7 @@ class TodoAdminListView(generics.ListAPIView):
     """
     serializer_class = TodoAdminSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 3
 
     def get_queryset(self):
         """
@@ -76,16 +212,16 @@ class TodoAdminListView(generics.ListAPIView):
         - Superuser/Staff: can see all todos
         - Regular users: can only see their own todos
         """
-        queryset = Todo.objects.all()
+        queryset = Todo.objects.select_related('user')
         
         # Regular users can only see their own todos
         if not (self.request.user.is_superuser or self.request.user.is_staff):
             queryset = queryset.filter(user=self.request.user)
         
-        # Apply search filter
+        # Apply full-text search over title and description
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(title__icontains=search)
+            queryset = search_todos(queryset, search)
         
         # Apply status filter
         status_filter = self.request.query_params.get('status', None)
@@ -94,11 +230,40 @@ class TodoAdminListView(generics.ListAPIView):
         elif status_filter == 'pending':
             queryset = queryset.filter(completed=False)
         
-        # Apply ordering
-        ordering = self.request.query_params.get('ordering', '-created_at')
+        # Apply ordering; searches rank by relevance unless another order is requested
+        default_ordering = 'relevance' if search else '-created_at'
+        ordering = self.request.query_params.get('ordering', default_ordering)
         if ordering in ['created_at', '-created_at', 'updated_at', '-updated_at', 'title', '-title']:
             queryset = queryset.order_by(ordering)
+        elif ordering == 'relevance' and search:
+            queryset = queryset.order_by('-search_rank', '-created_at')
         else:
             queryset = queryset.order_by('-created_at')
         
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        """Serialize the page, as TodoAdminSerializer would, from values() rows"""
+        rows = list_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(represent_admin_todos(page))
+        return Response(represent_admin_todos(rows))
+
+
+class TodoExportView(TodoAdminListView):
+    """
+    Stream the todos of the admin list as a download, with the same
+    search/status/ordering filters and permission scoping.
+    ?export_format=ndjson (default) or csv
+    """
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'export_format must be one of: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return export_response(request, self.filter_queryset(self.get_queryset()), export_format)
@@ -0,0 +1,72 @@
+"""
+Single-todo write paths shared by TodoViewSet and the async views.
+
+Each write runs in one transaction together with the tombstone and the
+TodoListState update (version stamp and counters) it implies.
+"""
+from django.db import transaction
+from django.http import Http404
+
+from .models import Todo, TodoListState, TodoTombstone, add_deltas, status_delta
+
+
+def create_todo(serializer, owner, anonymous_token=''):
+    """
+    Save a validated TodoSerializer as a new todo of ``owner``, or with
+    owner None, of the anonymous client ``anonymous_token``
+    """
+    with transaction.atomic():
+        todo = serializer.save(user=owner, anonymous_token='' if owner else anonymous_token)
+        TodoListState.objects.touch({todo.list_key: status_delta(todo.completed)})
+    return todo
+
+
+def update_todo(serializer):
+    """
+    Save a validated TodoSerializer bound to an existing todo. When the
+    update sets ``completed``, the stored status is read under a row lock
+    first, so concurrent updates apply their counter deltas one after the other
+    """
+    instance = serializer.instance
+    with transaction.atomic():
+        if 'completed' in serializer.validated_data:
+            was_completed = (
+                Todo.objects.filter(pk=instance.pk).select_for_update().values_list('completed', flat=True).first()
+            )
+            if was_completed is None:
+                raise Http404('No Todo matches the given query.')
+            # Continue from the stored status, not the one loaded before the lock
+            instance.completed = was_completed
+            instance.mark_saved(['completed'])
+        else:
+            was_completed = instance.completed
+        todo = serializer.save()
+        TodoListState.objects.touch({
+            todo.list_key: add_deltas(status_delta(todo.completed), status_delta(was_completed, -1))
+        })
+    return todo
+
+
+def delete_todo(todo):
+    """Delete the todo and leave a tombstone for delta sync clients"""
+    with transaction.atomic():
+        TodoTombstone.record([(todo.pk, todo.list_key)])
+        todo.delete()
+        TodoListState.objects.touch({todo.list_key: status_delta(todo.completed, -1)})
+
+
+def toggle_todo(todo):
+    """
+    Flip the completion status of the todo with one conditional UPDATE; the
+    counters follow the state the UPDATE produced, not the possibly stale ``todo``
+    """
+    with transaction.atomic():
+        toggled = Todo.objects.toggle_completed(todo.pk)
+        if toggled is None:
+            raise Http404('No Todo matches the given query.')
+        todo.completed, todo.updated_at = toggled
+        todo.mark_saved(['completed', 'updated_at'])
+        TodoListState.objects.touch({
+            todo.list_key: add_deltas(status_delta(todo.completed), status_delta(not todo.completed, -1))
+        })
+    return todo
@@ -0,0 +1,23 @@
+"""
+URL configuration for ASGI deployments.
+
+The todo hot paths and the profile read are routed to async-native views;
+every other URL (and whatever those views delegate) is served by the
+regular URLconf. Selected through DJANGO_ASYNC_VIEWS, see asgi.py.
+"""
+
+from django.urls import path
+
+from accounts import async_views as account_views
+from todo import async_views as todo_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("api/todos/", todo_views.todo_list),
+    path("api/todos/completed/", todo_views.todo_completed),
+    path("api/todos/pending/", todo_views.todo_pending),
+    path("api/todos/<int:pk>/", todo_views.todo_detail),
+    path("api/todos/<int:pk>/toggle_completed/", todo_views.todo_toggle),
+    path("api/auth/profile/", account_views.profile),
+] + sync_urlpatterns
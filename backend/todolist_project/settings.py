@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
+import importlib.util
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,6 +44,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "rest_framework_simplejwt",
+    "rest_framework_simplejwt.token_blacklist",
     "corsheaders",
     "drf_spectacular",  # Add this for API documentation
     "todo",
@@ -47,6 +53,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "core.middleware.CompressionMiddleware",  # gzip/brotli/zstd response compression
+    "core.middleware.QueryBudgetMiddleware",  # Per-request query budgets and N+1 detection
+    "core.middleware.ReplicaRoutingMiddleware",  # Read replicas with read-your-writes pinning
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "core.middleware.LanguageMiddleware",  # Add custom language middleware
@@ -57,7 +66,10 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "todolist_project.urls"
+# ASGI deployments serve the todo hot paths from async-native views (see asgi.py)
+ROOT_URLCONF = (
+    "todolist_project.async_urls" if os.environ.get("DJANGO_ASYNC_VIEWS") == "1" else "todolist_project.urls"
+)
 
 TEMPLATES = [
     {
@@ -80,13 +92,93 @@ WSGI_APPLICATION = "todolist_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+# The database profile comes from the environment: DB_ENGINE=postgresql
+# serves from a psycopg connection pool (needs psycopg[pool]), anything else
+# uses the SQLite file, tuned by SQLITE_PRAGMAS on every new connection.
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+# WAL lets readers run while a writer commits; NORMAL sync is durable in WAL
+# mode except for the last commits on power loss. Negative cache_size is KiB.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64000)),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),
 }
 
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "todolist"),
+            "USER": os.environ.get("POSTGRES_USER", "todolist"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            # Pooled connections go back to the pool after each request; Django
+            # refuses persistent connections together with a pool
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                    "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 20)),
+                    "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            # Keep connections between requests. Async views run each request on
+            # a new thread, whose connection would never be reused, so ASGI
+            # deployments close them per request unless DB_CONN_MAX_AGE says otherwise.
+            "CONN_MAX_AGE": int(
+                os.environ.get("DB_CONN_MAX_AGE", 0 if os.environ.get("DJANGO_ASYNC_VIEWS") == "1" else 600)
+            ),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Take the write lock when a transaction begins: a deferred transaction
+                # upgrading its read lock fails at once with "database is locked"
+                # instead of waiting for busy_timeout
+                "transaction_mode": "IMMEDIATE",
+                "init_command": "".join(f"PRAGMA {name}={value};" for name, value in SQLITE_PRAGMAS.items()),
+            },
+        }
+    }
+
+# Read replicas, served through core.routers.ReplicaRouter. POSTGRES_REPLICA_HOSTS
+# lists replica hosts of the primary; locally, SQLITE_REPLICA_PATH points a
+# "replica" alias at a copy of the SQLite file refreshed by sync_sqlite_replica.
+if DB_ENGINE == "postgresql":
+    for number, host in enumerate(filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")), 1):
+        DATABASES[f"replica_{number}"] = {
+            **DATABASES["default"],
+            "HOST": host.strip(),
+            "TEST": {"MIRROR": "default"},
+        }
+elif os.environ.get("SQLITE_REPLICA_PATH"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["SQLITE_REPLICA_PATH"],
+        "OPTIONS": {
+            "init_command": "".join(
+                f"PRAGMA {name}={value};" for name, value in SQLITE_PRAGMAS.items() if name != "journal_mode"
+            ) + "PRAGMA query_only=1;",
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+REPLICA_ROUTING = {
+    "REPLICAS": [alias for alias in DATABASES if alias != "default"],
+    # Seconds a client keeps reading from the primary after a write
+    "PIN_SECONDS": 5,
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,30 +240,91 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Anonymous clients identify their todo list with this header (see todo.anonymous)
+CORS_ALLOW_HEADERS = (*default_headers, "x-anonymous-token")
+CORS_EXPOSE_HEADERS = ["X-Anonymous-Token"]
+
 # Django REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON, byte-identical to the stock JSONRenderer; MessagePack
+    # is added below for clients that send Accept/Content-Type: application/msgpack
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.ORJSONRenderer',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Page-number pagination by default; ?pagination=cursor opts into keyset pagination
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.StandardPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',  # Add this for API documentation
 }
 
+# msgpack is optional; without it the API speaks JSON only
+if importlib.util.find_spec("msgpack") is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('core.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('core.renderers.MessagePackParser')
+
+# Query budget settings (see core.querybudget)
+QUERY_BUDGET = {
+    'ENABLED': True,
+    'RAISE': False,
+    'DUPLICATE_THRESHOLD': 2,
+    'SERVER_TIMING_HEADER': DEBUG,
+}
+
+# Response compression settings (see core.compression); br and zstd need
+# the brotli and zstandard packages
+RESPONSE_COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,
+    'ENCODINGS': ['br', 'zstd', 'gzip'],
+    'SERVER_TIMING_HEADER': DEBUG,
+}
+
+# Delta sync: how long todo deletion tombstones are kept (see todo.sync).
+# Clients whose cursor is older than this get a full resync.
+TODO_SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+# Seconds the admin dashboard statistics are cached (see accounts.stats)
+DASHBOARD_STATS_CACHE_TIMEOUT = 60
+
+# last_login is written at most once per user per this many seconds (see accounts.lastlogin)
+LAST_LOGIN_UPDATE_INTERVAL = 300
+
+# In-process cache of verified access tokens (see accounts.authentication).
+# Invalidation reaches other worker processes through a per-user generation
+# in the default cache, which has to be shared between them.
+JWT_AUTH_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TIMEOUT': 30,
+}
+
+# In-process Bloom filter of blacklisted refresh token JTIs (see accounts.blacklist).
+# Tokens blacklisted by another process are seen after at most SYNC_INTERVAL seconds.
+TOKEN_BLACKLIST_FILTER = {
+    'ENABLED': True,
+    'ERROR_RATE': 0.001,
+    'SYNC_INTERVAL': 5,
+}
+
 # JWT Settings
-from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # LoginView records last_login itself, debounced
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
@@ -191,6 +344,7 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.FilteredTokenRefreshSerializer',
 }
 
 # Media files
@@ -52,6 +52,7 @@ export const admin = {
   dashboardStats: {
     title: "Dashboard",
     subtitle: "Admin system overview",
+    generatedAt: "Updated {{time}}",
     totalUsers: "Total Users",
     activeUsers: "Active Users",
     staffUsers: "Staff Users",
@@ -52,6 +52,7 @@ export const admin = {
   dashboardStats: {
     title: "仪表板",
     subtitle: "管理系统总览",
+    generatedAt: "更新于 {{time}}",
     totalUsers: "总用户数",
     activeUsers: "活跃用户",
     staffUsers: "员工用户",
@@ -57,6 +57,11 @@ const AdminDashboard: React.FC = () => {
       <div className="dashboard-header">
         <h1>{t('admin.dashboardStats.title')}</h1>
         <p>{t('admin.dashboardStats.subtitle')}</p>
+        {stats?.generated_at && (
+          <p className="dashboard-generated-at">
+            {t('admin.dashboardStats.generatedAt', { time: new Date(stats.generated_at).toLocaleString() })}
+          </p>
+        )}
       </div>
 
       <div className="dashboard-stats">
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { Todo, CreateTodo, UpdateTodo } from '../types/todo';
+import type { Todo, CreateTodo, UpdateTodo, BulkTodoOperation, BulkTodoResult, TodoStats, TodoImportResult } from '../types/todo';
 
 const API_BASE_URL = 'http://localhost:8000/api';
 
@@ -21,6 +21,12 @@ api.interceptors.request.use(
     const token = localStorage.getItem('access_token');
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
+    } else {
+      // Anonymous todos are kept per browser, identified by this token
+      const anonymousToken = localStorage.getItem('anonymous_token');
+      if (anonymousToken) {
+        config.headers['X-Anonymous-Token'] = anonymousToken;
+      }
     }
     
     return config;
@@ -32,7 +38,14 @@ api.interceptors.request.use(
 
 // Response interceptor to handle errors
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    // The backend issues an anonymous token on the first anonymous request
+    const anonymousToken = response.headers['x-anonymous-token'];
+    if (anonymousToken) {
+      localStorage.setItem('anonymous_token', anonymousToken);
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       // Handle unauthorized access
@@ -97,6 +110,28 @@ export const todoAPI = {
     }
     return response.data || [];
   },
+
+  // Apply several create/update/delete/toggle operations in one request and transaction
+  bulkTodos: async (operations: BulkTodoOperation[]): Promise<BulkTodoResult[]> => {
+    const response = await api.post('/todos/bulk/', { operations });
+    return response.data.results;
+  },
+
+  // Get completed/pending counts of the current list
+  getTodoStats: async (): Promise<TodoStats> => {
+    const response = await api.get('/todos/stats/');
+    return response.data;
+  },
+
+  // Import todos from an NDJSON or CSV file
+  importTodos: async (file: File): Promise<TodoImportResult> => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post('/todos/import/', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
 };
 
 // Auth API functions
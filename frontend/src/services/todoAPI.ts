@@ -57,6 +57,24 @@ export const todoAdminAPI = {
     const response = await todoAPI.get('/admin/todos/', { params: cleanParams });
     return response.data;
   },
+
+  /**
+   * Download all todos matching the admin filters as NDJSON or CSV
+   */
+  exportTodos: async (
+    params: Omit<TodoAdminParams, 'page' | 'page_size'> = {},
+    exportFormat: 'ndjson' | 'csv' = 'csv'
+  ): Promise<Blob> => {
+    const cleanParams = Object.fromEntries(
+      Object.entries(params).filter(([_, value]) => value !== undefined && value !== '')
+    );
+
+    const response = await todoAPI.get('/admin/todos/export/', {
+      params: { ...cleanParams, export_format: exportFormat },
+      responseType: 'blob',
+    });
+    return response.data;
+  },
 };
 
 export default todoAdminAPI;
@@ -89,6 +89,7 @@ export interface DashboardStats {
   superusers: number;
   recent_registrations: number;
   recent_logins: number;
+  generated_at: string;
 }
 
 // API Response types
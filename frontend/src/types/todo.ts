@@ -19,6 +19,34 @@ export interface UpdateTodo {
   completed?: boolean;
 }
 
+export type BulkTodoOperation =
+  | ({ op: 'create' } & CreateTodo)
+  | ({ op: 'update'; id: number } & UpdateTodo)
+  | { op: 'delete'; id: number }
+  | { op: 'toggle'; id: number };
+
+export interface BulkTodoResult {
+  index: number;
+  op: BulkTodoOperation['op'];
+  id?: number;
+  status: 'created' | 'updated' | 'deleted' | 'not_found' | 'error';
+  data?: Todo;
+  errors?: Record<string, string[]>;
+}
+
+export interface TodoStats {
+  total: number;
+  completed: number;
+  pending: number;
+  last_activity: string | null;
+}
+
+export interface TodoImportResult {
+  imported: number;
+  failed: number;
+  errors: { row: number; errors: Record<string, string[]> }[];
+}
+
 export interface AdminTodo {
   id: number;
   title: string;